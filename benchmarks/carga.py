@@ -0,0 +1,114 @@
+"""Teste de carga simples das rotas principais (requisições por segundo).
+
+Com o servidor rodando (python src/main.py, gunicorn ou waitress):
+
+    python benchmarks/carga.py --url http://localhost:5000 --duracao 10 --concorrencia 16
+    python benchmarks/carga.py --escrita   # inclui check-ins e check-outs pela API
+
+A opção --escrita cria e finaliza check-ins em apartamentos "CARGA-n" para medir a
+contenção de escrita no SQLite (erros 500 / "database is locked").
+"""
+import argparse
+import itertools
+import json
+import threading
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+ROTAS = ['/', '/checkins-ativos', '/historico', '/ocupacao', '/api/v1/checkins?status=Ativo']
+
+_contador = itertools.count()
+
+
+def requisitar(url, metodo='GET', corpo=None):
+    """Executa uma requisição e retorna o status HTTP (0 em erro de conexão)"""
+    dados = json.dumps(corpo).encode() if corpo is not None else None
+    requisicao = urllib.request.Request(url, data=dados, method=metodo,
+                                        headers={'Content-Type': 'application/json'} if dados else {})
+    try:
+        with urllib.request.urlopen(requisicao, timeout=30) as resposta:
+            resposta.read()
+            return resposta.status
+    except urllib.error.HTTPError as e:
+        return e.code
+    except OSError:
+        return 0
+
+
+def ciclo_escrita(base):
+    """Cria um check-in pela API e em seguida faz o check-out"""
+    numero = f'CARGA-{next(_contador)}'
+    corpo = {
+        'numero_apartamento': numero,
+        'data_checkout_prevista': '2099-01-01',
+        'hospede_principal': {
+            'nome_completo': 'Hóspede Carga', 'data_nascimento': '1990-01-01', 'documento': numero,
+            'ddd': '11', 'telefone': '999999999', 'email': 'carga@exemplo.com',
+            'cep': '00000-000', 'logradouro': 'Rua', 'numero': '1', 'bairro': 'Centro',
+            'cidade': 'São Paulo', 'estado': 'SP', 'pais': 'Brasil'
+        }
+    }
+    dados = json.dumps(corpo).encode()
+    requisicao = urllib.request.Request(f'{base}/api/v1/checkins', data=dados, method='POST',
+                                        headers={'Content-Type': 'application/json'})
+    try:
+        with urllib.request.urlopen(requisicao, timeout=30) as resposta:
+            checkin_id = json.loads(resposta.read())['id']
+    except urllib.error.HTTPError as e:
+        return e.code
+    except OSError:
+        return 0
+    return requisitar(f'{base}/api/v1/checkins/{checkin_id}/checkout', 'POST', {})
+
+
+def medir(nome, funcao, duracao, concorrencia):
+    """Executa `funcao` em `concorrencia` threads por `duracao` segundos; retorna o resultado"""
+    fim = time.perf_counter() + duracao
+    status = {}
+    trava = threading.Lock()
+
+    def trabalhador():
+        while time.perf_counter() < fim:
+            codigo = funcao()
+            with trava:
+                status[codigo] = status.get(codigo, 0) + 1
+
+    inicio = time.perf_counter()
+    with ThreadPoolExecutor(concorrencia) as executor:
+        for _ in range(concorrencia):
+            executor.submit(trabalhador)
+    decorrido = time.perf_counter() - inicio
+    total = sum(status.values())
+    erros = sum(quantidade for codigo, quantidade in status.items() if codigo == 0 or codigo >= 500)
+    return {'rota': nome, 'requisicoes': total, 'req_s': round(total / decorrido, 1), 'erros': erros,
+            'status': status}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--url', default='http://localhost:5000')
+    parser.add_argument('--duracao', type=float, default=10, help='segundos por rota')
+    parser.add_argument('--concorrencia', type=int, default=8)
+    parser.add_argument('--escrita', action='store_true', help='inclui o ciclo check-in/check-out')
+    parser.add_argument('--json', action='store_true', help='saída em JSON')
+    args = parser.parse_args()
+
+    base = args.url.rstrip('/')
+    resultados = [medir(rota, lambda rota=rota: requisitar(base + rota), args.duracao, args.concorrencia)
+                  for rota in ROTAS]
+    if args.escrita:
+        resultados.append(medir('POST check-in + checkout', lambda: ciclo_escrita(base),
+                                args.duracao, args.concorrencia))
+
+    if args.json:
+        print(json.dumps(resultados, indent=2))
+        return
+    print(f'{"rota":<32} {"req/s":>8} {"total":>8} {"erros":>6}')
+    for item in resultados:
+        print(f'{item["rota"]:<32} {item["req_s"]:>8} {item["requisicoes"]:>8} {item["erros"]:>6}')
+
+
+if __name__ == '__main__':
+    main()
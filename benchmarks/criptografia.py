@@ -0,0 +1,129 @@
+"""Benchmark do custo da cifragem dos dados pessoais (src/models/criptografia.py).
+
+Sobre o banco sintético, mede:
+  - cifrar e decifrar um valor e calcular um índice cego, em µs;
+  - nas rotas de criação de check-in e do histórico: latência p50, tempo gasto na
+    cifragem por requisição e o custo por linha (hóspede ou perfil gravado ou lido).
+
+    python -m benchmarks.criptografia
+    python -m benchmarks.criptografia --banco /tmp/hotel.db --repeticoes 50
+"""
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import event
+from benchmarks.executar import cenarios, percentil
+from benchmarks.gerador import criar_banco
+
+ROTAS = ('criar_checkin', 'historico', 'historico_filtrado')
+
+
+def por_valor(chaveiro, repeticoes=20000):
+    """Tempo médio (µs) de cifrar, decifrar e calcular o índice cego de um CPF"""
+    texto = '123.456.789-09'
+    cifrado = chaveiro.cifrar(texto, 'cpf')
+    operacoes = {
+        'cifrar': lambda: chaveiro.cifrar(texto, 'cpf'),
+        'decifrar': lambda: chaveiro.decifrar(cifrado, 'cpf'),
+        'indice_cego': lambda: chaveiro.indice('cpf', '12345678909'),
+    }
+    resultado = {}
+    for nome, operacao in operacoes.items():
+        inicio = time.perf_counter()
+        for _ in range(repeticoes):
+            operacao()
+        resultado[nome] = (time.perf_counter() - inicio) / repeticoes * 1e6
+    return resultado
+
+
+class Medidor:
+    """Acumula o tempo e a quantidade de chamadas do chaveiro e as linhas cifradas gravadas ou lidas"""
+
+    def __init__(self, chaveiro):
+        self.tempo = 0.0
+        self.valores = 0
+        self.linhas = 0
+        for nome in ('cifrar', 'decifrar', 'indice'):
+            setattr(chaveiro, nome, self._medir(getattr(chaveiro, nome)))
+
+    def _medir(self, funcao):
+        def medida(*args):
+            inicio = time.perf_counter()
+            try:
+                return funcao(*args)
+            finally:
+                self.tempo += time.perf_counter() - inicio
+                self.valores += 1
+        return medida
+
+    def contar_linha(self, *args):
+        self.linhas += 1
+
+    def zerar(self):
+        self.tempo, self.valores, self.linhas = 0.0, 0, 0
+
+
+def medir_rotas(app, repeticoes):
+    from src.models import Hospede, PerfilHospede
+
+    medidor = Medidor(app.extensions['criptografia'])
+    for modelo in (Hospede, PerfilHospede):
+        for evento in ('load', 'after_insert', 'after_update'):
+            event.listen(modelo, evento, medidor.contar_linha)
+    executores = cenarios(app)
+    resultados = {}
+    for nome in ROTAS:
+        executores[nome]()  # aquecimento
+        tempos, cifragem, valores, linhas = [], [], [], []
+        for _ in range(repeticoes):
+            medidor.zerar()
+            inicio = time.perf_counter()
+            executores[nome]()
+            tempos.append((time.perf_counter() - inicio) * 1000)
+            cifragem.append(medidor.tempo * 1000)
+            valores.append(medidor.valores)
+            linhas.append(medidor.linhas)
+        cifragem_ms = statistics.median(cifragem)
+        linhas_requisicao = statistics.median(linhas)
+        resultados[nome] = {
+            'p50_ms': percentil(tempos, 50),
+            'cifragem_ms': cifragem_ms,
+            'percentual': cifragem_ms / percentil(tempos, 50) * 100,
+            'valores': statistics.median(valores),
+            'linhas': linhas_requisicao,
+            'us_por_linha': cifragem_ms * 1000 / linhas_requisicao if linhas_requisicao else 0.0,
+        }
+    return resultados
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--banco', help='banco SQLite gerado (padrão: arquivo temporário)')
+    parser.add_argument('--anos', type=int, default=2)
+    parser.add_argument('--apartamentos', type=int, default=60)
+    parser.add_argument('--semente', type=int, default=42)
+    parser.add_argument('--repeticoes', type=int, default=30)
+    args = parser.parse_args()
+
+    caminho = args.banco or os.path.join(tempfile.mkdtemp(), 'benchmark.db')
+    app, (checkins, hospedes) = criar_banco(caminho, args.anos, args.apartamentos, args.semente)
+    print(f'Banco sintético: {checkins} check-ins, {hospedes} hóspedes ({caminho})')
+
+    print(f'\n{"operação":<14} {"µs":>7}')
+    for nome, micros in por_valor(app.extensions['criptografia']).items():
+        print(f'{nome:<14} {micros:>7.2f}')
+
+    print(f'\n{"rota":<20} {"p50 ms":>8} {"cifragem ms":>12} {"% rota":>7} {"valores":>8} {"linhas":>7} {"µs/linha":>9}')
+    for nome, m in medir_rotas(app, args.repeticoes).items():
+        print(f'{nome:<20} {m["p50_ms"]:>8.2f} {m["cifragem_ms"]:>12.3f} {m["percentual"]:>6.1f}% '
+              f'{m["valores"]:>8.0f} {m["linhas"]:>7.0f} {m["us_por_linha"]:>9.1f}')
+
+
+if __name__ == '__main__':
+    main()
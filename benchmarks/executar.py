@@ -0,0 +1,216 @@
+"""Benchmark das rotas principais sobre um banco sintético.
+
+Mede cada rota pelo test client do Flask: latência p50/p95, número de consultas SQL e
+pico de memória alocada (tracemalloc), e compara com benchmarks/baseline.json.
+
+    python -m benchmarks.executar                  # compara com a baseline
+    python -m benchmarks.executar --salvar         # grava a execução como nova baseline
+    python -m benchmarks.executar --banco /tmp/hotel.db --anos 3 --apartamentos 80
+
+Sai com código 1 se alguma rota regredir além da tolerância.
+"""
+import argparse
+import itertools
+import json
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+import uuid
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import event, func
+from benchmarks.gerador import criar_banco
+
+BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'baseline.json')
+# Diferenças menores que isto (ms) são ruído de medição, mesmo acima da tolerância percentual
+MARGEM_MS = 1.0
+
+_apartamentos_novos = itertools.count(1)
+
+
+def formulario_checkin():
+    """Dados de formulário de um check-in novo, em um apartamento ainda não usado"""
+    return {
+        'chave_idempotencia': uuid.uuid4().hex,
+        'numero_apartamento': f'B{next(_apartamentos_novos)}',
+        'data_checkout_prevista': '2099-01-01',
+        'nome_completo': 'Hóspede Benchmark', 'data_nascimento': '1985-05-20', 'documento': 'BENCH-1',
+        'cpf': '', 'ddd': '11', 'telefone': '999999999', 'email': 'bench@exemplo.com',
+        'endereco': 'Rua do Teste, 1', 'cep': '01000-000', 'cidade': 'São Paulo', 'estado': 'SP',
+        'pais': 'Brasil',
+        'acompanhante_0_nome_completo': 'Acompanhante Benchmark',
+        'acompanhante_0_data_nascimento': '1990-01-01',
+        'acompanhante_0_documento': 'BENCH-2',
+    }
+
+
+def cenarios(app):
+    """Rotas medidas: nome -> função que executa uma requisição e retorna o status"""
+    from src.models import db, Checkin, Hospede
+
+    with app.app_context():
+        # Check-in finalizado com mais hóspedes, para a página de detalhes
+        detalhes_id = db.session.query(Hospede.checkin_id).group_by(Hospede.checkin_id) \
+            .order_by(func.count(Hospede.id).desc(), Hospede.checkin_id.desc()).limit(1).scalar()
+
+    cliente = app.test_client()
+    criados = []
+
+    def get(url):
+        # Lê o corpo inteiro: respostas em streaming só executam as consultas ao serem consumidas
+        resposta = cliente.get(url)
+        resposta.get_data()
+        resposta.close()
+        return resposta.status_code
+
+    def criar():
+        # Cliente novo a cada envio: as mensagens flash não se acumulam na sessão
+        resposta = app.test_client().post('/criar-checkin', data=formulario_checkin())
+        with app.app_context():
+            criados.append(db.session.query(func.max(Checkin.id)).scalar())
+        return resposta.status_code
+
+    def finalizar():
+        if not criados:
+            criar()
+        return app.test_client().post(f'/finalizar-checkin/{criados.pop()}').status_code
+
+    return {
+        'index': lambda: get('/'),
+        'checkins_ativos': lambda: get('/checkins-ativos'),
+        'historico': lambda: get('/historico'),
+        'historico_filtrado': lambda: get('/historico?nome=silva&data_inicio=2000-01-01'),
+        'detalhes_checkin': lambda: get(f'/checkin/{detalhes_id}'),
+        'ocupacao': lambda: get('/ocupacao'),
+        'previsao': lambda: get('/previsao?dias=91'),
+        'api_checkins_ativos': lambda: get('/api/v1/checkins?status=Ativo'),
+        'criar_checkin': criar,
+        'finalizar_checkin': finalizar,
+    }
+
+
+def percentil(valores, p):
+    """Percentil p (0-100) por interpolação linear"""
+    ordenados = sorted(valores)
+    posicao = (len(ordenados) - 1) * p / 100
+    inferior = int(posicao)
+    superior = min(inferior + 1, len(ordenados) - 1)
+    return ordenados[inferior] + (ordenados[superior] - ordenados[inferior]) * (posicao - inferior)
+
+
+def medir(app, repeticoes):
+    """Executa cada cenário e retorna {rota: métricas}"""
+    from src.models import db
+
+    consultas = [0]
+    with app.app_context():
+        engine = db.engine
+
+    def contar(*args):
+        consultas[0] += 1
+
+    event.listen(engine, 'before_cursor_execute', contar)
+    resultados = {}
+    try:
+        for nome, executar in cenarios(app).items():
+            status = executar()  # aquecimento (caches, compilação de consultas e templates)
+            if status >= 400:
+                raise RuntimeError(f'{nome}: status HTTP {status}')
+
+            tempos, por_requisicao = [], []
+            for _ in range(repeticoes):
+                consultas[0] = 0
+                inicio = time.perf_counter()
+                executar()
+                tempos.append((time.perf_counter() - inicio) * 1000)
+                por_requisicao.append(consultas[0])
+
+            # Memória medida à parte: o tracemalloc deixa as requisições mais lentas
+            tracemalloc.start()
+            executar()
+            _, pico = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+
+            resultados[nome] = {
+                'p50_ms': round(percentil(tempos, 50), 2),
+                'p95_ms': round(percentil(tempos, 95), 2),
+                'consultas': max(por_requisicao),
+                'memoria_kib': round(pico / 1024),
+            }
+    finally:
+        event.remove(engine, 'before_cursor_execute', contar)
+    return resultados
+
+
+def comparar(resultados, baseline, tolerancia):
+    """Lista as regressões em relação à baseline (tempo acima da tolerância ou mais consultas)"""
+    regressoes = []
+    for nome, atual in resultados.items():
+        anterior = baseline.get(nome)
+        if not anterior:
+            continue
+        if atual['p50_ms'] > max(anterior['p50_ms'] * (1 + tolerancia), anterior['p50_ms'] + MARGEM_MS):
+            regressoes.append(f"{nome}: p50 {anterior['p50_ms']} -> {atual['p50_ms']} ms")
+        if atual['p95_ms'] > max(anterior['p95_ms'] * (1 + tolerancia * 2), anterior['p95_ms'] + MARGEM_MS * 2):
+            regressoes.append(f"{nome}: p95 {anterior['p95_ms']} -> {atual['p95_ms']} ms")
+        if atual['consultas'] > anterior['consultas']:
+            regressoes.append(f"{nome}: consultas {anterior['consultas']} -> {atual['consultas']}")
+    return regressoes
+
+
+def imprimir(resultados, baseline):
+    print(f'{"rota":<22} {"p50 ms":>9} {"p95 ms":>9} {"SQL":>5} {"mem KiB":>8} {"base p50":>9}')
+    for nome, m in resultados.items():
+        base = baseline.get(nome, {}).get('p50_ms', '-')
+        print(f'{nome:<22} {m["p50_ms"]:>9} {m["p95_ms"]:>9} {m["consultas"]:>5} {m["memoria_kib"]:>8} {base:>9}')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--banco', help='banco SQLite gerado (padrão: arquivo temporário)')
+    parser.add_argument('--anos', type=int, default=2)
+    parser.add_argument('--apartamentos', type=int, default=60)
+    parser.add_argument('--semente', type=int, default=42)
+    parser.add_argument('--repeticoes', type=int, default=30)
+    parser.add_argument('--tolerancia', type=float, default=0.25, help='aumento aceito no p50 (0.25 = 25%%)')
+    parser.add_argument('--baseline', default=BASELINE)
+    parser.add_argument('--salvar', action='store_true', help='grava os resultados como baseline')
+    args = parser.parse_args()
+
+    parametros = {'anos': args.anos, 'apartamentos': args.apartamentos, 'semente': args.semente}
+    caminho = args.banco or os.path.join(tempfile.mkdtemp(), 'benchmark.db')
+    app, (checkins, hospedes) = criar_banco(caminho, **parametros)
+    print(f'Banco sintético: {checkins} check-ins, {hospedes} hóspedes ({caminho})')
+
+    resultados = medir(app, args.repeticoes)
+
+    baseline = {}
+    if os.path.exists(args.baseline):
+        with open(args.baseline, encoding='utf-8') as arquivo:
+            salvo = json.load(arquivo)
+        if salvo.get('parametros') == parametros:
+            baseline = salvo.get('rotas', {})
+        else:
+            print(f'Baseline gerada com outros parâmetros ({salvo.get("parametros")}); sem comparação')
+    imprimir(resultados, baseline)
+
+    if args.salvar:
+        with open(args.baseline, 'w', encoding='utf-8') as arquivo:
+            json.dump({'parametros': parametros, 'python': sys.version.split()[0], 'rotas': resultados},
+                      arquivo, indent=2, ensure_ascii=False)
+            arquivo.write('\n')
+        print(f'Baseline gravada em {args.baseline}')
+        return
+
+    regressoes = comparar(resultados, baseline, args.tolerancia)
+    for regressao in regressoes:
+        print(f'REGRESSÃO {regressao}')
+    if regressoes:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,165 @@
+"""Gerador de dados sintéticos de hotel para os benchmarks.
+
+Preenche checkins/hospedes com N anos de estadias consecutivas por apartamento, com
+acompanhantes, hóspedes recorrentes e países de origem variados. A geração é
+determinística para a mesma semente.
+
+    python -m benchmarks.gerador --banco /tmp/hotel.db --anos 2 --apartamentos 60
+"""
+import argparse
+import os
+import random
+import sys
+from datetime import date, datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import func, insert, select
+from src.models import Checkin, Hospede
+from src.models.perfis import criar_perfis_existentes
+from src.models.estatisticas import recalcular_estatisticas
+
+NOMES = ['Ana', 'Bruno', 'Carla', 'Daniel', 'Eduarda', 'Felipe', 'Gabriela', 'Henrique', 'Isabela',
+         'João', 'Karina', 'Lucas', 'Mariana', 'Nicolas', 'Olívia', 'Pedro', 'Rafaela', 'Sérgio',
+         'Tatiana', 'Vinícius', 'Maria', 'José', 'Carlos', 'Juliana', 'Luiza', 'Miguel']
+SOBRENOMES = ['Silva', 'Santos', 'Oliveira', 'Souza', 'Rodrigues', 'Ferreira', 'Alves', 'Pereira',
+              'Lima', 'Gomes', 'Costa', 'Ribeiro', 'Martins', 'Carvalho', 'Araújo', 'Melo', 'Barbosa',
+              'Cardoso', 'Conceição', 'Müller', 'García', 'López', 'Rossi', 'Smith']
+# (país, peso): maioria de hóspedes nacionais
+PAISES = [('Brasil', 70), ('Argentina', 8), ('Uruguai', 4), ('Paraguai', 3), ('Chile', 3),
+          ('Estados Unidos', 4), ('Portugal', 3), ('Alemanha', 2), ('Itália', 2), ('França', 1)]
+CIDADES = [('São Paulo', 'SP'), ('Rio de Janeiro', 'RJ'), ('Belo Horizonte', 'MG'), ('Curitiba', 'PR'),
+           ('Porto Alegre', 'RS'), ('Salvador', 'BA'), ('Recife', 'PE'), ('Florianópolis', 'SC')]
+TAMANHO_LOTE = 5000
+
+
+def _pessoa(rnd, indice):
+    """Gera os dados fixos de uma pessoa (reaparecem quando ela volta ao hotel)"""
+    nome = f'{rnd.choice(NOMES)} {rnd.choice(SOBRENOMES)} {rnd.choice(SOBRENOMES)}'
+    nascimento = date(1940, 1, 1) + timedelta(days=rnd.randrange(365 * 80))
+    pais = rnd.choices([p for p, _ in PAISES], weights=[w for _, w in PAISES])[0]
+    cidade, estado = rnd.choice(CIDADES)
+    cpf = None
+    if pais == 'Brasil':
+        digitos = f'{indice:011d}'
+        cpf = f'{digitos[:3]}.{digitos[3:6]}.{digitos[6:9]}-{digitos[9:]}'
+    return {
+        'nome_completo': nome,
+        'data_nascimento': nascimento,
+        'documento': f'DOC{indice:08d}',
+        'orgao_expedidor': 'SSP' if pais == 'Brasil' else None,
+        'uf_documento': estado if pais == 'Brasil' else None,
+        'cpf': cpf,
+        'ddd': f'{rnd.randrange(11, 99)}',
+        'telefone': f'9{rnd.randrange(10 ** 7, 10 ** 8)}',
+        'email': f'hospede{indice}@exemplo.com' if rnd.random() < 0.7 else None,
+        'endereco': f'Rua {rnd.choice(SOBRENOMES)}, {rnd.randrange(1, 3000)}',
+        'cep': f'{rnd.randrange(10 ** 7, 10 ** 8)}',
+        'cidade': cidade if pais == 'Brasil' else None,
+        'estado': estado if pais == 'Brasil' else None,
+        'pais': pais,
+    }
+
+
+def _hospede(pessoa, checkin_id, is_principal):
+    """Valores da linha de hospedes para uma pessoa em um check-in"""
+    valores = dict(pessoa, checkin_id=checkin_id, is_principal=is_principal, observacoes=None)
+    valores['idade_registrada'] = Hospede.calcular_idade(pessoa['data_nascimento'])
+    if not is_principal:
+        for campo in ('endereco', 'cep', 'cidade', 'estado', 'pais'):
+            valores[campo] = None
+    valores.update(Hospede.indices_cegos(pessoa['cpf'], pessoa['documento'], None))
+    return valores
+
+
+def gerar_dados(conn, anos=2, apartamentos=60, semente=42, hoje=None):
+    """Insere `anos` de estadias em `apartamentos` apartamentos; retorna (check-ins, hóspedes)"""
+    rnd = random.Random(semente)
+    agora = datetime.utcnow() if hoje is None else datetime.combine(hoje, datetime.min.time()) + timedelta(hours=12)
+    hoje = agora.date()
+    inicio = hoje - timedelta(days=365 * anos)
+
+    proximo_id = (conn.execute(select(func.max(Checkin.__table__.c.id))).scalar() or 0) + 1
+    # ~30% de hóspedes recorrentes: o conjunto de pessoas é menor que o de estadias
+    pessoas = [_pessoa(rnd, indice) for indice in range(1, apartamentos * anos * 60)]
+
+    checkins, hospedes = [], []
+    total_checkins = total_hospedes = 0
+
+    def gravar():
+        nonlocal checkins, hospedes
+        if checkins:
+            conn.execute(insert(Checkin.__table__), checkins)
+            conn.execute(insert(Hospede.__table__), hospedes)
+        checkins, hospedes = [], []
+
+    for numero in range(apartamentos):
+        andar, quarto = divmod(numero, 20)
+        numero_apartamento = f'{andar + 1}{quarto + 1:02d}'
+        dia = inicio + timedelta(days=rnd.randrange(3))
+        while dia <= hoje:
+            noites = rnd.choice([1, 1, 2, 2, 3, 3, 4, 5, 7, 10, 14])
+            entrada = datetime.combine(dia, datetime.min.time()) + timedelta(hours=rnd.randrange(12, 23),
+                                                                              minutes=rnd.randrange(60))
+            entrada = min(entrada, agora)  # nenhum registro no futuro
+            saida_prevista = dia + timedelta(days=noites)
+            saida = entrada + timedelta(days=noites, hours=rnd.randrange(-10, 0))
+            ativo = saida >= agora
+            checkins.append({
+                'id': proximo_id,
+                'numero_apartamento': numero_apartamento,
+                'data_checkin': entrada,
+                'data_checkout_prevista': saida_prevista,
+                'data_checkout': None if ativo else saida,
+                'status': 'Ativo' if ativo else 'Finalizado',
+                'atualizado_em': entrada if ativo else saida,
+            })
+            grupo = rnd.sample(pessoas, 1 + rnd.choices([0, 1, 2, 3], weights=[40, 35, 15, 10])[0])
+            for posicao, pessoa in enumerate(grupo):
+                hospedes.append(_hospede(pessoa, proximo_id, posicao == 0))
+            total_checkins += 1
+            total_hospedes += len(grupo)
+            proximo_id += 1
+            if len(checkins) >= TAMANHO_LOTE:
+                gravar()
+            if ativo:
+                break
+            dia = saida_prevista + timedelta(days=rnd.choice([0, 0, 0, 1, 2, 5]))
+    gravar()
+
+    criar_perfis_existentes(conn)
+    recalcular_estatisticas(conn)
+    return total_checkins, total_hospedes
+
+
+def criar_banco(caminho, anos=2, apartamentos=60, semente=42):
+    """Cria um banco novo em `caminho` com o esquema atual e os dados sintéticos; retorna a app"""
+    from src.main import create_app
+    from src.models import db
+
+    for sufixo in ('', '-wal', '-shm'):
+        if os.path.exists(caminho + sufixo):
+            os.remove(caminho + sufixo)
+    # Sem as threads da fila de tarefas e dos webhooks: as consultas delas entrariam na contagem das rotas
+    app = create_app({'SQLALCHEMY_DATABASE_URI': f'sqlite:///{os.path.abspath(caminho)}', 'TAREFAS_NO_PROCESSO': False})
+    with app.app_context():
+        with db.engine.begin() as conn:
+            resultado = gerar_dados(conn, anos, apartamentos, semente)
+        from src.models.ocupacao import mapa_ocupacao
+        mapa_ocupacao.carregar()
+    return app, resultado
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--banco', required=True, help='arquivo SQLite a criar (sobrescrito)')
+    parser.add_argument('--anos', type=int, default=2)
+    parser.add_argument('--apartamentos', type=int, default=60)
+    parser.add_argument('--semente', type=int, default=42)
+    args = parser.parse_args()
+    _, (checkins, hospedes) = criar_banco(args.banco, args.anos, args.apartamentos, args.semente)
+    print(f'{checkins} check-ins e {hospedes} hóspedes gerados em {args.banco}')
+
+
+if __name__ == '__main__':
+    main()
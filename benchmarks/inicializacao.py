@@ -0,0 +1,178 @@
+"""Benchmark da inicialização (partida a frio) da aplicação.
+
+Cada medição roda em um processo Python novo, como no reinício de um quiosque:
+  - importação de src.main por `python -X importtime` (total e módulos mais caros);
+  - create_app() sobre um banco já migrado;
+  - primeira requisição das páginas, com o cache de templates vazio (frio) e preenchido (quente).
+Compara a mediana das execuções com benchmarks/baseline_inicializacao.json.
+
+    python -m benchmarks.inicializacao               # compara com a baseline
+    python -m benchmarks.inicializacao --salvar      # grava a execução como nova baseline
+    python -m benchmarks.inicializacao --modulos 25  # lista mais módulos da importação
+
+Sai com código 1 se alguma medição regredir além da tolerância.
+"""
+import argparse
+import json
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+
+BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'baseline_inicializacao.json')
+# Diferenças menores que isto (ms) são ruído de medição (disco, escalonador), mesmo acima da tolerância
+MARGEM_MS = 10.0
+PAGINAS = ('/', '/checkins-ativos', '/historico', '/ocupacao')
+
+# Executado em um processo novo; recebe o banco, o diretório do cache de templates e as páginas
+_PROCESSO = '''
+import json, sys, time
+inicio = time.perf_counter()
+from src.main import create_app
+importado = time.perf_counter()
+app = create_app({"SQLALCHEMY_DATABASE_URI": "sqlite:///" + sys.argv[1], "JINJA_CACHE_DIR": sys.argv[2],
+                  "TAREFAS_NO_PROCESSO": False})
+criado = time.perf_counter()
+cliente = app.test_client()
+for url in sys.argv[3:]:
+    resposta = cliente.get(url)
+    resposta.get_data()
+    assert resposta.status_code == 200, (url, resposta.status_code)
+pronto = time.perf_counter()
+print(json.dumps({"importacao_ms": (importado - inicio) * 1000, "create_app_ms": (criado - importado) * 1000,
+                  "primeiras_requisicoes_ms": (pronto - criado) * 1000}))
+'''
+
+
+def importtime():
+    """Importa src.main com -X importtime e retorna {módulo: (próprio µs, acumulado µs)}"""
+    processo = subprocess.run([sys.executable, '-X', 'importtime', '-c', 'import src.main'],
+                              cwd=RAIZ, capture_output=True, text=True, check=True)
+    modulos = {}
+    for linha in processo.stderr.splitlines():
+        if not linha.startswith('import time:') or 'self [us]' in linha:
+            continue
+        proprio, acumulado, nome = linha[len('import time:'):].split('|')
+        modulos[nome.strip()] = (int(proprio), int(acumulado))
+    return modulos
+
+
+def por_pacote(modulos):
+    """Tempo próprio somado por pacote de primeiro nível (flask, sqlalchemy, src, ...), em ms"""
+    totais = {}
+    for nome, (proprio, _) in modulos.items():
+        pacote = nome.split('.')[0]
+        totais[pacote] = totais.get(pacote, 0) + proprio / 1000
+    return dict(sorted(totais.items(), key=lambda item: item[1], reverse=True))
+
+
+def partida(banco, cache):
+    """Mede importação, create_app e primeiras requisições em um processo novo"""
+    processo = subprocess.run([sys.executable, '-c', _PROCESSO, banco, cache, *PAGINAS],
+                              cwd=RAIZ, capture_output=True, text=True)
+    if processo.returncode:
+        raise RuntimeError(processo.stderr)
+    return json.loads(processo.stdout.splitlines()[-1])
+
+
+def mediana(execucoes, chave):
+    return round(statistics.median(execucao[chave] for execucao in execucoes), 1)
+
+
+def medir(banco, repeticoes):
+    """Retorna (métricas em ms, módulos da última importação)"""
+    modulos = {}
+    importacoes = []
+    for _ in range(repeticoes):
+        modulos = importtime()
+        importacoes.append({'total': sum(proprio for proprio, _ in modulos.values()) / 1000,
+                            'src': por_pacote(modulos).get('src', 0)})
+
+    cache = tempfile.mkdtemp()
+    frias, quentes = [], []
+    try:
+        for _ in range(repeticoes):
+            shutil.rmtree(cache)
+            os.makedirs(cache)
+            frias.append(partida(banco, cache))
+            quentes.append(partida(banco, cache))
+    finally:
+        shutil.rmtree(cache, ignore_errors=True)
+
+    metricas = {
+        'importtime_total_ms': mediana(importacoes, 'total'),
+        'importtime_src_ms': mediana(importacoes, 'src'),
+        'create_app_ms': mediana(quentes, 'create_app_ms'),
+        'primeiras_requisicoes_frio_ms': mediana(frias, 'primeiras_requisicoes_ms'),
+        'primeiras_requisicoes_quente_ms': mediana(quentes, 'primeiras_requisicoes_ms'),
+    }
+    metricas['partida_quente_ms'] = round(
+        statistics.median(q['importacao_ms'] + q['create_app_ms'] + q['primeiras_requisicoes_ms'] for q in quentes), 1)
+    return metricas, modulos
+
+
+def imprimir(metricas, modulos, baseline, quantidade):
+    print(f'{"medição":<32} {"ms":>9} {"base":>9}')
+    for nome, valor in metricas.items():
+        print(f'{nome:<32} {valor:>9} {baseline.get(nome, "-"):>9}')
+
+    print('\nPacotes (tempo próprio de importação):')
+    for pacote, total in list(por_pacote(modulos).items())[:10]:
+        print(f'  {pacote:<30} {total:>8.1f} ms')
+    print('\nMódulos mais caros (acumulado):')
+    caros = sorted(modulos.items(), key=lambda item: item[1][1], reverse=True)[:quantidade]
+    for nome, (proprio, acumulado) in caros:
+        print(f'  {nome:<40} {acumulado / 1000:>8.1f} ms  (próprio {proprio / 1000:.1f})')
+
+
+def comparar(metricas, baseline, tolerancia):
+    """Lista as medições acima da baseline além da tolerância"""
+    return [f'{nome}: {baseline[nome]} -> {valor} ms' for nome, valor in metricas.items()
+            if nome in baseline and valor > max(baseline[nome] * (1 + tolerancia), baseline[nome] + MARGEM_MS)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--banco', help='banco SQLite gerado (padrão: arquivo temporário)')
+    parser.add_argument('--repeticoes', type=int, default=5)
+    parser.add_argument('--modulos', type=int, default=15, help='quantidade de módulos listados')
+    parser.add_argument('--tolerancia', type=float, default=0.25, help='aumento aceito (0.25 = 25%%)')
+    parser.add_argument('--baseline', default=BASELINE)
+    parser.add_argument('--salvar', action='store_true', help='grava os resultados como baseline')
+    args = parser.parse_args()
+
+    caminho = args.banco or os.path.join(tempfile.mkdtemp(), 'inicializacao.db')
+    # Gerado em outro processo: a importação medida não pode reaproveitar módulos já carregados
+    subprocess.run([sys.executable, '-m', 'benchmarks.gerador', '--banco', caminho, '--anos', '1',
+                    '--apartamentos', '30'], cwd=RAIZ, check=True, stdout=subprocess.DEVNULL)
+
+    metricas, modulos = medir(os.path.abspath(caminho), args.repeticoes)
+
+    baseline = {}
+    if os.path.exists(args.baseline):
+        with open(args.baseline, encoding='utf-8') as arquivo:
+            baseline = json.load(arquivo).get('metricas', {})
+    imprimir(metricas, modulos, baseline, args.modulos)
+
+    if args.salvar:
+        with open(args.baseline, 'w', encoding='utf-8') as arquivo:
+            json.dump({'python': sys.version.split()[0], 'metricas': metricas}, arquivo, indent=2,
+                      ensure_ascii=False)
+            arquivo.write('\n')
+        print(f'Baseline gravada em {args.baseline}')
+        return
+
+    regressoes = comparar(metricas, baseline, args.tolerancia)
+    for regressao in regressoes:
+        print(f'REGRESSÃO {regressao}')
+    if regressoes:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
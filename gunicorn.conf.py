@@ -0,0 +1,22 @@
+import multiprocessing
+import os
+
+# Configuração do gunicorn: gunicorn -c gunicorn.conf.py src.wsgi:app
+bind = os.environ.get('BIND', '0.0.0.0:5000')
+workers = int(os.environ.get('WEB_CONCURRENCY', multiprocessing.cpu_count() * 2 + 1))
+# Threads por worker; o pool de conexões do SQLAlchemy é dimensionado pelo mesmo valor
+threads = int(os.environ.get('THREADS_POR_WORKER', 4))
+worker_class = 'gthread'
+timeout = 30
+# Migrações e criação do índice de ocupação rodam uma vez no processo mestre
+preload_app = True
+accesslog = '-'
+
+
+def post_fork(server, worker):
+    """Descarta as conexões herdadas do processo mestre, de todos os bancos (propriedades); cada worker abre as suas"""
+    from src.models import db
+    from src.wsgi import app
+    with app.app_context():
+        for engine in db.engines.values():
+            engine.dispose(close=False)
@@ -0,0 +1,280 @@
+import functools
+import json
+import click
+from flask import current_app
+from flask.cli import with_appcontext
+from src.models import db, Hospede, Checkin
+from src.models.migrations import migrar, versao_atual, atribuir_propriedade, MIGRACOES
+from src.models.propriedades import banco_da_propriedade, dados_da_propriedade, usando_propriedade
+from src.models.importacao import importar_checkins, ler_csv
+from src.models.queries import filtrar_historico
+from src.utils.planilha import gerar_planilha
+from src.models.estatisticas import recalcular_estatisticas
+from src.models.contatos import normalizar_telefones
+from src.models.idades import recalcular_idades
+from src.models.arquivo import arquivar, restaurar
+from src.models.exportacao import EXPORTACOES, exportar_registros
+from src.models.tarefas import TrabalhadorTarefas, enfileirar_checkout_em_lote, enfileirar_recifragem
+from src.models.criptografia import acrescentar_chave, chaveiro
+from src.models.eventos import iniciar_despachante
+
+
+def com_propriedade(comando):
+    """Acrescenta a opção --propriedade: o comando usa o banco e os caches da propriedade informada"""
+    @click.option('--propriedade', default=None, help='Propriedade (hotel) do comando (padrão: a principal)')
+    @functools.wraps(comando)
+    def executar(*args, propriedade=None, **kwargs):
+        propriedade = propriedade or current_app.config['PROPRIEDADE_PADRAO']
+        if propriedade not in current_app.config['PROPRIEDADES']:
+            raise click.BadParameter(f'propriedade desconhecida: {propriedade}', param_hint='--propriedade')
+        with usando_propriedade(propriedade):
+            return comando(*args, **kwargs)
+    return executar
+
+
+@click.command('migrar')
+@with_appcontext
+def migrar_comando():
+    """Aplica as migrações de esquema pendentes no banco de cada propriedade"""
+    for propriedade_id in current_app.config['PROPRIEDADES']:
+        engine = banco_da_propriedade(propriedade_id)
+        aplicadas = migrar(engine, log=click.echo)
+        with engine.begin() as conn:
+            atribuir_propriedade(conn, propriedade_id)
+            versao = versao_atual(conn)
+        situacao = f'{len(aplicadas)} migrações aplicadas' if aplicadas else 'esquema já está atualizado'
+        click.echo(f'{propriedade_id}: {situacao}; versão {versao} (última: {MIGRACOES[-1][0]})')
+
+
+def consultas_das_rotas():
+    """Consultas executadas pelas rotas principais, para conferência dos planos"""
+    ordem = (Checkin.data_checkin.desc(), Checkin.id.desc())
+    return {
+        'checkins_ativos': Checkin.query.filter_by(status='Ativo'),
+        'hospedes_dos_checkins': Hospede.query.filter(Hospede.checkin_id.in_([1, 2, 3])),
+        'historico': filtrar_historico().order_by(*ordem).limit(31),
+        'historico_filtrado': filtrar_historico('maria', '2024-01-01', '2024-12-31').order_by(*ordem).limit(31),
+    }
+
+
+@click.command('verificar-indices')
+@with_appcontext
+@com_propriedade
+def verificar_indices_comando():
+    """Mostra o EXPLAIN QUERY PLAN das consultas das rotas e falha se alguma varrer uma tabela"""
+    sem_indice = []
+    for nome, query in consultas_das_rotas().items():
+        sql = str(query.statement.compile(banco_da_propriedade(), compile_kwargs={'literal_binds': True}))
+        with banco_da_propriedade().connect() as conn:
+            plano = [linha[3] for linha in conn.exec_driver_sql(f'EXPLAIN QUERY PLAN {sql}')]
+        click.echo(f'{nome}:')
+        for passo in plano:
+            click.echo(f'    {passo}')
+        if any(passo.startswith('SCAN ') and 'INDEX' not in passo for passo in plano):
+            sem_indice.append(nome)
+
+    if sem_indice:
+        raise click.ClickException(f'Consultas sem índice: {", ".join(sem_indice)}')
+    click.echo('Todas as consultas usam índices')
+
+
+@click.command('importar-checkins')
+@click.argument('arquivo', type=click.File('r', encoding='utf-8'))
+@with_appcontext
+@com_propriedade
+def importar_checkins_comando(arquivo):
+    """Importa check-ins em lote de um arquivo CSV ou JSON (grupos e excursões)"""
+    conteudo = arquivo.read()
+    if arquivo.name.lower().endswith('.json'):
+        registros = json.loads(conteudo)
+        if isinstance(registros, dict):
+            registros = registros.get('checkins', [])
+    else:
+        registros = ler_csv(conteudo)
+
+    checkin_ids, erros = importar_checkins(registros)
+    for item in erros:
+        click.echo(f"Linha {item['linha']}: {item['erro']}", err=True)
+    click.echo(f'{len(checkin_ids)} check-ins importados, {len(erros)} com erro')
+
+
+@click.command('recalcular-estatisticas')
+@with_appcontext
+@com_propriedade
+def recalcular_estatisticas_comando():
+    """Reconstrói as estatísticas diárias do painel a partir de todos os check-ins"""
+    with banco_da_propriedade().begin() as conn:
+        dias = recalcular_estatisticas(conn)
+    click.echo(f'Estatísticas recalculadas para {dias} dias')
+
+
+@click.command('normalizar-telefones')
+@click.option('--todos', is_flag=True, help='Recalcula também os telefones já normalizados')
+@with_appcontext
+@com_propriedade
+def normalizar_telefones_comando(todos):
+    """Preenche o telefone em formato E.164 dos hóspedes já cadastrados"""
+    with banco_da_propriedade().begin() as conn:
+        normalizados, invalidos = normalizar_telefones(conn, todos)
+    click.echo(f'{normalizados} telefones normalizados, {invalidos} sem número válido '
+               f'(país desconhecido ou telefone incompleto)')
+
+
+@click.command('recalcular-idades')
+@click.option('--lote', default=5000, show_default=True, help='Hóspedes por UPDATE')
+@with_appcontext
+@com_propriedade
+def recalcular_idades_comando(lote):
+    """Atualiza a idade gravada dos hóspedes com a idade atual (em lotes, direto no banco)"""
+    with banco_da_propriedade().connect() as conn:
+        total = recalcular_idades(conn, lote)
+    click.echo(f'{total} idades atualizadas')
+
+
+@click.command('trabalhador')
+@click.option('--intervalo', default=5, show_default=True, help='Segundos entre as verificações da fila')
+@with_appcontext
+def trabalhador_comando(intervalo):
+    """Processa a fila de tarefas e entrega os eventos aos webhooks (use com FLASK_TAREFAS_NO_PROCESSO=false nos servidores web)"""
+    click.echo('Processando a fila de tarefas (Ctrl+C para encerrar)')
+    app = current_app._get_current_object()
+    if iniciar_despachante(app):
+        click.echo(f'Entregando os eventos a {len(app.config["WEBHOOKS"])} webhook(s)')
+    trabalhador = TrabalhadorTarefas(app, intervalo)
+    try:
+        trabalhador.run()
+    except KeyboardInterrupt:
+        trabalhador.parar()
+
+
+@click.command('checkout-em-lote')
+@click.option('--data', default=None, help='Finaliza as saídas previstas até esta data (AAAA-MM-DD, padrão: hoje)')
+@with_appcontext
+@com_propriedade
+def checkout_em_lote_comando(data):
+    """Enfileira o checkout de todos os check-ins com saída prevista até a data"""
+    try:
+        tarefa_id = enfileirar_checkout_em_lote(data)
+    except ValueError as e:
+        raise click.ClickException(str(e))
+    click.echo(f'Tarefa {tarefa_id} enfileirada')
+
+
+@click.command('trocar-chave')
+@with_appcontext
+def trocar_chave_comando():
+    """Gera uma chave de criptografia nova no arquivo de chaves e a torna a atual"""
+    if current_app.config['CRIPTOGRAFIA_CHAVES']:
+        raise click.ClickException('As chaves vêm de CRIPTOGRAFIA_CHAVES: acrescente a nova chave na configuração, '
+                                   'aponte CRIPTOGRAFIA_CHAVE_ATUAL para ela e reinicie a aplicação')
+    chave_id = acrescentar_chave(current_app.config['CRIPTOGRAFIA_ARQUIVO'])
+    click.echo(f'Chave {chave_id} criada em {current_app.config["CRIPTOGRAFIA_ARQUIVO"]}. Reinicie a aplicação '
+               f'e execute `flask recifrar` em cada propriedade; mantenha as chaves anteriores no arquivo')
+
+
+@click.command('recifrar')
+@with_appcontext
+@com_propriedade
+def recifrar_comando():
+    """Enfileira a recifragem dos dados pessoais com a chave atual (após trocar a chave)"""
+    tarefa_id = enfileirar_recifragem()
+    click.echo(f'Tarefa {tarefa_id} enfileirada (chave {chaveiro().atual})')
+
+
+@click.command('exportar-historico')
+@click.argument('arquivo', type=click.Path(dir_okay=False, writable=True))
+@click.option('--conteudo', type=click.Choice(list(EXPORTACOES)), default='hospedes', show_default=True,
+              help='Ficha dos hóspedes ou uma linha por estadia')
+@click.option('--status', type=click.Choice(['Finalizado', 'Ativo', 'todos']), default='Finalizado', show_default=True)
+@click.option('--nome', default='', help='Filtro por hóspede (nome, ou CPF, documento ou telefone exatos)')
+@click.option('--inicio', default='', help='Check-ins a partir desta data (AAAA-MM-DD)')
+@click.option('--fim', default='', help='Check-ins até esta data (AAAA-MM-DD)')
+@with_appcontext
+@com_propriedade
+def exportar_historico_comando(arquivo, conteudo, status, nome, inicio, fim):
+    """Exporta o histórico para CSV ou XLSX (pela extensão do arquivo), com os filtros do histórico"""
+    formato = arquivo.rsplit('.', 1)[-1].lower()
+    if formato not in ('csv', 'xlsx'):
+        raise click.ClickException('Use um arquivo .csv ou .xlsx')
+    cabecalho, linhas = exportar_registros(conteudo, None if status == 'todos' else status, nome, inicio, fim)
+
+    quantidade = 0
+    def contar(linhas):
+        nonlocal quantidade
+        for linha in linhas:
+            quantidade += 1
+            yield linha
+
+    if formato == 'csv':
+        with open(arquivo, 'w', encoding='utf-8', newline='') as saida:
+            saida.writelines(gerar_planilha(formato, cabecalho, contar(linhas)))
+    else:
+        with open(arquivo, 'wb') as saida:
+            saida.writelines(gerar_planilha(formato, cabecalho, contar(linhas), conteudo))
+    click.echo(f'{quantidade} linhas exportadas para {arquivo}')
+
+
+@click.command('arquivar')
+@click.option('--dias', type=int, default=None, help='Arquiva os check-ins com checkout há mais de N dias '
+                                                    '(padrão: ARQUIVO_DIAS)')
+@click.option('--lote', default=500, show_default=True, help='Check-ins movidos por transação')
+@with_appcontext
+@com_propriedade
+def arquivar_comando(dias, lote):
+    """Move os check-ins finalizados antigos (e seus hóspedes) para o banco de arquivo"""
+    dias = dias if dias is not None else current_app.config['ARQUIVO_DIAS']
+    try:
+        with banco_da_propriedade().connect() as conn:
+            total = arquivar(conn, dias, lote)
+    except ValueError as e:
+        raise click.ClickException(str(e))
+    click.echo(f'{total} check-ins arquivados em {dados_da_propriedade()["arquivo"]}')
+
+
+@click.command('restaurar-arquivo')
+@click.option('--id', 'checkin_ids', type=int, multiple=True, help='Check-in a restaurar (pode repetir)')
+@click.option('--desde', type=click.DateTime(formats=['%Y-%m-%d']), default=None,
+              help='Restaura os check-ins com checkout a partir desta data')
+@with_appcontext
+@com_propriedade
+def restaurar_arquivo_comando(checkin_ids, desde):
+    """Traz check-ins do banco de arquivo de volta para o banco principal"""
+    if not checkin_ids and not desde:
+        raise click.ClickException('Informe --id ou --desde')
+    try:
+        with banco_da_propriedade().connect() as conn:
+            total = restaurar(conn, list(checkin_ids), desde)
+    except ValueError as e:
+        raise click.ClickException(str(e))
+    click.echo(f'{total} check-ins restaurados')
+
+
+@click.command('compilar-templates')
+@with_appcontext
+def compilar_templates_comando():
+    """Compila todos os templates para o cache em disco (JINJA_CACHE_DIR), antes da primeira requisição"""
+    ambiente = current_app.jinja_env
+    if ambiente.bytecode_cache is None:
+        raise click.ClickException('Cache de templates desativado (JINJA_CACHE_DIR)')
+    nomes = ambiente.list_templates()
+    for nome in nomes:
+        ambiente.get_template(nome)
+    click.echo(f'{len(nomes)} templates compilados em {current_app.config["JINJA_CACHE_DIR"]}')
+
+
+def registrar_comandos(app):
+    """Registra os comandos de linha de comando (flask --app src.main ...)"""
+    app.cli.add_command(migrar_comando)
+    app.cli.add_command(verificar_indices_comando)
+    app.cli.add_command(importar_checkins_comando)
+    app.cli.add_command(recalcular_estatisticas_comando)
+    app.cli.add_command(normalizar_telefones_comando)
+    app.cli.add_command(recalcular_idades_comando)
+    app.cli.add_command(trabalhador_comando)
+    app.cli.add_command(checkout_em_lote_comando)
+    app.cli.add_command(trocar_chave_comando)
+    app.cli.add_command(recifrar_comando)
+    app.cli.add_command(exportar_historico_comando)
+    app.cli.add_command(arquivar_comando)
+    app.cli.add_command(restaurar_arquivo_comando)
+    app.cli.add_command(compilar_templates_comando)
@@ -1,37 +1,158 @@
-
 import os
 import sys
 # DON'T CHANGE THIS !!!
 sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
 
 from flask import Flask, send_from_directory, render_template
+from jinja2 import FileSystemBytecodeCache
 from src.models import db, Hospede, Checkin
+from src.models.conexao import configurar_sqlite, caminho_arquivo, arquivo_preparado
+from src.models.criptografia import configurar_criptografia
+from src.models.migrations import migrar, esquema_atualizado, atribuir_propriedade
+from src.models.propriedades import (PROPRIEDADE_PRINCIPAL, banco_da_propriedade, configurar_propriedades,
+                                     rotear_por_propriedade)
+from src.models.ocupacao import garantir_indice_ocupacao
+from src.models.arquivo import preparar_arquivo
+from src.models.estatisticas import resumo_estatisticas
+from src.models.tarefas import iniciar_trabalhador
+from src.models.eventos import iniciar_despachante
 from src.routes.checkin import checkin_bp
+from src.routes.api import api_bp
+from src.routes.tarefas import tarefas_bp
+from src.routes.grupo import grupo_bp
+from src.cli import registrar_comandos
 from src.utils.country_codes import get_country_code_from_country
+from src.utils.instrumentacao import instrumentar
+from src.utils.cache_paginas import card_checkin
 
-app = Flask(__name__, 
-            static_folder=os.path.join(os.path.dirname(__file__), 'static'),
-            template_folder=os.path.join(os.path.dirname(__file__), 'templates'))
-app.config['SECRET_KEY'] = 'asdf#FGSgvasgf$5$WGT'
+# Threads por processo do servidor (gunicorn/waitress); o pool de conexões acompanha esse número
+THREADS_POR_WORKER = int(os.environ.get('THREADS_POR_WORKER', 4))
 
-# Adicionar a função ao ambiente Jinja2
-app.jinja_env.globals.update(get_country_code_from_country=get_country_code_from_country)
 
-# Registrar blueprints
-app.register_blueprint(checkin_bp)
+def create_app(config=None):
+    """Cria e configura a aplicação (usada pelo servidor de desenvolvimento e pelo src/wsgi.py)"""
+    app = Flask(__name__, 
+                static_folder=os.path.join(os.path.dirname(__file__), 'static'),
+                template_folder=os.path.join(os.path.dirname(__file__), 'templates'))
+    app.config['SECRET_KEY'] = 'asdf#FGSgvasgf$5$WGT'
+    app.config['SQLALCHEMY_DATABASE_URI'] = f"sqlite:///{os.path.join(os.path.dirname(__file__), 'database', 'app.db')}"
+    app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    app.config['SQLALCHEMY_ENGINE_OPTIONS'] = {
+        'pool_size': THREADS_POR_WORKER,
+        'max_overflow': THREADS_POR_WORKER,
+        'pool_timeout': 10,
+    }
+    app.config['SQLITE_BUSY_TIMEOUT'] = 5000  # ms
+    app.config['SQLITE_SYNCHRONOUS'] = 'NORMAL'
+    app.config['HISTORICO_POR_PAGINA'] = 30
+    app.config['HISTORICO_LIMITE_MAXIMO'] = 100
+    app.config['APARTAMENTOS'] = []  # Lista fixa de apartamentos do mapa de ocupação (opcional)
+    app.config['INSTRUMENTACAO'] = True  # Tempos por requisição/SQL e endpoint /metrics
+    app.config['INSTRUMENTACAO_CONSULTA_LENTA_MS'] = 200
+    app.config['INSTRUMENTACAO_PERFIL_DIR'] = None  # Diretório dos dumps do cProfile (?perfil=1)
+    app.config['TAREFAS_NO_PROCESSO'] = True  # Fila de tarefas processada por uma thread de cada worker
+    app.config['TAREFAS_INTERVALO'] = 5  # Segundos entre as verificações da fila
+    app.config['CHECKOUT_AUTOMATICO_HORARIO'] = None  # "HH:MM": finaliza as saídas vencidas do dia (opcional)
+    # Eventos dos check-ins (GET /api/v1/eventos): duração de cada conexão SSE (s) e retenção (dias)
+    app.config['EVENTOS_SSE_DURACAO'] = 300
+    app.config['EVENTOS_RETENCAO_DIAS'] = 30
+    # Horas em que um envio de check-in com chave de idempotência (formulário ou Idempotency-Key) pode ser repetido
+    # sem criar outro check-in
+    app.config['IDEMPOTENCIA_HORAS'] = 24
+    # Documento, CPF, endereço, telefone e e-mail dos hóspedes são gravados cifrados (AES-GCM).
+    # Chaves: id -> chave em base64 (16, 24 ou 32 bytes); os valores novos usam CRIPTOGRAFIA_CHAVE_ATUAL
+    # (padrão: a última). Vazio: as chaves ficam em CRIPTOGRAFIA_ARQUIVO, criado na primeira execução
+    app.config['CRIPTOGRAFIA_CHAVES'] = {}
+    app.config['CRIPTOGRAFIA_CHAVE_ATUAL'] = None
+    app.config['CRIPTOGRAFIA_CHAVE_INDICE'] = None  # Chave (base64) do HMAC dos índices cegos; não deve ser trocada
+    app.config['CRIPTOGRAFIA_ARQUIVO'] = os.path.join(app.instance_path, 'chaves.json')
+    # URLs que recebem os eventos em lotes (POST JSON), com nova tentativa em caso de falha
+    app.config['WEBHOOKS'] = []
+    app.config['WEBHOOKS_SEGREDO'] = None  # Assina o corpo com HMAC-SHA256 (cabeçalho X-Assinatura)
+    app.config['WEBHOOKS_TIMEOUT'] = 5  # Segundos por requisição
+    app.config['WEBHOOKS_INTERVALO'] = 5  # Segundos entre as verificações (eventos de outros processos e novas tentativas)
+    # Banco dos check-ins arquivados (padrão: ao lado do banco principal); vazio desliga o arquivo
+    app.config['ARQUIVO_BANCO'] = None
+    app.config['ARQUIVO_DIAS'] = 730  # Idade (dias desde o checkout) para o comando `flask arquivar`
+    # Propriedades (hotéis) atendidas: id -> {"nome", "banco"}. A primeira usa o banco principal;
+    # as demais, sem "banco", ficam em src/database/app_<id>.db. Endereços: /p/<id>/...
+    app.config['PROPRIEDADES'] = {PROPRIEDADE_PRINCIPAL: {'nome': 'Hotel'}}
+    app.config['PROPRIEDADES_THREADS'] = 4  # Bancos consultados ao mesmo tempo nos relatórios do grupo
+    # Templates compilados em disco, reaproveitados entre reinícios (padrão: instance/jinja); vazio desliga
+    app.config['JINJA_CACHE_DIR'] = os.path.join(app.instance_path, 'jinja')
+    # Variáveis de ambiente FLASK_* sobrescrevem os padrões (ex.: FLASK_SECRET_KEY)
+    app.config.from_prefixed_env()
+    if config:
+        app.config.update(config)
+    if app.config['ARQUIVO_BANCO'] is None:
+        app.config['ARQUIVO_BANCO'] = caminho_arquivo(app.config['SQLALCHEMY_DATABASE_URI'])
+    configurar_propriedades(app.config)
+    configurar_criptografia(app)
 
-# uncomment if you need to use database
-app.config['SQLALCHEMY_DATABASE_URI'] = f"sqlite:///{os.path.join(os.path.dirname(__file__), 'database', 'app.db')}"
-app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
-db.init_app(app)
-with app.app_context():
-    db.create_all()
+    if app.config['JINJA_CACHE_DIR']:
+        try:
+            os.makedirs(app.config['JINJA_CACHE_DIR'], exist_ok=True)
+            app.jinja_env.bytecode_cache = FileSystemBytecodeCache(app.config['JINJA_CACHE_DIR'])
+        except OSError:
+            # Sem permissão de escrita (ex.: disco somente leitura): os templates são compilados em memória
+            app.logger.warning('Cache de templates desativado: %s não pode ser criado', app.config['JINJA_CACHE_DIR'])
 
-@app.route('/')
-def index():
-    return render_template('index.html')
+    # Adicionar a função ao ambiente Jinja2
+    app.jinja_env.globals.update(get_country_code_from_country=get_country_code_from_country,
+                                 card_checkin=card_checkin)
 
+    @app.route('/', defaults={'propriedade': app.config['PROPRIEDADE_PADRAO']})
+    def index():
+        return render_template('index.html', estatisticas=resumo_estatisticas())
 
-if __name__ == '__main__':
-    app.run(host='0.0.0.0', port=5000, debug=True)
+    # Registrar blueprints (as rotas de cada propriedade também respondem em /p/<id>/...)
+    rotear_por_propriedade(app, checkin_bp, api_bp, tarefas_bp)
+    app.register_blueprint(grupo_bp)
+
+    db.init_app(app)
+    with app.app_context():
+        for propriedade_id, dados in app.config['PROPRIEDADES'].items():
+            configurar_sqlite(banco_da_propriedade(propriedade_id), app.config['SQLITE_BUSY_TIMEOUT'],
+                              app.config['SQLITE_SYNCHRONOUS'], dados['arquivo'])
+        if app.config['INSTRUMENTACAO']:
+            instrumentar(app, *db.engines.values())
+        for propriedade_id in app.config['PROPRIEDADES']:
+            preparar_banco(propriedade_id)
+
+    registrar_comandos(app)
+
+    if app.config['TAREFAS_NO_PROCESSO']:
+        # As threads só começam na primeira requisição: comandos da CLI não processam a fila
+        @app.before_request
+        def _iniciar_trabalhador():
+            iniciar_trabalhador(app)
+            iniciar_despachante(app)
+
+    return app
 
+
+def preparar_banco(propriedade_id):
+    """Cria as tabelas e aplica as migrações no banco da propriedade, só quando o esquema está desatualizado.
+
+    Com o banco na última versão (o caso de todo reinício), a verificação é uma leitura de
+    PRAGMA user_version; o mapa de ocupação é carregado na primeira consulta que o usar.
+    """
+    engine = banco_da_propriedade(propriedade_id)
+    with engine.connect() as conn:
+        atualizado = esquema_atualizado(conn)
+    if not atualizado:
+        db.metadata.create_all(engine)
+        migrar(engine)
+    with engine.begin() as conn:
+        garantir_indice_ocupacao(conn)
+        # Depois de uma migração o arquivo recebe as colunas e índices novos
+        if not atualizado or not arquivo_preparado(conn):
+            preparar_arquivo(conn)
+        if not atualizado:
+            atribuir_propriedade(conn, propriedade_id)
+
+
+if __name__ == '__main__':
+    app = create_app()
+    # Debug apenas quando pedido explicitamente (FLASK_DEBUG=1)
+    app.run(host='0.0.0.0', port=5000, debug=app.debug)
@@ -1,2 +1,2 @@
-from .models import db, Hospede, Checkin
-
+from .models import (db, Hospede, Checkin, CheckinFinalizado, Apartamento, PerfilHospede, EstatisticaDiaria,
+                     EstatisticaPais, Tarefa, Evento, Webhook, ChaveIdempotencia)
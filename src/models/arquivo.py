@@ -0,0 +1,203 @@
+import re
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from flask import current_app
+from sqlalchemy import select
+from sqlalchemy.exc import IntegrityError
+from .models import db, Checkin
+from .busca import DDL_INDICE_BUSCA
+from .conexao import ESQUEMA_ARQUIVO, MAPA_ARQUIVO, arquivo_anexado, arquivo_preparado
+
+# Check-ins movidos por transação (o lock de escrita é liberado entre os lotes)
+TAMANHO_LOTE = 500
+TABELAS_ARQUIVADAS = ('checkins', 'hospedes')
+COLUNAS_BUSCA = 'rowid, nome_completo'
+
+
+def _colunas(conn, esquema, tabela):
+    return [linha[1] for linha in conn.exec_driver_sql(f'PRAGMA {esquema}.table_info({tabela})')]
+
+
+def preparar_arquivo(conn):
+    """Cria (ou completa) no banco de arquivo as tabelas, índices e busca textual do banco principal.
+
+    O esquema é copiado do sqlite_master do banco principal, então colunas novas de
+    migrações futuras também são adicionadas ao arquivo.
+    """
+    if not arquivo_anexado(conn):
+        return False
+
+    for tabela in TABELAS_ARQUIVADAS:
+        ddl = conn.exec_driver_sql(
+            "SELECT sql FROM main.sqlite_master WHERE type = 'table' AND name = ?", (tabela,)
+        ).scalar()
+        existentes = _colunas(conn, ESQUEMA_ARQUIVO, tabela)
+        if not existentes:
+            # Tabelas recriadas por migração (ALTER TABLE ... RENAME) têm o nome entre aspas no DDL
+            conn.exec_driver_sql(re.sub(rf'^CREATE TABLE "?{tabela}"?', f'CREATE TABLE {ESQUEMA_ARQUIVO}.{tabela}', ddl))
+            continue
+        for _, coluna, tipo, *_ in conn.exec_driver_sql(f'PRAGMA main.table_info({tabela})'):
+            if coluna not in existentes:
+                conn.exec_driver_sql(f'ALTER TABLE {ESQUEMA_ARQUIVO}.{tabela} ADD COLUMN {coluna} {tipo}')
+
+    indices = conn.exec_driver_sql(
+        "SELECT sql FROM main.sqlite_master WHERE type = 'index' AND sql IS NOT NULL "
+        "AND tbl_name IN ('checkins', 'hospedes')"
+    ).scalars().all()
+    for ddl in indices:
+        ddl = ddl.replace('CREATE UNIQUE INDEX ', f'CREATE UNIQUE INDEX IF NOT EXISTS {ESQUEMA_ARQUIVO}.', 1)
+        ddl = ddl.replace('CREATE INDEX ', f'CREATE INDEX IF NOT EXISTS {ESQUEMA_ARQUIVO}.', 1)
+        conn.exec_driver_sql(ddl)
+
+    # Só a tabela FTS: no arquivo o índice é mantido pelo próprio arquivamento, sem triggers
+    conn.exec_driver_sql(DDL_INDICE_BUSCA[0].replace(
+        'IF NOT EXISTS hospedes_busca', f'IF NOT EXISTS {ESQUEMA_ARQUIVO}.hospedes_busca'))
+    _reservar_ids_arquivados(conn)
+    return True
+
+
+def _reservar_ids_arquivados(conn):
+    """Avança o AUTOINCREMENT do banco principal até o maior id arquivado.
+
+    Assim um check-in (ou hóspede) novo nunca recebe o id de um arquivado, o que faria a
+    restauração colidir com ele.
+    """
+    for tabela in TABELAS_ARQUIVADAS:
+        maior = conn.exec_driver_sql(f'SELECT max(id) FROM {ESQUEMA_ARQUIVO}.{tabela}').scalar()
+        if maior is None:
+            continue
+        atual = conn.exec_driver_sql('SELECT seq FROM main.sqlite_sequence WHERE name = ?', (tabela,)).scalar()
+        if atual is None:
+            conn.exec_driver_sql('INSERT INTO main.sqlite_sequence (name, seq) VALUES (?, ?)', (tabela, maior))
+        elif atual < maior:
+            conn.exec_driver_sql('UPDATE main.sqlite_sequence SET seq = ? WHERE name = ?', (maior, tabela))
+
+
+def recriar_busca_arquivo(conn):
+    """Recria a busca textual do arquivo com as colunas atuais e reindexa os hóspedes arquivados.
+
+    Também completa as tabelas do arquivo com as colunas novas (preparar_arquivo). Retorna
+    False se o arquivo não existe ainda.
+    """
+    if not arquivo_preparado(conn):
+        return False
+    conn.exec_driver_sql(f'DROP TABLE IF EXISTS {ESQUEMA_ARQUIVO}.hospedes_busca')
+    preparar_arquivo(conn)
+    conn.exec_driver_sql(f'INSERT INTO {ESQUEMA_ARQUIVO}.hospedes_busca ({COLUNAS_BUSCA}) '
+                         f'SELECT id, nome_completo FROM {ESQUEMA_ARQUIVO}.hospedes')
+    return True
+
+
+def _mover(conn, origem, destino, checkin_ids, copiados=()):
+    """Copia os check-ins (com hóspedes e busca textual) de um banco para o outro e os apaga da origem.
+
+    No arquivo a cópia substitui a de uma execução interrompida (INSERT OR REPLACE); no banco
+    principal é um INSERT simples, que falha em vez de sobrescrever um check-in com o mesmo id.
+    Os `copiados` já estão no destino e só são apagados da origem.
+    """
+    marcadores = ', '.join('?' * len(checkin_ids))
+    comando = 'INSERT OR REPLACE' if destino == ESQUEMA_ARQUIVO else 'INSERT'
+    novos = [checkin_id for checkin_id in checkin_ids if checkin_id not in copiados]
+    marcadores_novos = ', '.join('?' * len(novos))
+    for tabela, filtro in (('checkins', f'id IN ({marcadores_novos})'),
+                           ('hospedes', f'checkin_id IN ({marcadores_novos})')):
+        colunas = ', '.join(_colunas(conn, 'main', tabela))
+        conn.exec_driver_sql(f'{comando} INTO {destino}.{tabela} ({colunas}) '
+                             f'SELECT {colunas} FROM {origem}.{tabela} WHERE {filtro}', tuple(novos))
+
+    hospedes = f'SELECT id FROM {origem}.hospedes WHERE checkin_id IN ({marcadores})'
+    if destino == ESQUEMA_ARQUIVO:
+        # No banco principal a busca é mantida pelos triggers de hospedes
+        conn.exec_driver_sql(f'INSERT OR REPLACE INTO {destino}.hospedes_busca ({COLUNAS_BUSCA}) '
+                             f'SELECT {COLUNAS_BUSCA} FROM {origem}.hospedes_busca WHERE rowid IN ({hospedes})',
+                             tuple(checkin_ids))
+    else:
+        conn.exec_driver_sql(f'DELETE FROM {origem}.hospedes_busca WHERE rowid IN ({hospedes})', tuple(checkin_ids))
+
+    conn.exec_driver_sql(f'DELETE FROM {origem}.hospedes WHERE checkin_id IN ({marcadores})', tuple(checkin_ids))
+    conn.exec_driver_sql(f'DELETE FROM {origem}.checkins WHERE id IN ({marcadores})', tuple(checkin_ids))
+
+
+def arquivar(conn, dias, tamanho_lote=TAMANHO_LOTE):
+    """Move para o arquivo os check-ins finalizados com checkout há mais de `dias` dias.
+
+    Cada lote é confirmado em seguida. Em WAL a transação não é atômica entre os dois
+    bancos; se o processo cair entre eles, o check-in fica nos dois e a próxima execução
+    (INSERT OR REPLACE) conclui a movimentação. Retorna a quantidade de check-ins arquivados.
+    """
+    if not preparar_arquivo(conn):
+        raise ValueError('Banco de arquivo não configurado (ARQUIVO_BANCO)')
+    conn.commit()
+
+    checkins = Checkin.__table__
+    limite = datetime.utcnow() - timedelta(days=dias)
+    arquivados = 0
+    while True:
+        lote = conn.execute(
+            select(checkins.c.id)
+            .where(checkins.c.status == 'Finalizado', checkins.c.data_checkout < limite)
+            .order_by(checkins.c.id).limit(tamanho_lote)
+        ).scalars().all()
+        if not lote:
+            return arquivados
+        _mover(conn, 'main', ESQUEMA_ARQUIVO, lote)
+        conn.commit()
+        arquivados += len(lote)
+
+
+def restaurar(conn, checkin_ids=None, desde=None, tamanho_lote=TAMANHO_LOTE):
+    """Traz de volta ao banco principal os check-ins arquivados informados (ou com checkout a partir de `desde`).
+
+    Um check-in que já está nos dois bancos com o mesmo apartamento e entrada (restauração
+    interrompida) só é apagado do arquivo. Se um id do lote estiver em uso por outro registro,
+    a restauração para com ValueError e o lote fica no arquivo. Retorna a quantidade de
+    check-ins restaurados.
+    """
+    if not preparar_arquivo(conn):
+        raise ValueError('Banco de arquivo não configurado (ARQUIVO_BANCO)')
+    conn.commit()
+
+    consulta = select(Checkin.id)
+    if checkin_ids:
+        consulta = consulta.where(Checkin.id.in_(checkin_ids))
+    if desde:
+        consulta = consulta.where(Checkin.data_checkout >= desde)
+    ids = conn.execute(consulta.order_by(Checkin.id),
+                       execution_options={'schema_translate_map': MAPA_ARQUIVO}).scalars().all()
+
+    for inicio in range(0, len(ids), tamanho_lote):
+        lote = ids[inicio:inicio + tamanho_lote]
+        marcadores = ', '.join('?' * len(lote))
+        copiados = set(conn.exec_driver_sql(
+            f'SELECT a.id FROM {ESQUEMA_ARQUIVO}.checkins a JOIN main.checkins m ON m.id = a.id '
+            f'AND m.numero_apartamento = a.numero_apartamento AND m.data_checkin = a.data_checkin '
+            f'WHERE a.id IN ({marcadores})', tuple(lote)
+        ).scalars())
+        try:
+            _mover(conn, ESQUEMA_ARQUIVO, 'main', lote, copiados)
+        except IntegrityError:
+            conn.rollback()
+            raise ValueError(f'Check-ins {lote[0]} a {lote[-1]}: ids já usados por outros registros no banco '
+                             f'principal ({inicio} check-ins restaurados antes deste lote)')
+        conn.commit()
+    return len(ids)
+
+
+def arquivo_disponivel():
+    """Indica se a aplicação atual tem banco de arquivo configurado"""
+    return bool(current_app.config.get('ARQUIVO_BANCO'))
+
+
+@contextmanager
+def lendo_arquivo():
+    """Dentro do bloco, as consultas da sessão (Checkin, Hospede e busca textual) leem o banco de arquivo.
+
+    A sessão é encerrada antes e depois do bloco; tudo o que depender dos objetos
+    carregados (ex.: renderizar o template) deve acontecer dentro dele.
+    """
+    db.session.close()
+    db.session.connection(execution_options={'schema_translate_map': MAPA_ARQUIVO})
+    try:
+        yield
+    finally:
+        db.session.close()
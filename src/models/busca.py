@@ -0,0 +1,138 @@
+import re
+from sqlalchemy import Column, Integer, MetaData, Table, literal_column, or_, select, union_all
+from sqlalchemy.orm import load_only
+from src.utils.contato import telefone_e164
+from .criptografia import indice_cego
+from .models import db, Hospede, somente_digitos
+
+# Índice de busca textual (SQLite FTS5) sobre os nomes dos hóspedes. O rowid da tabela virtual
+# é o id do hóspede e o conteúdo é mantido por triggers, então qualquer inserção
+# em `hospedes` (formulário, API, importação) já fica pesquisável.
+# `remove_diacritics 2` torna a busca insensível a acentos ("joao" encontra "João").
+# Documento, CPF, telefone e e-mail ficam cifrados e fora do índice textual; CPF, documento
+# e telefone são encontrados pelos índices cegos (busca exata).
+# Table (e não table()) para que o schema_translate_map da leitura do arquivo também a alcance;
+# metadados próprios para o create_all não tentar criá-la.
+hospedes_busca = Table('hospedes_busca', MetaData(), Column('rowid', Integer), Column('rank'))
+
+TRIGGERS_BUSCA = ('hospedes_busca_insert', 'hospedes_busca_update', 'hospedes_busca_delete')
+
+DDL_INDICE_BUSCA = [
+    """
+    CREATE VIRTUAL TABLE IF NOT EXISTS hospedes_busca USING fts5(
+        nome_completo,
+        tokenize = 'unicode61 remove_diacritics 2',
+        prefix = '2 3'
+    )
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS hospedes_busca_insert AFTER INSERT ON hospedes BEGIN
+        INSERT INTO hospedes_busca (rowid, nome_completo) VALUES (new.id, new.nome_completo);
+    END
+    """,
+    # Só a troca do nome reindexa: regravar os dados cifrados (troca de chave) não mexe na busca
+    """
+    CREATE TRIGGER IF NOT EXISTS hospedes_busca_update AFTER UPDATE OF id, nome_completo ON hospedes BEGIN
+        DELETE FROM hospedes_busca WHERE rowid = old.id;
+        INSERT INTO hospedes_busca (rowid, nome_completo) VALUES (new.id, new.nome_completo);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS hospedes_busca_delete AFTER DELETE ON hospedes BEGIN
+        DELETE FROM hospedes_busca WHERE rowid = old.id;
+    END
+    """,
+]
+
+
+def criar_indice_busca(conn):
+    """Cria a tabela FTS5 e os triggers, e indexa os hóspedes já existentes"""
+    for ddl in DDL_INDICE_BUSCA:
+        conn.exec_driver_sql(ddl)
+    conn.exec_driver_sql("""
+        INSERT INTO hospedes_busca (rowid, nome_completo)
+        SELECT id, nome_completo FROM hospedes
+        WHERE id NOT IN (SELECT rowid FROM hospedes_busca)
+    """)
+
+
+def recriar_indice_busca(conn):
+    """Descarta a tabela FTS5 e os triggers anteriores e cria o índice com as colunas atuais"""
+    for trigger in TRIGGERS_BUSCA:
+        conn.exec_driver_sql(f'DROP TRIGGER IF EXISTS {trigger}')
+    conn.exec_driver_sql('DROP TABLE IF EXISTS hospedes_busca')
+    criar_indice_busca(conn)
+
+
+def expressao_busca(termo):
+    """Converte o texto digitado em uma consulta FTS5 de prefixos (todas as palavras)"""
+    palavras = re.findall(r'\w+', termo or '')
+    if not palavras:
+        return None
+    return ' '.join(f'"{palavra}"*' for palavra in palavras)
+
+
+def condicao_identificacao(termo):
+    """Condição que encontra o hóspede cujo CPF, documento ou telefone é o termo (índices cegos).
+
+    Só termos com algum dígito são tratados como identificação; None para os demais.
+    O telefone vale com ou sem o DDI (55 quando omitido).
+    """
+    if not termo or not any(c.isdigit() for c in termo):
+        return None
+    indices = Hospede.indices_cegos(termo, termo, None)
+    telefones = {telefone_e164(None, None, termo), '+' + somente_digitos(termo)}
+    return or_(Hospede.cpf_indice == indices['cpf_indice'],
+               Hospede.documento_indice == indices['documento_indice'],
+               Hospede.telefone_indice.in_([indice_cego('telefone', telefone) for telefone in telefones if telefone]))
+
+
+def ids_hospedes_por_termo(termo):
+    """Subconsulta com os ids dos hóspedes que correspondem ao termo: nome (FTS) ou CPF, documento e telefone exatos"""
+    por_nome = select(hospedes_busca.c.rowid).where(
+        literal_column('hospedes_busca').op('MATCH')(expressao_busca(termo))
+    )
+    identificacao = condicao_identificacao(termo)
+    if identificacao is None:
+        return por_nome
+    return union_all(por_nome, select(Hospede.id).where(identificacao))
+
+
+def buscar_hospedes(termo, limite=10):
+    """Busca hóspedes pelo nome ou pelo CPF, documento ou telefone exatos (identificação exata primeiro).
+
+    Só carrega nome, nascimento e perfil: os dados pessoais cifrados não são lidos nem decifrados.
+    """
+    expressao = expressao_busca(termo)
+    if not expressao:
+        return []
+
+    colunas = load_only(Hospede.id, Hospede.nome_completo, Hospede.data_nascimento, Hospede.perfil_id)
+    identificacao = condicao_identificacao(termo)
+    exatos = []
+    if identificacao is not None:
+        exatos = Hospede.query.options(colunas).filter(identificacao).order_by(
+            Hospede.id.desc()
+        ).limit(limite * 5).all()
+
+    encontrados = select(hospedes_busca.c.rowid, hospedes_busca.c.rank).where(
+        literal_column('hospedes_busca').op('MATCH')(expressao)
+    ).order_by(hospedes_busca.c.rank).limit(limite * 5).subquery()
+
+    # O mesmo hóspede aparece uma vez por estadia; mantém só a estadia mais recente
+    hospedes = db.session.query(Hospede).options(colunas).join(
+        encontrados, Hospede.id == encontrados.c.rowid
+    ).order_by(encontrados.c.rank, Hospede.id.desc()).all()
+
+    resultado = []
+    vistos = set()
+    for hospede in exatos + hospedes:
+        # O perfil agrupa as estadias da mesma pessoa (mesmo CPF ou documento)
+        chave = ('perfil', hospede.perfil_id) if hospede.perfil_id else ('hospede', hospede.id)
+        if chave in vistos:
+            continue
+        vistos.add(chave)
+        resultado.append(hospede)
+        if len(resultado) == limite:
+            break
+    return resultado
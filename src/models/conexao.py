@@ -0,0 +1,60 @@
+import os
+from sqlalchemy import event
+
+# Nome do banco de arquivo anexado (ATTACH) às conexões; tem as mesmas tabelas de check-ins e hóspedes
+ESQUEMA_ARQUIVO = 'arquivo'
+# Opção de execução que faz as consultas do ORM lerem as tabelas do arquivo
+MAPA_ARQUIVO = {None: ESQUEMA_ARQUIVO}
+
+
+def caminho_arquivo(uri):
+    """Caminho padrão do banco de arquivo: ao lado do banco principal (app.db -> app_arquivo.db)"""
+    if not uri.startswith('sqlite:///') or uri == 'sqlite:///:memory:':
+        return None
+    caminho = uri[len('sqlite:///'):]
+    raiz, extensao = os.path.splitext(caminho)
+    return f'{raiz}_arquivo{extensao or ".db"}'
+
+
+def caminho_propriedade(uri, propriedade_id):
+    """URI padrão do banco de uma propriedade: ao lado do banco principal (app.db -> app_<id>.db)"""
+    if not uri.startswith('sqlite:///') or uri == 'sqlite:///:memory:':
+        raise ValueError(f'Informe o banco da propriedade {propriedade_id} em PROPRIEDADES')
+    raiz, extensao = os.path.splitext(uri[len('sqlite:///'):])
+    return f'sqlite:///{raiz}_{propriedade_id}{extensao or ".db"}'
+
+
+def arquivo_anexado(conn):
+    """Indica se o banco de arquivo está anexado à conexão"""
+    return any(linha[1] == ESQUEMA_ARQUIVO for linha in conn.exec_driver_sql('PRAGMA database_list'))
+
+
+def arquivo_preparado(conn):
+    """Indica se o banco de arquivo está anexado e já tem as tabelas de check-ins"""
+    return arquivo_anexado(conn) and conn.exec_driver_sql(
+        f"SELECT 1 FROM {ESQUEMA_ARQUIVO}.sqlite_master WHERE type = 'table' AND name = 'checkins'"
+    ).first() is not None
+
+
+def configurar_sqlite(engine, busy_timeout=5000, synchronous='NORMAL', arquivo=None):
+    """Aplica os PRAGMAs de concorrência do SQLite a cada conexão nova do pool.
+    
+    WAL permite leituras simultâneas a uma escrita; busy_timeout faz a conexão esperar
+    pelo lock em vez de falhar com "database is locked"; synchronous=NORMAL é seguro em WAL
+    e evita um fsync por commit. Com `arquivo`, o banco de check-ins arquivados é anexado
+    como o esquema ESQUEMA_ARQUIVO.
+    """
+    if engine.dialect.name != 'sqlite':
+        return
+
+    @event.listens_for(engine, 'connect')
+    def _pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        cursor.execute('PRAGMA journal_mode=WAL')
+        cursor.execute(f'PRAGMA busy_timeout={int(busy_timeout)}')
+        cursor.execute(f'PRAGMA synchronous={synchronous}')
+        if arquivo:
+            cursor.execute(f'ATTACH DATABASE ? AS {ESQUEMA_ARQUIVO}', (arquivo,))
+            cursor.execute(f'PRAGMA {ESQUEMA_ARQUIVO}.journal_mode=WAL')
+            cursor.execute(f'PRAGMA {ESQUEMA_ARQUIVO}.synchronous={synchronous}')
+        cursor.close()
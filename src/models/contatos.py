@@ -0,0 +1,54 @@
+from datetime import datetime
+from sqlalchemy import bindparam, select, update
+from src.utils.contato import telefone_e164
+from .criptografia import indice_cego
+from .models import Checkin, Hospede
+
+TAMANHO_LOTE = 1000
+
+
+def normalizar_telefones(conn, todos=False, com_indice=True):
+    """Preenche hospedes.telefone_e164 (e o índice cego do telefone) dos cadastros existentes, em lotes por id.
+    
+    Por padrão só processa os hóspedes ainda sem telefone normalizado; com `todos`
+    recalcula todos (ex.: depois de ampliar a tabela de países). `com_indice=False` é
+    usado pela migração 7, anterior à coluna do índice. Retorna (hóspedes normalizados,
+    hóspedes sem telefone válido).
+    """
+    hospedes = Hospede.__table__
+    checkins = Checkin.__table__
+    normalizados = invalidos = 0
+    ultimo_id = 0
+
+    while True:
+        consulta = select(hospedes.c.id, hospedes.c.checkin_id, hospedes.c.pais, hospedes.c.ddd,
+                          hospedes.c.telefone, hospedes.c.telefone_e164) \
+            .where(hospedes.c.id > ultimo_id).order_by(hospedes.c.id).limit(TAMANHO_LOTE)
+        if not todos:
+            consulta = consulta.where(hospedes.c.telefone_e164.is_(None))
+        lote = conn.execute(consulta).all()
+        if not lote:
+            break
+        ultimo_id = lote[-1].id
+
+        alterados = []
+        for linha in lote:
+            numero = telefone_e164(linha.pais, linha.ddd, linha.telefone)
+            if numero is None:
+                invalidos += 1
+            else:
+                normalizados += 1
+            if numero != linha.telefone_e164:
+                alterado = {'_id': linha.id, '_checkin_id': linha.checkin_id, 'telefone_e164': numero}
+                if com_indice:
+                    alterado['telefone_indice'] = indice_cego('telefone', numero)
+                alterados.append(alterado)
+
+        if alterados:
+            valores = {coluna: bindparam(coluna) for coluna in alterados[0] if not coluna.startswith('_')}
+            conn.execute(update(hospedes).where(hospedes.c.id == bindparam('_id')).values(**valores), alterados)
+            # Nova versão dos check-ins afetados: descarta cards em cache e muda o ETag das páginas
+            conn.execute(update(checkins).where(checkins.c.id.in_({item['_checkin_id'] for item in alterados}))
+                         .values(atualizado_em=datetime.utcnow()))
+
+    return normalizados, invalidos
@@ -0,0 +1,205 @@
+import base64
+import binascii
+import hashlib
+import hmac
+import json
+import os
+import re
+from cryptography.exceptions import InvalidTag
+from cryptography.hazmat.primitives.ciphers.aead import AESGCM
+from flask import current_app
+from sqlalchemy.types import String, Text, TypeDecorator
+
+# Valor cifrado: "cfr:<id da chave>:<nonce + texto cifrado + tag, em base64>". Valores sem o prefixo
+# são texto puro gravado antes da cifragem (lidos como estão até a migração/troca de chave)
+PREFIXO = 'cfr:'
+TAMANHO_NONCE = 12
+# Índices cegos: HMAC-SHA256 truncado em 128 bits (32 caracteres hexadecimais)
+TAMANHO_INDICE = 32
+FORMATO_ID = re.compile(r'^[A-Za-z0-9_-]{1,20}$')
+
+
+def _ler_chave(texto, descricao):
+    try:
+        chave = base64.b64decode(texto, validate=True)
+    except (TypeError, binascii.Error):
+        raise ValueError(f'{descricao}: use uma chave em base64')
+    if len(chave) not in (16, 24, 32):
+        raise ValueError(f'{descricao}: a chave deve ter 16, 24 ou 32 bytes')
+    return chave
+
+
+def gerar_chave():
+    """Chave aleatória de 256 bits em base64 (cifragem ou índice cego)"""
+    return base64.b64encode(os.urandom(32)).decode('ascii')
+
+
+class Chaveiro:
+    """Chaves de cifragem dos dados pessoais (AES-GCM, por id) e chave dos índices cegos (HMAC).
+
+    Os valores novos são cifrados com a chave atual; os gravados com chaves anteriores
+    continuam legíveis enquanto elas estiverem no chaveiro (troca de chave gradual). O
+    contexto (nome do campo) entra como dado associado: um valor copiado para outro campo
+    não é decifrado.
+    """
+
+    def __init__(self, chaves, atual, chave_indice):
+        if not chaves:
+            raise ValueError('Nenhuma chave de criptografia configurada (CRIPTOGRAFIA_CHAVES)')
+        self._cifras = {}
+        for chave_id, chave in chaves.items():
+            chave_id = str(chave_id)
+            if not FORMATO_ID.match(chave_id):
+                raise ValueError(f'Identificador de chave inválido: {chave_id!r} (use letras, números, "-" ou "_")')
+            self._cifras[chave_id] = AESGCM(_ler_chave(chave, f'Chave de criptografia {chave_id}'))
+        self.atual = str(atual)
+        if self.atual not in self._cifras:
+            raise ValueError(f'Chave de criptografia atual desconhecida: {self.atual!r}')
+        self._prefixo_atual = f'{PREFIXO}{self.atual}:'
+        self._chave_indice = _ler_chave(chave_indice, 'Chave dos índices cegos (CRIPTOGRAFIA_CHAVE_INDICE)')
+
+    def cifrar(self, texto, contexto):
+        """Cifra o texto com a chave atual"""
+        nonce = os.urandom(TAMANHO_NONCE)
+        cifrado = self._cifras[self.atual].encrypt(nonce, texto.encode('utf-8'), contexto.encode('utf-8'))
+        return self._prefixo_atual + base64.b64encode(nonce + cifrado).decode('ascii')
+
+    def decifrar(self, valor, contexto):
+        """Texto original de um valor cifrado (valores em texto puro são devolvidos como estão)"""
+        if not valor.startswith(PREFIXO):
+            return valor
+        chave_id, _, conteudo = valor[len(PREFIXO):].partition(':')
+        cifra = self._cifras.get(chave_id)
+        if cifra is None:
+            raise ValueError(f'Valor de {contexto} cifrado com uma chave ausente do chaveiro: {chave_id!r}')
+        try:
+            bruto = base64.b64decode(conteudo)
+            texto = cifra.decrypt(bruto[:TAMANHO_NONCE], bruto[TAMANHO_NONCE:], contexto.encode('utf-8'))
+        except (binascii.Error, InvalidTag):
+            raise ValueError(f'Valor de {contexto} cifrado inválido ou adulterado')
+        return texto.decode('utf-8')
+
+    def atualizado(self, valor):
+        """Indica se o valor gravado já está cifrado com a chave atual (vazios não são cifrados)"""
+        return not valor or valor.startswith(self._prefixo_atual)
+
+    def indice(self, tipo, valor):
+        """Índice cego (HMAC) do valor já normalizado; o tipo separa índices de campos diferentes"""
+        return hmac.new(self._chave_indice, f'{tipo}:{valor}'.encode('utf-8'),
+                        hashlib.sha256).hexdigest()[:TAMANHO_INDICE]
+
+
+def chaveiro():
+    """Chaveiro da aplicação atual (montado em configurar_criptografia)"""
+    return current_app.extensions['criptografia']
+
+
+def indice_cego(tipo, valor):
+    """Índice cego do valor normalizado, ou None se ele estiver vazio"""
+    if not valor:
+        return None
+    return chaveiro().indice(tipo, valor)
+
+
+class TextoCifrado(TypeDecorator):
+    """Coluna de texto cifrada na gravação e decifrada na leitura (ORM e Core).
+
+    `length` é o tamanho do texto original (usado na validação); o SQLite não limita o
+    tamanho gravado. Comparações no SQL não funcionam com o valor cifrado: as buscas
+    exatas usam as colunas de índice cego.
+    """
+    impl = String
+    cache_ok = True
+
+    def __init__(self, contexto, length=None):
+        super().__init__(length)
+        self.contexto = contexto
+
+    def process_bind_param(self, valor, dialect):
+        if not valor:
+            return valor
+        return chaveiro().cifrar(valor, self.contexto)
+
+    def process_result_value(self, valor, dialect):
+        if not valor:
+            return valor
+        return chaveiro().decifrar(valor, self.contexto)
+
+
+class JsonCifrado(TypeDecorator):
+    """Coluna JSON gravada cifrada (texto puro JSON anterior à cifragem também é lido)"""
+    impl = Text
+    cache_ok = True
+
+    def __init__(self, contexto):
+        super().__init__()
+        self.contexto = contexto
+
+    def process_bind_param(self, valor, dialect):
+        if valor is None:
+            return None
+        return chaveiro().cifrar(json.dumps(valor, ensure_ascii=False), self.contexto)
+
+    def process_result_value(self, valor, dialect):
+        if valor is None:
+            return None
+        return json.loads(chaveiro().decifrar(valor, self.contexto))
+
+
+def ler_arquivo_chaves(caminho):
+    """Chaves gravadas no arquivo da instância; na primeira execução o arquivo é criado com chaves novas.
+
+    O arquivo é criado de forma exclusiva (O_EXCL), então vários processos iniciando juntos
+    usam as mesmas chaves; só o dono do processo pode lê-lo.
+    """
+    try:
+        with open(caminho, encoding='utf-8') as arquivo:
+            return json.load(arquivo)
+    except FileNotFoundError:
+        pass
+    os.makedirs(os.path.dirname(caminho) or '.', exist_ok=True)
+    dados = {'atual': '1', 'chaves': {'1': gerar_chave()}, 'indice': gerar_chave()}
+    try:
+        descritor = os.open(caminho, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+    except FileExistsError:
+        # Outro processo criou o arquivo ao mesmo tempo
+        with open(caminho, encoding='utf-8') as arquivo:
+            return json.load(arquivo)
+    with os.fdopen(descritor, 'w', encoding='utf-8') as arquivo:
+        json.dump(dados, arquivo, indent=2)
+    return dados
+
+
+def acrescentar_chave(caminho):
+    """Acrescenta uma chave nova ao arquivo de chaves e a torna a atual; retorna o id dela.
+
+    As chaves anteriores continuam no arquivo para ler os valores ainda não recifrados.
+    """
+    dados = ler_arquivo_chaves(caminho)
+    numericos = [int(chave_id) for chave_id in dados['chaves'] if chave_id.isdigit()]
+    chave_id = str(max(numericos, default=0) + 1)
+    dados['chaves'][chave_id] = gerar_chave()
+    dados['atual'] = chave_id
+    temporario = f'{caminho}.{os.getpid()}.tmp'
+    with os.fdopen(os.open(temporario, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600), 'w',
+                   encoding='utf-8') as arquivo:
+        json.dump(dados, arquivo, indent=2)
+    os.replace(temporario, caminho)
+    return chave_id
+
+
+def configurar_criptografia(app):
+    """Monta o chaveiro da aplicação: CRIPTOGRAFIA_CHAVES, ou o arquivo de chaves da instância se vazio"""
+    chaves = app.config['CRIPTOGRAFIA_CHAVES']
+    atual = app.config['CRIPTOGRAFIA_CHAVE_ATUAL']
+    chave_indice = app.config['CRIPTOGRAFIA_CHAVE_INDICE']
+    if not chaves:
+        if not app.config['CRIPTOGRAFIA_ARQUIVO']:
+            raise ValueError('Configure CRIPTOGRAFIA_CHAVES ou o arquivo de chaves (CRIPTOGRAFIA_ARQUIVO)')
+        dados = ler_arquivo_chaves(app.config['CRIPTOGRAFIA_ARQUIVO'])
+        chaves, atual = dados['chaves'], atual or dados['atual']
+        chave_indice = chave_indice or dados['indice']
+    if not chave_indice:
+        raise ValueError('Configure a chave dos índices cegos (CRIPTOGRAFIA_CHAVE_INDICE)')
+    app.extensions['criptografia'] = Chaveiro(chaves, atual or list(chaves)[-1], chave_indice)
+    return app.extensions['criptografia']
@@ -0,0 +1,120 @@
+from contextlib import contextmanager
+from .conexao import ESQUEMA_ARQUIVO, arquivo_preparado
+from .criptografia import JsonCifrado, TextoCifrado, chaveiro, indice_cego
+from .models import ChaveIdempotencia, Hospede, PerfilHospede, documento_normalizado
+
+# Linhas lidas e regravadas por transação
+TAMANHO_LOTE = 500
+
+
+def _indices_hospede(textos):
+    return Hospede.indices_cegos(textos['cpf'], textos['documento'], textos['telefone_e164'])
+
+
+def _indices_perfil(textos):
+    chave = textos['chave']
+    return {
+        # Chave em texto puro ("CPF:..."/"DOC:..."), anterior à cifragem: passa a ser o índice cego
+        'chave': indice_cego('perfil', chave) if ':' in chave else chave,
+        'documento_indice': indice_cego('documento', documento_normalizado(textos['documento'])),
+    }
+
+
+# Tabelas com colunas cifradas: tabela -> (colunas lidas em texto puro, colunas de índice, cálculo dos índices)
+TABELAS_CIFRADAS = {
+    'hospedes': (Hospede.__table__, (), ('cpf_indice', 'documento_indice', 'telefone_indice'), _indices_hospede),
+    'perfis_hospedes': (PerfilHospede.__table__, ('chave',), ('chave', 'documento_indice'), _indices_perfil),
+    'chaves_idempotencia': (ChaveIdempotencia.__table__, (), (), None),
+}
+
+
+def _colunas_cifradas(tabela):
+    return [coluna for coluna in tabela.columns if isinstance(coluna.type, (TextoCifrado, JsonCifrado))]
+
+
+def tabelas_cifradas(conn):
+    """(esquema, nome da tabela) com dados cifrados no banco da conexão, inclusive os hóspedes do arquivo"""
+    partes = [('main', nome) for nome in TABELAS_CIFRADAS]
+    if arquivo_preparado(conn):
+        partes.append((ESQUEMA_ARQUIVO, 'hospedes'))
+    return partes
+
+
+def contar_linhas(conn, partes):
+    """Total de linhas das tabelas (progresso da troca de chave)"""
+    return sum(conn.exec_driver_sql(f'SELECT count(*) FROM {esquema}.{nome}').scalar() for esquema, nome in partes)
+
+
+def recifrar_lote(conn, esquema, nome, apos=0, tamanho=TAMANHO_LOTE):
+    """Cifra com a chave atual as linhas seguintes a `apos` (rowid) e recalcula os índices cegos.
+
+    Valores em texto puro ou cifrados com outra chave são regravados; linhas já em dia
+    não são alteradas. O UPDATE só vale se a linha não mudou desde a leitura (gravação
+    simultânea, que já usa a chave atual). Retorna (último rowid lido, linhas lidas,
+    linhas regravadas); linhas lidas 0 indica o fim da tabela.
+    """
+    tabela, extras, colunas_indice, calcular_indices = TABELAS_CIFRADAS[nome]
+    cifradas = _colunas_cifradas(tabela)
+    lidas = list(dict.fromkeys([coluna.name for coluna in cifradas] + list(extras) + list(colunas_indice)))
+    linhas = conn.exec_driver_sql(
+        f'SELECT rowid, {", ".join(lidas)} FROM {esquema}.{nome} WHERE rowid > ? ORDER BY rowid LIMIT ?',
+        (apos, tamanho)
+    ).all()
+    if not linhas:
+        return apos, 0, 0
+
+    chaves = chaveiro()
+    alteradas = []
+    for rowid, *valores in linhas:
+        gravados = dict(zip(lidas, valores))
+        novos = dict(gravados)
+        textos = dict(gravados)
+        for coluna in cifradas:
+            valor = gravados[coluna.name]
+            if valor:
+                textos[coluna.name] = chaves.decifrar(valor, coluna.type.contexto)
+                if not chaves.atualizado(valor):
+                    novos[coluna.name] = chaves.cifrar(textos[coluna.name], coluna.type.contexto)
+        if calcular_indices:
+            novos.update(calcular_indices(textos))
+        if novos != gravados:
+            alteradas.append(tuple(novos[coluna] for coluna in lidas) + (rowid,)
+                             + tuple(gravados[coluna] for coluna in lidas))
+
+    if alteradas:
+        atribuicoes = ', '.join(f'{coluna} = ?' for coluna in lidas)
+        inalteradas = ' AND '.join(f'{coluna} IS ?' for coluna in lidas)
+        conn.exec_driver_sql(f'UPDATE {esquema}.{nome} SET {atribuicoes} WHERE rowid = ? AND {inalteradas}',
+                             alteradas)
+    return linhas[-1][0], len(linhas), len(alteradas)
+
+
+@contextmanager
+def apagando_com_seguranca(conn):
+    """Dentro do bloco, o SQLite zera o conteúdo das páginas liberadas (secure_delete): os valores
+    em texto puro (ou com a chave antiga) substituídos não ficam no arquivo do banco"""
+    esquemas = ['main'] + ([ESQUEMA_ARQUIVO] if arquivo_preparado(conn) else [])
+    for esquema in esquemas:
+        conn.exec_driver_sql(f'PRAGMA {esquema}.secure_delete = ON')
+    try:
+        yield
+    finally:
+        for esquema in esquemas:
+            conn.exec_driver_sql(f'PRAGMA {esquema}.secure_delete = OFF')
+
+
+def cifrar_dados_pessoais(conn, tamanho_lote=TAMANHO_LOTE):
+    """Cifra todos os dados pessoais ainda em texto puro (ou com outra chave) e preenche os índices cegos.
+
+    Usada pela migração, em uma única transação; a troca de chave com o sistema em uso é
+    a tarefa "recifrar" (src/models/tarefas.py). Retorna a quantidade de linhas regravadas.
+    """
+    regravadas = 0
+    for esquema, nome in tabelas_cifradas(conn):
+        apos = 0
+        while True:
+            apos, lidas, alteradas = recifrar_lote(conn, esquema, nome, apos, tamanho_lote)
+            if not lidas:
+                break
+            regravadas += alteradas
+    return regravadas
@@ -0,0 +1,115 @@
+from collections import Counter, defaultdict
+from datetime import date, timedelta
+from sqlalchemy import delete, func, insert, select
+from .models import db, Checkin, Hospede, EstatisticaDiaria, EstatisticaPais
+from .conexao import MAPA_ARQUIVO, arquivo_preparado
+
+
+def registrar_chegada(dia, hospedes, checkins=1):
+    """Atualiza as estatísticas do dia com check-ins novos (chamada antes do commit).
+    
+    `hospedes` é a lista de pares (país do hóspede principal, quantidade de hóspedes).
+    """
+    por_pais = Counter()
+    for pais, quantidade in hospedes:
+        por_pais[EstatisticaPais.normalizar_pais(pais)] += quantidade
+
+    EstatisticaDiaria.incrementar(dia, chegadas=checkins, hospedes=sum(por_pais.values()))
+    for pais, quantidade in por_pais.items():
+        EstatisticaPais.incrementar(dia, pais, quantidade)
+
+
+def recalcular_estatisticas(conn):
+    """Reconstrói as tabelas de estatísticas a partir de todos os check-ins; retorna o número de dias"""
+    checkins = Checkin.__table__
+    hospedes = Hospede.__table__
+    diarias = defaultdict(lambda: {'chegadas': 0, 'hospedes': 0, 'saidas': 0, 'noites': 0})
+    paises = Counter()
+
+    # Check-ins arquivados continuam contando nas estatísticas
+    fontes = [{}]
+    if arquivo_preparado(conn):
+        fontes.append({'schema_translate_map': MAPA_ARQUIVO})
+
+    for opcoes in fontes:
+        total_hospedes = dict(conn.execute(
+            select(hospedes.c.checkin_id, func.count(hospedes.c.id)).group_by(hospedes.c.checkin_id),
+            execution_options=opcoes
+        ).all())
+        pais_principal = dict(conn.execute(
+            select(hospedes.c.checkin_id, hospedes.c.pais).where(hospedes.c.is_principal == True),
+            execution_options=opcoes
+        ).all())
+
+        linhas = conn.execute(select(checkins.c.id, checkins.c.data_checkin, checkins.c.data_checkout),
+                              execution_options=opcoes)
+        for checkin_id, data_checkin, data_checkout in linhas:
+            quantidade = total_hospedes.get(checkin_id, 0)
+            dia = diarias[data_checkin.date()]
+            dia['chegadas'] += 1
+            dia['hospedes'] += quantidade
+            paises[(data_checkin.date(), EstatisticaPais.normalizar_pais(pais_principal.get(checkin_id)))] += quantidade
+            if data_checkout:
+                saida = diarias[data_checkout.date()]
+                saida['saidas'] += 1
+                saida['noites'] += (data_checkout - data_checkin).days
+
+    conn.execute(delete(EstatisticaDiaria.__table__))
+    conn.execute(delete(EstatisticaPais.__table__))
+    if diarias:
+        conn.execute(insert(EstatisticaDiaria.__table__),
+                     [{'dia': dia, **totais} for dia, totais in diarias.items()])
+    if paises:
+        conn.execute(insert(EstatisticaPais.__table__),
+                     [{'dia': dia, 'pais': pais, 'hospedes': quantidade}
+                      for (dia, pais), quantidade in paises.items()])
+    return len(diarias)
+
+
+def resumo_estatisticas(dias=30, paises=5):
+    """Indicadores do painel lidos das estatísticas diárias (O(dias), sem varrer check-ins).
+
+    `paises` limita o ranking de países (None traz todos, para somar com outras propriedades).
+    """
+    hoje = date.today()
+    inicio = hoje - timedelta(days=dias - 1)
+
+    # Ocupação no início do período = chegadas - saídas acumuladas até a véspera
+    ocupados = db.session.query(
+        func.coalesce(func.sum(EstatisticaDiaria.chegadas - EstatisticaDiaria.saidas), 0)
+    ).filter(EstatisticaDiaria.dia < inicio).scalar()
+
+    por_dia = {linha.dia: linha for linha in
+               EstatisticaDiaria.query.filter(EstatisticaDiaria.dia >= inicio, EstatisticaDiaria.dia <= hoje)}
+    serie = []
+    for deslocamento in range(dias):
+        dia = inicio + timedelta(days=deslocamento)
+        linha = por_dia.get(dia)
+        chegadas = linha.chegadas if linha else 0
+        saidas = linha.saidas if linha else 0
+        ocupados += chegadas - saidas
+        serie.append({'dia': dia, 'chegadas': chegadas, 'saidas': saidas,
+                      'hospedes': linha.hospedes if linha else 0, 'ocupados': ocupados})
+
+    total_saidas = sum(linha.saidas for linha in por_dia.values())
+    total_noites = sum(linha.noites for linha in por_dia.values())
+    paises = db.session.execute(
+        select(EstatisticaPais.pais, func.sum(EstatisticaPais.hospedes).label('hospedes'))
+        .where(EstatisticaPais.dia >= inicio)
+        .group_by(EstatisticaPais.pais)
+        .order_by(func.sum(EstatisticaPais.hospedes).desc())
+        .limit(paises)
+    ).all()
+
+    return {
+        'dias': dias,
+        'hoje': serie[-1],
+        'ocupados': ocupados,
+        'chegadas': sum(item['chegadas'] for item in serie),
+        'saidas': total_saidas,
+        'hospedes': sum(item['hospedes'] for item in serie),
+        'noites': total_noites,
+        'media_estadia': round(total_noites / total_saidas, 1) if total_saidas else 0,
+        'paises': [{'pais': pais, 'hospedes': hospedes} for pais, hospedes in paises],
+        'serie': serie
+    }
@@ -0,0 +1,265 @@
+import hashlib
+import hmac
+import json
+import logging
+import os
+import threading
+import time
+import urllib.request
+from datetime import datetime, timedelta
+from sqlalchemy import event, func, or_, select, update
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from .models import db, Evento, Webhook
+from .propriedades import SessaoPorPropriedade, propriedade_atual, usando_propriedade
+
+logger = logging.getLogger(__name__)
+
+# Eventos devolvidos por consulta (padrão e máximo) e espera máxima do long-poll, em segundos
+LIMITE_PADRAO = 100
+LIMITE_MAXIMO = 1000
+ESPERA_MAXIMA = 60
+# Sem aviso deste processo, a tabela é relida neste intervalo (eventos gravados por outros workers)
+INTERVALO_VERIFICACAO = 1.0
+# Entrega aos webhooks: eventos por POST, espera entre as verificações e reserva de um webhook por um processo
+TAMANHO_LOTE = 100
+INTERVALO = 5
+TEMPO_RESERVA = timedelta(minutes=2)
+# Espera após falhas seguidas: 2 s, 4 s, 8 s... até ESPERA_MAXIMA_FALHA
+ESPERA_MAXIMA_FALHA = timedelta(minutes=10)
+
+# Avisa os consumidores deste processo (long-poll, SSE e despachante) a cada commit com eventos
+_aviso = threading.Condition()
+_geracao = 0
+_novos_eventos = threading.Event()
+_trava_inicio = threading.Lock()
+
+
+@event.listens_for(SessaoPorPropriedade, 'after_commit')
+def _avisar_apos_commit(sessao):
+    global _geracao
+    if sessao.info.pop('eventos_gravados', False):
+        with _aviso:
+            _geracao += 1
+            _aviso.notify_all()
+        _novos_eventos.set()
+
+
+@event.listens_for(SessaoPorPropriedade, 'after_rollback')
+def _descartar_aviso(sessao):
+    sessao.info.pop('eventos_gravados', None)
+
+
+def ler_posicao(texto):
+    """Posição no fluxo (id do último evento recebido); levanta ValueError se inválida"""
+    if texto in (None, ''):
+        return 0
+    try:
+        posicao = int(texto)
+    except (TypeError, ValueError):
+        raise ValueError('Posição inválida; informe o id do último evento recebido')
+    if posicao < 0:
+        raise ValueError('Posição inválida; informe o id do último evento recebido')
+    return posicao
+
+
+def ler_tipos(texto):
+    """Tipos de evento separados por vírgula (vazio: todos); levanta ValueError se algum for desconhecido"""
+    if not texto:
+        return None
+    tipos = [tipo.strip() for tipo in texto.split(',') if tipo.strip()]
+    desconhecidos = [tipo for tipo in tipos if tipo not in Evento.TIPOS]
+    if desconhecidos:
+        raise ValueError(f'Tipo de evento desconhecido: {", ".join(desconhecidos)} '
+                         f'(use {", ".join(Evento.TIPOS)})')
+    return tipos
+
+
+def eventos_apos(posicao, limite=LIMITE_PADRAO, tipos=None):
+    """Eventos com id maior que `posicao`, em ordem (busca pela chave primária)"""
+    consulta = select(Evento).where(Evento.id > posicao)
+    if tipos:
+        consulta = consulta.where(Evento.tipo.in_(tipos))
+    return db.session.execute(consulta.order_by(Evento.id).limit(limite)).scalars().all()
+
+
+def ultima_posicao():
+    """Id do último evento gravado (0 se não houver)"""
+    return db.session.execute(select(func.max(Evento.id))).scalar() or 0
+
+
+def geracao_atual():
+    """Contador de commits com eventos neste processo; passe a aguardar_aviso para não perder um aviso"""
+    return _geracao
+
+
+def aguardar_aviso(geracao, espera):
+    """Espera até `espera` segundos por um commit com eventos neste processo após a `geracao` informada"""
+    with _aviso:
+        if _geracao == geracao:
+            _aviso.wait(espera)
+        return _geracao != geracao
+
+
+def esperar_eventos(posicao, espera, limite=LIMITE_PADRAO, tipos=None):
+    """Eventos após `posicao`; se ainda não houver, espera até `espera` segundos pelos próximos.
+
+    Um commit com eventos neste processo acorda a espera na hora; os de outros processos
+    são vistos na releitura a cada INTERVALO_VERIFICACAO. Durante a espera a sessão é
+    encerrada, devolvendo a conexão ao pool (e sem segurar o snapshot de leitura do WAL).
+    """
+    fim = time.monotonic() + espera
+    while True:
+        geracao = geracao_atual()
+        eventos = eventos_apos(posicao, limite, tipos)
+        restante = fim - time.monotonic()
+        if eventos or restante <= 0:
+            return eventos
+        db.session.close()
+        aguardar_aviso(geracao, min(restante, INTERVALO_VERIFICACAO))
+
+
+def remover_eventos_antigos(dias, webhooks=()):
+    """Apaga os eventos com mais de `dias` dias que já foram entregues a todos os webhooks; retorna a quantidade"""
+    limite = datetime.utcnow() - timedelta(days=dias)
+    consulta = Evento.__table__.delete().where(Evento.criado_em < limite)
+    if webhooks:
+        # Eventos ainda não entregues a algum webhook (ex.: fora do ar) são mantidos
+        entregue = select(func.min(Webhook.ultimo_evento)).where(Webhook.url.in_(webhooks)).scalar_subquery()
+        consulta = consulta.where(Evento.id <= func.coalesce(entregue, 0))
+    removidos = db.session.execute(consulta).rowcount
+    db.session.commit()
+    return removidos
+
+
+def _reservar(url):
+    """Reserva o webhook para este processo, se não estiver reservado nem aguardando nova tentativa.
+
+    Retorna o último evento entregue, ou None se o webhook não estiver disponível. A reserva
+    é um único UPDATE, então cada lote é enviado por um só processo.
+    """
+    agora = datetime.utcnow()
+    db.session.execute(sqlite_insert(Webhook.__table__).values(url=url, ultimo_evento=0, falhas=0)
+                       .on_conflict_do_nothing(index_elements=['url']))
+    tabela = Webhook.__table__
+    posicao = db.session.execute(
+        update(tabela)
+        .where(tabela.c.url == url,
+               or_(tabela.c.reservado_ate.is_(None), tabela.c.reservado_ate < agora),
+               or_(tabela.c.proxima_tentativa.is_(None), tabela.c.proxima_tentativa <= agora))
+        .values(reservado_ate=agora + TEMPO_RESERVA)
+        .returning(tabela.c.ultimo_evento)
+    ).scalar()
+    db.session.commit()
+    return posicao
+
+
+def _liberar(url, **valores):
+    db.session.execute(update(Webhook.__table__).where(Webhook.__table__.c.url == url)
+                       .values(reservado_ate=None, **valores))
+    db.session.commit()
+
+
+def enviar(url, eventos, segredo=None, timeout=5):
+    """POST de um lote de eventos (já serializados) em JSON; levanta OSError (urllib) se a resposta não for 2xx.
+
+    Com `segredo`, o corpo é assinado com HMAC-SHA256 no cabeçalho X-Assinatura.
+    """
+    corpo = json.dumps({'propriedade': propriedade_atual(), 'eventos': eventos},
+                       ensure_ascii=False).encode('utf-8')
+    cabecalhos = {'Content-Type': 'application/json', 'User-Agent': 'sistema-check-in'}
+    if segredo:
+        assinatura = hmac.new(segredo.encode('utf-8'), corpo, hashlib.sha256).hexdigest()
+        cabecalhos['X-Assinatura'] = f'sha256={assinatura}'
+    requisicao = urllib.request.Request(url, data=corpo, headers=cabecalhos, method='POST')
+    with urllib.request.urlopen(requisicao, timeout=timeout) as resposta:
+        resposta.read()
+
+
+def despachar(url, segredo=None, timeout=5, tamanho_lote=TAMANHO_LOTE):
+    """Entrega ao webhook os eventos pendentes da propriedade atual, em lotes; retorna a quantidade entregue.
+
+    A posição só avança depois de uma resposta 2xx, então a entrega é "pelo menos uma
+    vez": o consumidor descarta os ids já recebidos. Após uma falha, o webhook aguarda
+    (2 s, 4 s, 8 s... até ESPERA_MAXIMA_FALHA) antes de receber o mesmo lote de novo.
+    """
+    posicao = _reservar(url)
+    if posicao is None:
+        return 0
+    entregues = 0
+    try:
+        while eventos := eventos_apos(posicao, tamanho_lote):
+            lote = [evento.to_dict() for evento in eventos]
+            # A leitura termina antes do POST, que pode demorar
+            db.session.commit()
+            enviar(url, lote, segredo, timeout)
+            posicao = lote[-1]['id']
+            entregues += len(lote)
+            # Avança a posição e renova a reserva a cada lote
+            db.session.execute(update(Webhook.__table__).where(Webhook.__table__.c.url == url).values(
+                ultimo_evento=posicao, falhas=0, proxima_tentativa=None, ultimo_erro=None,
+                reservado_ate=datetime.utcnow() + TEMPO_RESERVA))
+            db.session.commit()
+    except Exception as e:
+        db.session.rollback()
+        falhas = (db.session.get(Webhook, url).falhas or 0) + 1
+        espera = min(timedelta(seconds=2 ** falhas), ESPERA_MAXIMA_FALHA)
+        logger.warning('Falha ao entregar eventos ao webhook %s (%s tentativa(s)): %s', url, falhas, e)
+        _liberar(url, falhas=falhas, proxima_tentativa=datetime.utcnow() + espera,
+                 ultimo_erro=str(e) or e.__class__.__name__)
+        return entregues
+    _liberar(url)
+    return entregues
+
+
+def despachar_pendentes(app):
+    """Entrega os eventos pendentes de todas as propriedades a todos os webhooks configurados"""
+    entregues = 0
+    with app.app_context():
+        try:
+            for propriedade_id in app.config['PROPRIEDADES']:
+                with usando_propriedade(propriedade_id):
+                    for url in app.config['WEBHOOKS']:
+                        entregues += despachar(url, app.config['WEBHOOKS_SEGREDO'], app.config['WEBHOOKS_TIMEOUT'])
+        finally:
+            db.session.remove()
+    return entregues
+
+
+class DespachanteEventos(threading.Thread):
+    """Thread que entrega os eventos aos webhooks (uma por processo)"""
+
+    def __init__(self, app, intervalo=INTERVALO):
+        super().__init__(name='despachante-eventos', daemon=True)
+        self.app = app
+        self.intervalo = intervalo
+        self.pid = os.getpid()
+        self._parar = threading.Event()
+
+    def parar(self):
+        self._parar.set()
+        _novos_eventos.set()
+
+    def run(self):
+        while not self._parar.is_set():
+            _novos_eventos.clear()
+            try:
+                despachar_pendentes(self.app)
+            except Exception:
+                logger.exception('Falha ao entregar os eventos aos webhooks')
+            _novos_eventos.wait(self.intervalo)
+
+
+def iniciar_despachante(app):
+    """Inicia o despachante de webhooks deste processo (se houver WEBHOOKS), como o trabalhador de tarefas"""
+    if not app.config['WEBHOOKS']:
+        return None
+    despachante = app.extensions.get('despachante_eventos')
+    if despachante is not None and despachante.pid == os.getpid() and despachante.is_alive():
+        return despachante
+    with _trava_inicio:
+        despachante = app.extensions.get('despachante_eventos')
+        if despachante is None or despachante.pid != os.getpid() or not despachante.is_alive():
+            despachante = DespachanteEventos(app, app.config['WEBHOOKS_INTERVALO'])
+            despachante.start()
+            app.extensions['despachante_eventos'] = despachante
+    return despachante
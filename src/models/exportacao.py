@@ -0,0 +1,81 @@
+from sqlalchemy import Integer, String, case, cast, func, select, type_coerce
+from .models import Checkin, Hospede
+from .queries import filtrar_checkins
+
+# Registros lidos do cursor por vez; a memória da exportação não cresce com o período
+TAMANHO_LOTE = 1000
+
+
+def _data_hora(coluna):
+    """Data e hora já formatadas pelo SQLite (evita converter para datetime e de volta para texto)"""
+    return func.strftime('%Y-%m-%d %H:%M:%S', coluna)
+
+
+def _data(coluna):
+    """Data como gravada no banco (AAAA-MM-DD), sem conversão para date"""
+    return type_coerce(coluna, String)
+
+
+# (cabeçalho, coluna) de cada exportação; as datas saem como texto
+COLUNAS_HOSPEDES = (
+    ('checkin_id', Checkin.id),
+    ('numero_apartamento', Checkin.numero_apartamento),
+    ('data_checkin', _data_hora(Checkin.data_checkin)),
+    ('data_checkout_prevista', _data(Checkin.data_checkout_prevista)),
+    ('data_checkout', _data_hora(Checkin.data_checkout)),
+    ('status', Checkin.status),
+    ('tipo', case((Hospede.is_principal == True, 'principal'), else_='acompanhante')),
+    ('nome_completo', Hospede.nome_completo),
+    ('data_nascimento', _data(Hospede.data_nascimento)),
+    ('documento', Hospede.documento),
+    ('orgao_expedidor', Hospede.orgao_expedidor),
+    ('uf_documento', Hospede.uf_documento),
+    ('cpf', Hospede.cpf),
+    ('endereco', Hospede.endereco),
+    ('cep', Hospede.cep),
+    ('cidade', Hospede.cidade),
+    ('estado', Hospede.estado),
+    ('pais', Hospede.pais),
+    ('telefone', Hospede.telefone_e164),
+    ('email', Hospede.email),
+)
+
+COLUNAS_CHECKINS = (
+    ('checkin_id', Checkin.id),
+    ('numero_apartamento', Checkin.numero_apartamento),
+    ('data_checkin', _data_hora(Checkin.data_checkin)),
+    ('data_checkout_prevista', _data(Checkin.data_checkout_prevista)),
+    ('data_checkout', _data_hora(Checkin.data_checkout)),
+    ('status', Checkin.status),
+    ('noites', cast(func.julianday(Checkin.data_checkout) - func.julianday(Checkin.data_checkin), Integer)),
+    ('hospede_principal', Hospede.nome_completo),
+    ('documento', Hospede.documento),
+    ('pais', Hospede.pais),
+    ('total_hospedes', select(func.count(Hospede.id)).where(Hospede.checkin_id == Checkin.id)
+                       .correlate(Checkin).scalar_subquery()),
+)
+
+EXPORTACOES = {'hospedes': COLUNAS_HOSPEDES, 'checkins': COLUNAS_CHECKINS}
+
+
+def exportar_registros(conteudo, status='Finalizado', nome_filtro='', data_inicio='', data_fim=''):
+    """Retorna (cabeçalho, gerador de linhas) da exportação, com os mesmos filtros do histórico.
+
+    `conteudo` é "hospedes" (ficha de cada hóspede, uma linha por pessoa) ou "checkins"
+    (uma linha por estadia, com o hóspede principal). As linhas vêm do cursor em lotes
+    de TAMANHO_LOTE, em ordem de check-in, sem montar a lista inteira em memória.
+    """
+    if conteudo not in EXPORTACOES:
+        raise ValueError(f'Exportação desconhecida: {conteudo}')
+    colunas = EXPORTACOES[conteudo]
+
+    query = filtrar_checkins(status, nome_filtro=nome_filtro, data_inicio=data_inicio, data_fim=data_fim)
+    ordem = [Checkin.data_checkin, Checkin.id]
+    if conteudo == 'hospedes':
+        query = query.join(Hospede, Hospede.checkin_id == Checkin.id)
+        ordem += [Hospede.is_principal.desc(), Hospede.id]
+    else:
+        query = query.outerjoin(Hospede, (Hospede.checkin_id == Checkin.id) & (Hospede.is_principal == True))
+    query = query.with_entities(*[coluna for _, coluna in colunas]).order_by(*ordem)
+
+    return [cabecalho for cabecalho, _ in colunas], iter(query.yield_per(TAMANHO_LOTE))
@@ -0,0 +1,47 @@
+from collections import Counter
+from flask import current_app
+from .estatisticas import resumo_estatisticas
+from .ocupacao import mapa_ocupacao
+from .propriedades import em_todas_as_propriedades
+
+# Países listados no resumo de cada propriedade e do grupo
+PAISES_NO_RESUMO = 5
+CAMPOS_SOMADOS = ('ocupados', 'chegadas', 'saidas', 'hospedes', 'noites', 'apartamentos', 'ocupados_agora')
+CAMPOS_SERIE = ('chegadas', 'saidas', 'hospedes', 'ocupados')
+
+
+def _indicadores_da_propriedade(dias):
+    """Resumo do painel da propriedade atual, com a ocupação atual do mapa em memória"""
+    resumo = resumo_estatisticas(dias, paises=None)
+    situacao = mapa_ocupacao.situacao(current_app.config.get('APARTAMENTOS'))
+    resumo['apartamentos'] = len(situacao)
+    resumo['ocupados_agora'] = sum(1 for _, checkin_id in situacao if checkin_id)
+    return resumo
+
+
+def somar_resumos(resumos):
+    """Junta os resumos de várias propriedades: totais, série diária e ranking de países somados"""
+    soma = {campo: sum(resumo[campo] for resumo in resumos) for campo in CAMPOS_SOMADOS}
+    soma['dias'] = resumos[0]['dias']
+    soma['media_estadia'] = round(soma['noites'] / soma['saidas'], 1) if soma['saidas'] else 0
+
+    # As séries cobrem os mesmos dias em todas as propriedades
+    soma['serie'] = [{'dia': dias[0]['dia'], **{campo: sum(dia[campo] for dia in dias) for campo in CAMPOS_SERIE}}
+                     for dias in zip(*(resumo['serie'] for resumo in resumos))]
+    soma['hoje'] = soma['serie'][-1]
+
+    paises = Counter()
+    for resumo in resumos:
+        for item in resumo['paises']:
+            paises[item['pais']] += item['hospedes']
+    soma['paises'] = [{'pais': pais, 'hospedes': hospedes} for pais, hospedes in paises.most_common(PAISES_NO_RESUMO)]
+    return soma
+
+
+def resumo_do_grupo(dias=30):
+    """Indicadores de cada propriedade (lidos em paralelo, um banco por thread) e do grupo somados"""
+    por_propriedade = em_todas_as_propriedades(_indicadores_da_propriedade, dias)
+    grupo = somar_resumos(list(por_propriedade.values()))
+    for resumo in por_propriedade.values():
+        resumo['paises'] = resumo['paises'][:PAISES_NO_RESUMO]
+    return {'grupo': grupo, 'propriedades': por_propriedade}
@@ -0,0 +1,28 @@
+from sqlalchemy import func, select, update
+from .models import Hospede, idade_em_sql
+
+TAMANHO_LOTE = 5000
+
+
+def recalcular_idades(conn, tamanho_lote=TAMANHO_LOTE):
+    """Atualiza a idade gravada (coluna legada "idade") com a idade atual, em UPDATEs por faixa de id.
+    
+    Cada lote é um único UPDATE calculado no banco, sem carregar os hóspedes, e é confirmado
+    em seguida para não segurar o lock de escrita do SQLite; só as linhas com idade diferente
+    são alteradas. Retorna a quantidade de hóspedes atualizados.
+    """
+    hospedes = Hospede.__table__
+    idade_atual = idade_em_sql(hospedes.c.data_nascimento)
+    maior_id = conn.execute(select(func.max(hospedes.c.id))).scalar() or 0
+
+    atualizados = 0
+    for inicio in range(0, maior_id, tamanho_lote):
+        resultado = conn.execute(
+            update(hospedes)
+            .where(hospedes.c.id > inicio, hospedes.c.id <= inicio + tamanho_lote,
+                   hospedes.c.idade_registrada != idade_atual)
+            .values(idade_registrada=idade_atual)
+        )
+        conn.commit()
+        atualizados += resultado.rowcount
+    return atualizados
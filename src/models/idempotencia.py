@@ -0,0 +1,98 @@
+import hashlib
+import json
+from datetime import datetime, timedelta
+from flask import current_app
+from sqlalchemy import select
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from werkzeug.local import LocalProxy
+from src.utils.cache import LRUCache
+from .models import db, ChaveIdempotencia
+from .propriedades import estado_da_propriedade
+
+# Resultados mantidos em memória por processo (os demais são lidos do banco)
+TAMANHO_CACHE = 1024
+TAMANHO_CHAVE = ChaveIdempotencia.__table__.c.chave.type.length
+
+_tabela = ChaveIdempotencia.__table__
+# chave -> (impressão, resposta, expira_em), por propriedade
+_resultados = LocalProxy(lambda: estado_da_propriedade('chaves_idempotencia', lambda: LRUCache(TAMANHO_CACHE)))
+
+
+class ChaveReutilizada(ValueError):
+    """Chave de idempotência já usada por um envio com outros dados (ou ainda em gravação)"""
+
+    def __init__(self):
+        super().__init__('Chave de idempotência já usada em um envio com outros dados')
+
+
+def ler_chave(texto):
+    """Chave de idempotência informada (None se ausente); levanta ValueError se inválida"""
+    if not texto:
+        return None
+    chave = texto.strip()
+    if not chave or len(chave) > TAMANHO_CHAVE:
+        raise ValueError(f'Chave de idempotência inválida; use de 1 a {TAMANHO_CHAVE} caracteres')
+    return chave
+
+
+def calcular_impressao(dados):
+    """SHA-256 dos dados enviados, que identifica um envio repetido"""
+    texto = json.dumps(dados, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(texto.encode('utf-8')).hexdigest()
+
+
+def resultado_salvo(chave, impressao):
+    """Resposta do envio já concluído com a chave, ou None se a chave é nova (ou expirou).
+
+    Chaves concluídas neste processo são respondidas da memória, sem consultar o banco.
+    Levanta ChaveReutilizada se a chave foi usada com outros dados.
+    """
+    salvo = _resultados.get(chave)
+    if salvo is None:
+        salvo = db.session.execute(
+            select(_tabela.c.impressao, _tabela.c.resposta, _tabela.c.expira_em).where(_tabela.c.chave == chave)
+        ).first()
+        if salvo is None:
+            return None
+        salvo = tuple(salvo)
+        _resultados.set(chave, salvo)
+    impressao_salva, resposta, expira_em = salvo
+    if expira_em <= datetime.utcnow():
+        _resultados.invalidar(chave)
+        return None
+    if impressao_salva != impressao:
+        raise ChaveReutilizada()
+    return resposta
+
+
+def guardar_resultado(chave, impressao, resposta):
+    """Grava (sem confirmar) a resposta do envio com a chave; retorna a expiração.
+
+    Uma chave expirada é reaproveitada. Se a chave ainda vale (outro envio gravou antes),
+    desfaz a transação e levanta ChaveReutilizada. Após o commit, chame lembrar_resultado.
+    """
+    agora = datetime.utcnow()
+    expira_em = agora + timedelta(hours=current_app.config['IDEMPOTENCIA_HORAS'])
+    comando = sqlite_insert(_tabela).values(chave=chave, impressao=impressao, resposta=resposta,
+                                            criada_em=agora, expira_em=expira_em)
+    gravada = db.session.execute(comando.on_conflict_do_update(
+        index_elements=['chave'],
+        set_={campo: comando.excluded[campo] for campo in ('impressao', 'resposta', 'criada_em', 'expira_em')},
+        where=_tabela.c.expira_em <= agora
+    ).returning(_tabela.c.chave)).scalar()
+    if gravada is None:
+        db.session.rollback()
+        raise ChaveReutilizada()
+    return expira_em
+
+
+def lembrar_resultado(chave, impressao, resposta, expira_em):
+    """Guarda em memória o resultado já confirmado no banco"""
+    _resultados.set(chave, (impressao, resposta, expira_em))
+
+
+def remover_chaves_expiradas():
+    """Apaga as chaves de idempotência expiradas; retorna a quantidade"""
+    removidas = db.session.execute(_tabela.delete().where(_tabela.c.expira_em <= datetime.utcnow())).rowcount
+    db.session.commit()
+    return removidas
@@ -0,0 +1,157 @@
+import csv
+import io
+from datetime import datetime
+from sqlalchemy import select, insert, func
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.exc import IntegrityError
+from .models import db, Checkin, Evento, Hospede, PerfilHospede
+from .ocupacao import mapa_ocupacao, verificar_disponibilidade, violou_ocupacao, ApartamentoOcupado
+from .previsao import previsao_ocupacao
+from .propriedades import propriedade_atual
+from .estatisticas import registrar_chegada
+from .perfis import invalidar_perfis
+from .validacao import DadosInvalidos, validar_checkin
+
+# Limite de parâmetros por consulta IN ao buscar os perfis
+TAMANHO_LOTE_CONSULTA = 500
+
+
+def ler_csv(conteudo):
+    """Converte o CSV de importação na lista de check-ins (mesmo formato do JSON da API).
+    
+    Cada linha é um hóspede, com as colunas numero_apartamento, data_checkout_prevista,
+    tipo (opcional: principal/acompanhante) e os campos do hóspede. Linhas consecutivas do
+    mesmo apartamento e data formam um check-in; a primeira é o hóspede principal, e uma
+    linha com tipo "principal" sempre inicia um novo check-in.
+    """
+    registros = []
+    leitor = csv.DictReader(io.StringIO(conteudo))
+    for linha in leitor:
+        dados = {campo.strip(): (valor or '').strip() for campo, valor in linha.items() if campo}
+        grupo = (dados.get('numero_apartamento'), dados.get('data_checkout_prevista'))
+        novo_checkin = dados.get('tipo', '').lower() == 'principal'
+
+        if not registros or novo_checkin or grupo != registros[-1]['_grupo']:
+            registros.append({
+                '_grupo': grupo,
+                'linha': leitor.line_num,
+                'numero_apartamento': grupo[0],
+                'data_checkout_prevista': grupo[1],
+                'hospede_principal': dados,
+                'acompanhantes': []
+            })
+        else:
+            registros[-1]['acompanhantes'].append(dados)
+
+    for registro in registros:
+        del registro['_grupo']
+    return registros
+
+
+def _gravar_perfis(hospedes, agora):
+    """Cria ou atualiza em lote os perfis dos hóspedes importados; retorna {chave: perfil_id}"""
+    perfis = PerfilHospede.__table__
+    por_chave = {}
+    for hospede in hospedes:
+        chave = PerfilHospede.chave_de(hospede['cpf'], hospede['documento'])
+        hospede['_chave'] = chave
+        if not chave:
+            continue
+        perfil = por_chave.setdefault(chave, {'chave': chave, 'documento_indice': None, 'total_estadias': 0,
+                                              'atualizado_em': agora, **{campo: None for campo in PerfilHospede.CAMPOS}})
+        perfil.update({campo: hospede[campo] for campo in PerfilHospede.CAMPOS if hospede[campo] not in (None, '')})
+        # Mesmo índice cego do documento do hóspede (calculado na validação)
+        perfil['documento_indice'] = hospede['documento_indice'] or perfil['documento_indice']
+        perfil['total_estadias'] += 1
+
+    if not por_chave:
+        return {}
+
+    # Upsert: campos vazios na importação não apagam os dados que o perfil já tinha (os valores
+    # cifrados nunca são vazios, então a comparação com '' continua valendo)
+    comando = sqlite_insert(perfis)
+    atualizacao = {campo: func.coalesce(func.nullif(comando.excluded[campo], ''), perfis.c[campo])
+                   for campo in PerfilHospede.CAMPOS}
+    atualizacao['documento_indice'] = func.coalesce(comando.excluded.documento_indice, perfis.c.documento_indice)
+    atualizacao['total_estadias'] = perfis.c.total_estadias + comando.excluded.total_estadias
+    atualizacao['atualizado_em'] = comando.excluded.atualizado_em
+    db.session.execute(comando.on_conflict_do_update(index_elements=['chave'], set_=atualizacao),
+                       list(por_chave.values()))
+
+    chaves = list(por_chave)
+    ids = {}
+    for inicio in range(0, len(chaves), TAMANHO_LOTE_CONSULTA):
+        lote = chaves[inicio:inicio + TAMANHO_LOTE_CONSULTA]
+        ids.update(db.session.execute(select(perfis.c.chave, perfis.c.id).where(perfis.c.chave.in_(lote))).all())
+    invalidar_perfis(chaves)
+    return ids
+
+
+def importar_checkins(registros):
+    """Valida e grava vários check-ins em uma única transação, com inserções em lote.
+    
+    Registros inválidos não são gravados e voltam na lista de erros, com a linha
+    (CSV) ou a posição (JSON, a partir de 1) de origem e os erros de cada campo.
+    Retorna (ids criados, erros).
+    """
+    erros = []
+    validos = []
+    apartamentos = set()
+    for posicao, registro in enumerate(registros, start=1):
+        try:
+            checkin = validar_checkin(registro)
+            if checkin['numero_apartamento'] in apartamentos:
+                raise ApartamentoOcupado(checkin['numero_apartamento'])
+            verificar_disponibilidade(checkin['numero_apartamento'])
+        except ValueError as e:
+            erro = {'linha': registro.get('linha', posicao) if isinstance(registro, dict) else posicao, 'erro': str(e)}
+            if isinstance(e, DadosInvalidos):
+                erro['campos'] = e.erros
+            erros.append(erro)
+            continue
+        apartamentos.add(checkin['numero_apartamento'])
+        validos.append((checkin['numero_apartamento'], checkin['data_checkout_prevista'], checkin['hospedes']))
+
+    if not validos:
+        return [], erros
+
+    agora = datetime.utcnow()
+    try:
+        checkin_ids = db.session.execute(
+            insert(Checkin.__table__).returning(Checkin.id, sort_by_parameter_order=True),
+            [{'numero_apartamento': numero_apartamento, 'data_checkout_prevista': data_checkout_prevista,
+              'data_checkin': agora, 'status': 'Ativo'}
+             for numero_apartamento, data_checkout_prevista, _ in validos]
+        ).scalars().all()
+    except IntegrityError as e:
+        # Algum apartamento foi ocupado por outro balcão durante a importação
+        db.session.rollback()
+        if violou_ocupacao(e):
+            raise ApartamentoOcupado(None, 'Um dos apartamentos foi ocupado durante a importação; nada foi gravado')
+        raise
+
+    todos_hospedes = []
+    for checkin_id, (_, _, hospedes) in zip(checkin_ids, validos):
+        for hospede in hospedes:
+            hospede['checkin_id'] = checkin_id
+            todos_hospedes.append(hospede)
+
+    perfil_ids = _gravar_perfis(todos_hospedes, agora)
+    for hospede in todos_hospedes:
+        hospede['perfil_id'] = perfil_ids.get(hospede.pop('_chave'))
+
+    db.session.execute(insert(Hospede.__table__), todos_hospedes)
+    registrar_chegada(agora.date(), [(hospedes[0].get('pais'), len(hospedes)) for _, _, hospedes in validos],
+                      checkins=len(checkin_ids))
+    propriedade_id = propriedade_atual()
+    Evento.registrar('checkin.criado', [
+        Checkin(id=checkin_id, propriedade_id=propriedade_id, numero_apartamento=numero_apartamento,
+                data_checkin=agora, data_checkout_prevista=data_checkout_prevista, status='Ativo').resumo()
+        for checkin_id, (numero_apartamento, data_checkout_prevista, _) in zip(checkin_ids, validos)
+    ])
+    db.session.commit()
+
+    for checkin_id, (numero_apartamento, _, _) in zip(checkin_ids, validos):
+        mapa_ocupacao.ocupar(numero_apartamento, checkin_id)
+    previsao_ocupacao.invalidar()
+    return checkin_ids, erros
@@ -0,0 +1,209 @@
+import re
+from sqlalchemy import inspect
+from .models import Checkin, Hospede, PerfilHospede, Tarefa, Evento, Webhook, ChaveIdempotencia
+from .busca import criar_indice_busca, recriar_indice_busca
+from .arquivo import recriar_busca_arquivo
+from .dados_pessoais import apagando_com_seguranca, cifrar_dados_pessoais
+from .perfis import criar_perfis_existentes
+from .ocupacao import criar_apartamentos, garantir_indice_ocupacao
+from .estatisticas import recalcular_estatisticas
+from .contatos import normalizar_telefones
+from .conexao import ESQUEMA_ARQUIVO, arquivo_preparado
+
+# Migrações versionadas do esquema. A versão aplicada fica em PRAGMA user_version,
+# então bancos existentes recebem apenas as migrações pendentes.
+# Cada migração deve ser idempotente: o db.create_all() roda antes e pode já ter
+# criado tabelas e índices novos em um banco vazio.
+# Tabelas novas também precisam de uma migração: com o esquema na última versão, a
+# inicialização não chama o create_all().
+MIGRACOES = []
+
+
+def migracao(versao, descricao):
+    """Registra uma função como a migração de número `versao`"""
+    def registrar(funcao):
+        MIGRACOES.append((versao, descricao, funcao))
+        MIGRACOES.sort(key=lambda item: item[0])
+        return funcao
+    return registrar
+
+
+def versao_atual(conn):
+    """Retorna a versão do esquema gravada no banco"""
+    return conn.exec_driver_sql('PRAGMA user_version').scalar()
+
+
+def esquema_atualizado(conn):
+    """Indica se o banco já está na versão da última migração registrada"""
+    return versao_atual(conn) >= MIGRACOES[-1][0]
+
+
+def migrar(engine, log=None):
+    """Aplica as migrações pendentes em ordem e retorna a lista das aplicadas"""
+    aplicadas = []
+    with engine.connect() as conn:
+        versao = versao_atual(conn)
+
+    for numero, descricao, funcao in MIGRACOES:
+        if numero <= versao:
+            continue
+        with engine.begin() as conn:
+            funcao(conn)
+            conn.exec_driver_sql(f'PRAGMA user_version = {int(numero)}')
+        aplicadas.append((numero, descricao))
+        if log:
+            log(f'Migração {numero} aplicada: {descricao}')
+
+    return aplicadas
+
+
+def criar_indices(conn, tabela, *nomes):
+    """Cria os índices declarados no modelo (pelo nome) que ainda não existem no banco"""
+    for indice in tabela.indexes:
+        if indice.name in nomes:
+            indice.create(conn, checkfirst=True)
+
+
+def adicionar_coluna(conn, tabela, coluna, definicao):
+    """Adiciona uma coluna a uma tabela existente, se ela ainda não existir"""
+    existentes = {c['name'] for c in inspect(conn).get_columns(tabela)}
+    if coluna not in existentes:
+        conn.exec_driver_sql(f'ALTER TABLE {tabela} ADD COLUMN {coluna} {definicao}')
+
+
+def recriar_com_autoincremento(conn, nome):
+    """Recria a tabela com o id AUTOINCREMENT, mantendo as colunas, as linhas, os índices e os triggers.
+
+    O SQLite não muda a chave primária de uma tabela existente: a tabela nova (DDL da atual,
+    com a chave trocada) recebe as linhas e o nome da antiga.
+    """
+    ddl = conn.exec_driver_sql("SELECT sql FROM sqlite_master WHERE type = 'table' AND name = ?", (nome,)).scalar()
+    if 'AUTOINCREMENT' in ddl.upper():
+        return
+    ddl_nova, chaves = re.subn(r',\s*PRIMARY KEY \(id\)', '', ddl)
+    ddl_nova, colunas_id = re.subn(r'\bid INTEGER NOT NULL,', 'id INTEGER NOT NULL PRIMARY KEY AUTOINCREMENT,', ddl_nova, 1)
+    if chaves != 1 or colunas_id != 1:
+        raise ValueError(f'Chave primária de {nome} em formato inesperado: {ddl}')
+    dependentes = conn.exec_driver_sql(
+        "SELECT sql FROM sqlite_master WHERE type IN ('index', 'trigger') AND tbl_name = ? AND sql IS NOT NULL",
+        (nome,)
+    ).scalars().all()
+    colunas = ', '.join(c['name'] for c in inspect(conn).get_columns(nome))
+
+    conn.exec_driver_sql(ddl_nova.replace(f'CREATE TABLE {nome} ', f'CREATE TABLE {nome}_nova ', 1))
+    conn.exec_driver_sql(f'INSERT INTO {nome}_nova ({colunas}) SELECT {colunas} FROM {nome}')
+    conn.exec_driver_sql(f'DROP TABLE {nome}')
+    conn.exec_driver_sql(f'ALTER TABLE {nome}_nova RENAME TO {nome}')
+    for ddl in dependentes:
+        conn.exec_driver_sql(ddl)
+
+
+@migracao(1, 'Índices compostos de checkins e hospedes')
+def _indices_compostos(conn):
+    criar_indices(conn, Checkin.__table__, 'ix_checkins_status_data_checkin')
+    criar_indices(conn, Hospede.__table__, 'ix_hospedes_checkin_principal', 'ix_hospedes_principal_nome')
+
+
+@migracao(2, 'Índice de busca textual (FTS5) de hóspedes')
+def _indice_busca_hospedes(conn):
+    criar_indice_busca(conn)
+
+
+@migracao(3, 'Perfis deduplicados de hóspedes recorrentes')
+def _perfis_hospedes(conn):
+    adicionar_coluna(conn, 'hospedes', 'perfil_id', 'INTEGER REFERENCES perfis_hospedes (id)')
+    criar_indices(conn, Hospede.__table__, 'ix_hospedes_perfil_id')
+    criar_perfis_existentes(conn)
+
+
+@migracao(4, 'Índice único de apartamentos com check-in ativo')
+def _indice_ocupacao(conn):
+    # Se houver apartamentos duplicados, o índice é criado depois, ao carregar o mapa de ocupação
+    garantir_indice_ocupacao(conn)
+
+
+@migracao(5, 'Estatísticas diárias do painel')
+def _estatisticas_diarias(conn):
+    # As tabelas já foram criadas pelo create_all(); aqui só é feito o backfill
+    recalcular_estatisticas(conn)
+
+
+@migracao(6, 'Versão (atualizado_em) dos check-ins')
+def _versao_checkins(conn):
+    adicionar_coluna(conn, 'checkins', 'atualizado_em', 'DATETIME')
+    conn.exec_driver_sql('UPDATE checkins SET atualizado_em = coalesce(data_checkout, data_checkin) '
+                         'WHERE atualizado_em IS NULL')
+    criar_indices(conn, Checkin.__table__, 'ix_checkins_atualizado_em')
+
+
+@migracao(7, 'Telefone normalizado (E.164) dos hóspedes')
+def _telefone_e164(conn):
+    adicionar_coluna(conn, 'hospedes', 'telefone_e164', 'VARCHAR(16)')
+    # O índice cego do telefone é preenchido na migração 13, que cria a coluna
+    normalizar_telefones(conn, com_indice=False)
+
+
+@migracao(8, 'Índice de cobertura para as faixas etárias')
+def _indice_faixas_etarias(conn):
+    criar_indices(conn, Hospede.__table__, 'ix_hospedes_checkin_nascimento')
+
+
+@migracao(9, 'Fila de tarefas em segundo plano')
+def _fila_tarefas(conn):
+    Tarefa.__table__.create(conn, checkfirst=True)
+
+
+@migracao(10, 'Propriedade (hotel) dos check-ins')
+def _propriedade_checkins(conn):
+    # Os registros existentes recebem a propriedade do banco ao final da migração (atribuir_propriedade)
+    adicionar_coluna(conn, 'checkins', 'propriedade_id', 'VARCHAR(30)')
+
+
+@migracao(11, 'Eventos dos check-ins (outbox) e entrega aos webhooks')
+def _eventos(conn):
+    Evento.__table__.create(conn, checkfirst=True)
+    Webhook.__table__.create(conn, checkfirst=True)
+
+
+@migracao(12, 'Chaves de idempotência dos envios de check-in')
+def _chaves_idempotencia(conn):
+    ChaveIdempotencia.__table__.create(conn, checkfirst=True)
+
+
+@migracao(13, 'Dados pessoais cifrados, com índices cegos para a busca exata')
+def _dados_pessoais_cifrados(conn):
+    for coluna in ('cpf_indice', 'documento_indice', 'telefone_indice'):
+        adicionar_coluna(conn, 'hospedes', coluna, 'VARCHAR(32)')
+    adicionar_coluna(conn, 'perfis_hospedes', 'documento_indice', 'VARCHAR(32)')
+    criar_indices(conn, Hospede.__table__, 'ix_hospedes_cpf_indice', 'ix_hospedes_documento_indice',
+                  'ix_hospedes_telefone_indice')
+    criar_indices(conn, PerfilHospede.__table__, 'ix_perfis_hospedes_documento_indice')
+    # O índice do documento em texto puro dá lugar ao índice cego
+    conn.exec_driver_sql('DROP INDEX IF EXISTS ix_perfis_hospedes_documento')
+    with apagando_com_seguranca(conn):
+        # A busca textual passa a ter só os nomes: documentos e contatos saem do índice em texto puro
+        recriar_indice_busca(conn)
+        recriar_busca_arquivo(conn)
+        cifrar_dados_pessoais(conn)
+
+
+@migracao(14, 'Tabela de apartamentos do mapa de ocupação')
+def _apartamentos(conn):
+    # Mantida por trigger: o mapa não precisa mais percorrer todos os check-ins para listar os apartamentos
+    criar_apartamentos(conn)
+
+
+@migracao(15, 'Ids de check-ins e hóspedes sem reutilização (AUTOINCREMENT)')
+def _ids_sem_reutilizacao(conn):
+    # Sem AUTOINCREMENT, arquivar os maiores ids os liberava para check-ins novos, que depois
+    # colidiam com a restauração. O sqlite_sequence passa do maior id arquivado em preparar_arquivo.
+    recriar_com_autoincremento(conn, 'checkins')
+    recriar_com_autoincremento(conn, 'hospedes')
+
+
+def atribuir_propriedade(conn, propriedade_id):
+    """Grava a propriedade do banco nos check-ins sem propriedade (anteriores à migração 10), inclusive os arquivados"""
+    esquemas = ('main', ESQUEMA_ARQUIVO) if arquivo_preparado(conn) else ('main',)
+    for esquema in esquemas:
+        conn.exec_driver_sql(f'UPDATE {esquema}.checkins SET propriedade_id = ? WHERE propriedade_id IS NULL',
+                             (propriedade_id,))
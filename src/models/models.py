@@ -1,10 +1,75 @@
 from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy import Integer, case, cast, func, update
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.ext.hybrid import hybrid_property
+from sqlalchemy.orm.attributes import set_committed_value
 from datetime import datetime, date
+from .criptografia import JsonCifrado, TextoCifrado, indice_cego
+from .propriedades import SessaoPorPropriedade, propriedade_atual
 
-db = SQLAlchemy()
+# A sessão consulta o banco da propriedade atual (um banco SQLite por propriedade)
+db = SQLAlchemy(session_options={'class_': SessaoPorPropriedade})
+
+# Faixas etárias dos relatórios: (idade máxima da faixa, rótulo); a última não tem limite
+FAIXAS_ETARIAS = ((11, '0-11'), (17, '12-17'), (29, '18-29'), (44, '30-44'), (59, '45-59'), (None, '60+'))
+
+
+def idade_em_sql(data_nascimento):
+    """Expressão SQL (SQLite) da idade atual a partir da data de nascimento"""
+    hoje = func.date('now', 'localtime')
+    anos = cast(func.strftime('%Y', hoje), Integer) - cast(func.strftime('%Y', data_nascimento), Integer)
+    # Ainda não fez aniversário este ano
+    return anos - case((func.strftime('%m-%d', hoje) < func.strftime('%m-%d', data_nascimento), 1), else_=0)
+
+
+def nascidos_apos(idade_maxima, hoje=None):
+    """Data de corte: quem nasceu depois dela tem hoje no máximo `idade_maxima` anos"""
+    hoje = hoje or date.today()
+    ano = hoje.year - idade_maxima - 1
+    try:
+        return hoje.replace(year=ano)
+    except ValueError:
+        # 29/02 em ano não bissexto: o aniversário só conta a partir de 01/03
+        return hoje.replace(year=ano, day=28)
+
+
+def somente_digitos(valor):
+    """Dígitos do valor (CPF, telefone), sem a pontuação"""
+    return ''.join(c for c in (valor or '') if c.isdigit())
+
+
+def documento_normalizado(valor):
+    """Documento só com letras e números, em maiúsculas ("mg-12.345" -> "MG12345")"""
+    return ''.join(c for c in (valor or '') if c.isalnum()).upper()
+
+
+def faixa_etaria(idade):
+    """Rótulo da faixa etária de uma idade"""
+    for maxima, rotulo in FAIXAS_ETARIAS:
+        if maxima is None or idade <= maxima:
+            return rotulo
+
+
+class CheckinFinalizado(ValueError):
+    """Checkout de um check-in que já foi finalizado (por outro balcão ou pelo checkout em lote)"""
+
+    def __init__(self, checkin_id):
+        super().__init__('Este check-in já foi finalizado')
+        self.checkin_id = checkin_id
 
 class Checkin(db.Model):
     __tablename__ = 'checkins'
+    __table_args__ = (
+        # Listagens de ativos/histórico filtram por status e ordenam por data
+        db.Index('ix_checkins_status_data_checkin', 'status', 'data_checkin'),
+        # No máximo um check-in ativo por apartamento (índice parcial)
+        db.Index('ux_checkins_apartamento_ativo', 'numero_apartamento', unique=True,
+                 sqlite_where=db.text("status = 'Ativo'")),
+        # Versão das listagens (ETag/Last-Modified) a partir da última alteração
+        db.Index('ix_checkins_atualizado_em', 'atualizado_em'),
+        # AUTOINCREMENT: os ids dos check-ins arquivados nunca são reutilizados por check-ins novos
+        {'sqlite_autoincrement': True},
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     numero_apartamento = db.Column(db.String(10), nullable=False)
@@ -12,6 +77,10 @@ class Checkin(db.Model):
     data_checkout_prevista = db.Column(db.Date, nullable=False)  # Data prevista para checkout
     data_checkout = db.Column(db.DateTime, nullable=True)  # Nula para check-ins ativos
     status = db.Column(db.String(20), nullable=False, default='Ativo')  # Ativo ou Finalizado
+    # Propriedade (hotel) do check-in; identifica a origem dos registros nos relatórios do grupo
+    propriedade_id = db.Column(db.String(30), nullable=False, default=propriedade_atual)
+    # Versão do registro: chave do cache de cards e dos validadores HTTP das páginas
+    atualizado_em = db.Column(db.DateTime, nullable=False, default=datetime.utcnow, onupdate=datetime.utcnow)
     
     # Relacionamento com hóspedes
     hospedes = db.relationship('Hospede', backref='checkin', cascade='all, delete-orphan')
@@ -37,56 +106,114 @@ class Checkin(db.Model):
         """Retorna o número total de hóspedes"""
         return len(self.hospedes)
     
-    def to_dict(self):
-        """Converte o objeto para dicionário"""
+    def resumo(self):
+        """Campos do check-in, sem os dados dos hóspedes (conteúdo dos eventos)"""
         return {
             'id': self.id,
+            'propriedade_id': self.propriedade_id,
             'numero_apartamento': self.numero_apartamento,
             'data_checkin': self.data_checkin.strftime('%Y-%m-%d %H:%M:%S') if self.data_checkin else None,
             'data_checkout_prevista': self.data_checkout_prevista.strftime('%Y-%m-%d') if self.data_checkout_prevista else None,
             'data_checkout': self.data_checkout.strftime('%Y-%m-%d %H:%M:%S') if self.data_checkout else None,
             'status': self.status,
-            'hospede_principal': self.hospede_principal.to_dict() if self.hospede_principal else None,
-            'acompanhantes': [acomp.to_dict() for acomp in self.acompanhantes],
-            'total_hospedes': self.total_hospedes
+        }
+    
+    def to_dict(self, hospedes=None):
+        """Converte o objeto para dicionário (hospedes pode ser passado já carregado em lote)"""
+        if hospedes is None:
+            hospedes = self.hospedes
+        
+        # Uma única passagem pela lista separa o principal dos acompanhantes
+        principal = None
+        acompanhantes = []
+        for hospede in hospedes:
+            if hospede.is_principal and principal is None:
+                principal = hospede
+            elif not hospede.is_principal:
+                acompanhantes.append(hospede)
+        
+        return {
+            **self.resumo(),
+            'hospede_principal': principal.to_dict() if principal else None,
+            'acompanhantes': [acomp.to_dict() for acomp in acompanhantes],
+            'total_hospedes': len(hospedes)
         }
     
     def finalizar_checkin(self):
-        """Finaliza o check-in definindo a data de checkout e status"""
-        self.data_checkout = datetime.utcnow()
-        self.status = 'Finalizado'
+        """Finaliza o check-in definindo a data de checkout e status, se ele ainda estiver ativo.
+        
+        O UPDATE é condicional (status = 'Ativo'): em checkouts simultâneos do mesmo check-in,
+        só um o finaliza e conta nas estatísticas e nos eventos. Retorna False se outro
+        processo já o finalizou.
+        """
+        agora = datetime.utcnow()
+        valores = {'status': 'Finalizado', 'data_checkout': agora, 'atualizado_em': agora}
+        resultado = db.session.execute(
+            update(Checkin).where(Checkin.id == self.id, Checkin.status == 'Ativo').values(**valores),
+            execution_options={'synchronize_session': False}
+        )
+        if resultado.rowcount != 1:
+            return False
+        for campo, valor in valores.items():
+            set_committed_value(self, campo, valor)
+        
+        # Estatística do dia da saída e evento para as integrações (na mesma transação do checkout)
+        EstatisticaDiaria.incrementar(self.data_checkout.date(), saidas=1,
+                                      noites=(self.data_checkout - self.data_checkin).days)
+        Evento.registrar('checkin.finalizado', [self.resumo()])
+        return True
 
 
 class Hospede(db.Model):
     __tablename__ = 'hospedes'
+    __table_args__ = (
+        # Carregamento dos hóspedes de um check-in (relacionamento) e busca do principal
+        db.Index('ix_hospedes_checkin_principal', 'checkin_id', 'is_principal'),
+        db.Index('ix_hospedes_principal_nome', 'is_principal', 'nome_completo'),
+        # Faixas etárias dos relatórios sem ler as linhas da tabela (índice de cobertura)
+        db.Index('ix_hospedes_checkin_nascimento', 'checkin_id', 'data_nascimento'),
+        # AUTOINCREMENT: os ids dos hóspedes arquivados nunca são reutilizados
+        {'sqlite_autoincrement': True},
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     nome_completo = db.Column(db.String(200), nullable=False)
     data_nascimento = db.Column(db.Date, nullable=False)
-    idade = db.Column(db.Integer, nullable=False)
-    documento = db.Column(db.String(50), nullable=False)
+    # Idade gravada no check-in (coluna legada "idade"); a idade atual é a propriedade `idade`
+    idade_registrada = db.Column('idade', db.Integer, nullable=False, key='idade_registrada')
+    # Documento, CPF, endereço, telefone e e-mail são gravados cifrados (src/models/criptografia.py)
+    documento = db.Column(TextoCifrado('documento', 50), nullable=False)
     orgao_expedidor = db.Column(db.String(50), nullable=True)  # Órgão expedidor do documento
     uf_documento = db.Column(db.String(2), nullable=True)  # UF do documento
-    cpf = db.Column(db.String(14), nullable=True)  # Formato: 000.000.000-00 (opcional)
+    cpf = db.Column(TextoCifrado('cpf', 14), nullable=True)  # Formato: 000.000.000-00 (opcional)
     
     # Campos opcionais para acompanhantes (obrigatórios para hóspede principal)
-    endereco = db.Column(db.String(200), nullable=True)
-    cep = db.Column(db.String(20), nullable=True)
+    endereco = db.Column(TextoCifrado('endereco', 200), nullable=True)
+    cep = db.Column(TextoCifrado('cep', 20), nullable=True)
     cidade = db.Column(db.String(100), nullable=True)
     estado = db.Column(db.String(100), nullable=True)
     pais = db.Column(db.String(100), nullable=True)
     
     ddd = db.Column(db.String(2), nullable=False)  # DDD obrigatório
-    telefone = db.Column(db.String(20), nullable=False)
-    email = db.Column(db.String(100), nullable=True)  # E-mail opcional
+    telefone = db.Column(TextoCifrado('telefone', 20), nullable=False)
+    telefone_e164 = db.Column(TextoCifrado('telefone_e164', 16), nullable=True)  # Normalizado na gravação: +5511999999999
+    email = db.Column(TextoCifrado('email', 100), nullable=True)  # E-mail opcional
     observacoes = db.Column(db.Text, nullable=True)
     
+    # Índices cegos (HMAC) de CPF, documento e telefone: busca exata pelo índice, sem decifrar as linhas
+    cpf_indice = db.Column(db.String(32), nullable=True, index=True)
+    documento_indice = db.Column(db.String(32), nullable=True, index=True)
+    telefone_indice = db.Column(db.String(32), nullable=True, index=True)
+    
     # Indica se é o hóspede principal ou acompanhante
     is_principal = db.Column(db.Boolean, nullable=False, default=False)
     
     # Relacionamento com check-in
     checkin_id = db.Column(db.Integer, db.ForeignKey('checkins.id'), nullable=False)
     
+    # Perfil deduplicado do hóspede (por CPF/documento), compartilhado entre estadias
+    perfil_id = db.Column(db.Integer, db.ForeignKey('perfis_hospedes.id'), nullable=True, index=True)
+    
     def __repr__(self):
         return f'<Hospede {self.nome_completo}>'
     
@@ -102,6 +229,41 @@ class Hospede(db.Model):
             
         return idade
     
+    @staticmethod
+    def indices_cegos(cpf, documento, telefone_e164):
+        """Valores das colunas de índice cego a partir do CPF, documento e telefone (E.164) em texto puro"""
+        return {
+            'cpf_indice': indice_cego('cpf', somente_digitos(cpf)),
+            'documento_indice': indice_cego('documento', documento_normalizado(documento)),
+            'telefone_indice': indice_cego('telefone', telefone_e164),
+        }
+    
+    @hybrid_property
+    def idade(self):
+        """Idade atual, calculada a partir da data de nascimento (também utilizável em consultas)"""
+        return Hospede.calcular_idade(self.data_nascimento)
+    
+    @idade.expression
+    def idade(cls):
+        return idade_em_sql(cls.data_nascimento)
+    
+    @hybrid_property
+    def faixa_etaria(self):
+        """Faixa etária atual do hóspede (ex.: '18-29')"""
+        return faixa_etaria(self.idade)
+    
+    @faixa_etaria.expression
+    def faixa_etaria(cls):
+        # Comparação direta com as datas de corte de hoje: bem mais barata que calcular a idade por linha
+        return case(*[(cls.data_nascimento > nascidos_apos(maxima), rotulo)
+                      for maxima, rotulo in FAIXAS_ETARIAS if maxima is not None],
+                    else_=FAIXAS_ETARIAS[-1][1])
+    
+    @property
+    def numero_whatsapp(self):
+        """Número no formato do link wa.me (E.164 sem o "+"), ou None se o telefone não foi normalizado"""
+        return self.telefone_e164[1:] if self.telefone_e164 else None
+    
     def to_dict(self):
         """Converte o objeto para dicionário"""
         return {
@@ -120,9 +282,269 @@ class Hospede(db.Model):
             'pais': self.pais,
             'ddd': self.ddd,
             'telefone': self.telefone,
+            'telefone_e164': self.telefone_e164,
             'email': self.email,
             'observacoes': self.observacoes,
             'is_principal': self.is_principal,
-            'checkin_id': self.checkin_id
+            'checkin_id': self.checkin_id,
+            'perfil_id': self.perfil_id
+        }
+
+
+
+class PerfilHospede(db.Model):
+    __tablename__ = 'perfis_hospedes'
+    
+    # Campos copiados do hóspede para pré-preencher os próximos check-ins
+    CAMPOS = ('nome_completo', 'data_nascimento', 'documento', 'orgao_expedidor', 'uf_documento',
+              'cpf', 'endereco', 'cep', 'cidade', 'estado', 'pais', 'ddd', 'telefone', 'email')
+    
+    id = db.Column(db.Integer, primary_key=True)
+    chave = db.Column(db.String(60), nullable=False, unique=True)  # Índice cego do CPF ou documento normalizado
+    nome_completo = db.Column(db.String(200), nullable=False)
+    data_nascimento = db.Column(db.Date, nullable=False)
+    documento = db.Column(TextoCifrado('documento', 50), nullable=False)
+    documento_indice = db.Column(db.String(32), nullable=True, index=True)
+    orgao_expedidor = db.Column(db.String(50), nullable=True)
+    uf_documento = db.Column(db.String(2), nullable=True)
+    cpf = db.Column(TextoCifrado('cpf', 14), nullable=True)
+    endereco = db.Column(TextoCifrado('endereco', 200), nullable=True)
+    cep = db.Column(TextoCifrado('cep', 20), nullable=True)
+    cidade = db.Column(db.String(100), nullable=True)
+    estado = db.Column(db.String(100), nullable=True)
+    pais = db.Column(db.String(100), nullable=True)
+    ddd = db.Column(db.String(2), nullable=True)
+    telefone = db.Column(TextoCifrado('telefone', 20), nullable=True)
+    email = db.Column(TextoCifrado('email', 100), nullable=True)
+    total_estadias = db.Column(db.Integer, nullable=False, default=0)
+    atualizado_em = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    
+    hospedes = db.relationship('Hospede', backref='perfil')
+    
+    def __repr__(self):
+        return f'<PerfilHospede {self.nome_completo}>'
+    
+    @staticmethod
+    def normalizar_chave(cpf=None, documento=None):
+        """Gera a chave de deduplicação: CPF (só dígitos) ou, na falta dele, o documento"""
+        digitos_cpf = somente_digitos(cpf)
+        if len(digitos_cpf) == 11:
+            return f'CPF:{digitos_cpf}'
+        documento = documento_normalizado(documento)
+        if documento:
+            return f'DOC:{documento}'
+        return None
+    
+    @staticmethod
+    def chave_de(cpf=None, documento=None):
+        """Chave gravada do perfil: índice cego da chave de deduplicação (None sem CPF nem documento)"""
+        return indice_cego('perfil', PerfilHospede.normalizar_chave(cpf, documento))
+    
+    def atualizar_de(self, hospede):
+        """Atualiza o perfil com os dados mais recentes informados pelo hóspede"""
+        for campo in self.CAMPOS:
+            valor = getattr(hospede, campo)
+            if valor not in (None, ''):
+                setattr(self, campo, valor)
+        self.documento_indice = indice_cego('documento', documento_normalizado(self.documento))
+        self.atualizado_em = datetime.utcnow()
+    
+    def to_dict(self):
+        """Converte o perfil para o formato de pré-preenchimento do formulário"""
+        dados = {campo: getattr(self, campo) for campo in self.CAMPOS}
+        dados['data_nascimento'] = self.data_nascimento.strftime('%Y-%m-%d') if self.data_nascimento else None
+        dados['id'] = self.id
+        dados['total_estadias'] = self.total_estadias
+        return dados
+
+
+class Apartamento(db.Model):
+    """Apartamentos que já tiveram check-in, para o mapa de ocupação (preenchida por trigger em checkins)"""
+    __tablename__ = 'apartamentos'
+    
+    numero = db.Column(db.String(10), primary_key=True)
+    
+    def __repr__(self):
+        return f'<Apartamento {self.numero}>'
+
+
+class EstatisticaDiaria(db.Model):
+    """Totais por dia, atualizados a cada check-in/checkout (evita varrer todos os check-ins)"""
+    __tablename__ = 'estatisticas_diarias'
+    
+    dia = db.Column(db.Date, primary_key=True)
+    chegadas = db.Column(db.Integer, nullable=False, default=0)  # Check-ins realizados no dia
+    hospedes = db.Column(db.Integer, nullable=False, default=0)  # Hóspedes que chegaram no dia
+    saidas = db.Column(db.Integer, nullable=False, default=0)  # Check-outs realizados no dia
+    noites = db.Column(db.Integer, nullable=False, default=0)  # Soma dos dias das estadias encerradas no dia
+    
+    def __repr__(self):
+        return f'<EstatisticaDiaria {self.dia}>'
+    
+    @classmethod
+    def incrementar(cls, dia, **incrementos):
+        """Soma os incrementos aos totais do dia (cria a linha do dia se necessário)"""
+        tabela = cls.__table__
+        valores = {'dia': dia, 'chegadas': 0, 'hospedes': 0, 'saidas': 0, 'noites': 0}
+        valores.update(incrementos)
+        comando = sqlite_insert(tabela).values(**valores)
+        db.session.execute(comando.on_conflict_do_update(
+            index_elements=['dia'],
+            set_={campo: tabela.c[campo] + comando.excluded[campo] for campo in incrementos}
+        ))
+
+
+class EstatisticaPais(db.Model):
+    """Hóspedes chegados por dia e país (país do hóspede principal)"""
+    __tablename__ = 'estatisticas_paises'
+    
+    dia = db.Column(db.Date, primary_key=True)
+    pais = db.Column(db.String(100), primary_key=True)
+    hospedes = db.Column(db.Integer, nullable=False, default=0)
+    
+    def __repr__(self):
+        return f'<EstatisticaPais {self.dia} {self.pais}>'
+    
+    @staticmethod
+    def normalizar_pais(pais):
+        """Nome do país usado no agrupamento das estatísticas"""
+        return (pais or '').strip().title() or 'Não informado'
+    
+    @classmethod
+    def incrementar(cls, dia, pais, hospedes):
+        """Soma hóspedes ao total do país no dia"""
+        tabela = cls.__table__
+        comando = sqlite_insert(tabela).values(dia=dia, pais=cls.normalizar_pais(pais), hospedes=hospedes)
+        db.session.execute(comando.on_conflict_do_update(
+            index_elements=['dia', 'pais'],
+            set_={'hospedes': tabela.c.hospedes + comando.excluded.hospedes}
+        ))
+
+
+class Tarefa(db.Model):
+    """Tarefa da fila de processamento em segundo plano (ex.: checkout em lote)"""
+    __tablename__ = 'tarefas'
+    __table_args__ = (
+        # Busca da próxima tarefa pendente pelo trabalhador
+        db.Index('ix_tarefas_status_executar_em', 'status', 'executar_em'),
+    )
+    
+    STATUS_FINAIS = ('Concluída', 'Erro')
+    
+    id = db.Column(db.Integer, primary_key=True)
+    tipo = db.Column(db.String(50), nullable=False)
+    parametros = db.Column(db.JSON, nullable=False, default=dict)
+    # Chave opcional que impede enfileirar a mesma tarefa duas vezes (ex.: checkout automático do dia)
+    chave = db.Column(db.String(100), nullable=True, unique=True)
+    status = db.Column(db.String(20), nullable=False, default='Pendente')  # Pendente, Executando, Concluída, Erro
+    total = db.Column(db.Integer, nullable=False, default=0)
+    processados = db.Column(db.Integer, nullable=False, default=0)
+    falhas = db.Column(db.Integer, nullable=False, default=0)
+    mensagem = db.Column(db.Text, nullable=True)
+    criada_em = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    executar_em = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    iniciada_em = db.Column(db.DateTime, nullable=True)
+    # Atualizada a cada lote; uma tarefa "Executando" parada há muito tempo é retomada por outro trabalhador
+    atualizada_em = db.Column(db.DateTime, nullable=True, onupdate=datetime.utcnow)
+    concluida_em = db.Column(db.DateTime, nullable=True)
+    
+    def __repr__(self):
+        return f'<Tarefa {self.id} {self.tipo} {self.status}>'
+    
+    @property
+    def percentual(self):
+        """Progresso da tarefa, de 0 a 100"""
+        if self.status == 'Concluída':
+            return 100
+        return int(100 * self.processados / self.total) if self.total else 0
+    
+    def to_dict(self):
+        """Converte a tarefa para o formato de acompanhamento do progresso"""
+        return {
+            'id': self.id,
+            'tipo': self.tipo,
+            'parametros': self.parametros,
+            'status': self.status,
+            'total': self.total,
+            'processados': self.processados,
+            'falhas': self.falhas,
+            'percentual': self.percentual,
+            'mensagem': self.mensagem,
+            'criada_em': self.criada_em.strftime('%Y-%m-%d %H:%M:%S') if self.criada_em else None,
+            'iniciada_em': self.iniciada_em.strftime('%Y-%m-%d %H:%M:%S') if self.iniciada_em else None,
+            'concluida_em': self.concluida_em.strftime('%Y-%m-%d %H:%M:%S') if self.concluida_em else None,
+            'finalizada': self.status in self.STATUS_FINAIS
+        }
+
+
+class Evento(db.Model):
+    """Evento do ciclo de vida de um check-in (outbox), gravado na mesma transação da alteração.
+
+    O id é a posição do evento no fluxo: os consumidores retomam a leitura a partir do
+    último id recebido.
+    """
+    __tablename__ = 'eventos'
+    # AUTOINCREMENT: os ids dos eventos removidos pela limpeza nunca são reutilizados
+    __table_args__ = {'sqlite_autoincrement': True}
+    
+    TIPOS = ('checkin.criado', 'checkin.finalizado')
+    
+    id = db.Column(db.Integer, primary_key=True)
+    tipo = db.Column(db.String(40), nullable=False)
+    checkin_id = db.Column(db.Integer, nullable=False)
+    dados = db.Column(db.JSON, nullable=False, default=dict)  # Check-in após a alteração (Checkin.resumo)
+    criado_em = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    
+    def __repr__(self):
+        return f'<Evento {self.id} {self.tipo}>'
+    
+    @classmethod
+    def registrar(cls, tipo, checkins):
+        """Grava (sem confirmar) um evento para cada check-in, a partir de Checkin.resumo()"""
+        if not checkins:
+            return
+        agora = datetime.utcnow()
+        db.session.execute(cls.__table__.insert(), [
+            {'tipo': tipo, 'checkin_id': dados['id'], 'dados': dados, 'criado_em': agora} for dados in checkins
+        ])
+        # Após o commit, os consumidores deste processo são avisados (src/models/eventos.py)
+        db.session.info['eventos_gravados'] = True
+    
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'tipo': self.tipo,
+            'checkin_id': self.checkin_id,
+            'criado_em': self.criado_em.strftime('%Y-%m-%d %H:%M:%S'),
+            'checkin': self.dados,
         }
 
+
+class Webhook(db.Model):
+    """Posição de entrega dos eventos a cada webhook configurado (WEBHOOKS)"""
+    __tablename__ = 'webhooks'
+    
+    url = db.Column(db.String(500), primary_key=True)
+    ultimo_evento = db.Column(db.Integer, nullable=False, default=0)  # Último evento entregue
+    falhas = db.Column(db.Integer, nullable=False, default=0)  # Falhas seguidas (definem a espera)
+    proxima_tentativa = db.Column(db.DateTime, nullable=True)
+    # Reserva do processo que está entregando (vários workers usam a mesma tabela)
+    reservado_ate = db.Column(db.DateTime, nullable=True)
+    ultimo_erro = db.Column(db.Text, nullable=True)
+    
+    def __repr__(self):
+        return f'<Webhook {self.url}>'
+
+
+class ChaveIdempotencia(db.Model):
+    """Resultado de um envio com chave de idempotência, devolvido aos envios repetidos até expirar"""
+    __tablename__ = 'chaves_idempotencia'
+    
+    chave = db.Column(db.String(100), primary_key=True)
+    impressao = db.Column(db.String(64), nullable=False)  # SHA-256 dos dados enviados
+    resposta = db.Column(JsonCifrado('resposta'), nullable=False)  # Check-in criado (Checkin.to_dict), cifrado
+    criada_em = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    expira_em = db.Column(db.DateTime, nullable=False, index=True)
+    
+    def __repr__(self):
+        return f'<ChaveIdempotencia {self.chave}>'
@@ -0,0 +1,156 @@
+import logging
+import re
+import time
+from threading import Lock
+from sqlalchemy.exc import IntegrityError
+from werkzeug.local import LocalProxy
+from .models import db, Apartamento, Checkin
+from .propriedades import estado_da_propriedade
+
+logger = logging.getLogger(__name__)
+
+# Índice parcial que impede dois check-ins ativos no mesmo apartamento
+NOME_INDICE_OCUPACAO = 'ux_checkins_apartamento_ativo'
+
+# Mantém a tabela de apartamentos em qualquer gravação de check-in (formulário, API, importação, arquivo)
+DDL_TRIGGER_APARTAMENTOS = """
+    CREATE TRIGGER IF NOT EXISTS apartamentos_checkin AFTER INSERT ON checkins BEGIN
+        INSERT OR IGNORE INTO apartamentos (numero) VALUES (new.numero_apartamento);
+    END
+"""
+
+
+def chave_apartamento(numero_apartamento):
+    """Chave de ordenação natural dos apartamentos ("2" antes de "10")"""
+    return [int(parte) if parte.isdigit() else parte for parte in re.split(r'(\d+)', numero_apartamento or '')]
+
+
+def garantir_indice_ocupacao(conn):
+    """Cria o índice único de apartamentos ativos, se não houver duplicidades que o impeçam"""
+    existe = conn.exec_driver_sql(
+        "SELECT 1 FROM sqlite_master WHERE type = 'index' AND name = ?", (NOME_INDICE_OCUPACAO,)
+    ).first()
+    if existe:
+        return True
+
+    duplicados = conn.exec_driver_sql(
+        "SELECT numero_apartamento FROM checkins WHERE status = 'Ativo' "
+        "GROUP BY numero_apartamento HAVING count(*) > 1"
+    ).scalars().all()
+    if duplicados:
+        logger.warning('Índice de ocupação não criado: apartamentos com mais de um check-in ativo (%s). '
+                       'Finalize os check-ins duplicados; o índice será criado na próxima inicialização.',
+                       ', '.join(duplicados))
+        return False
+
+    for indice in Checkin.__table__.indexes:
+        if indice.name == NOME_INDICE_OCUPACAO:
+            indice.create(conn, checkfirst=True)
+    return True
+
+
+def criar_apartamentos(conn):
+    """Cria a tabela de apartamentos com o trigger que a mantém e a preenche com os check-ins existentes"""
+    Apartamento.__table__.create(conn, checkfirst=True)
+    conn.exec_driver_sql(DDL_TRIGGER_APARTAMENTOS)
+    conn.exec_driver_sql('INSERT OR IGNORE INTO apartamentos (numero) SELECT DISTINCT numero_apartamento FROM checkins')
+
+
+class ApartamentoOcupado(ValueError):
+    """Tentativa de check-in em apartamento que já tem um check-in ativo"""
+
+    def __init__(self, numero_apartamento, mensagem=None):
+        super().__init__(mensagem or f'Apartamento {numero_apartamento} já possui um check-in ativo')
+        self.numero_apartamento = numero_apartamento
+
+
+class MapaOcupacao:
+    """Mapa em memória apartamento -> id do check-in ativo.
+    
+    Responde "o apartamento está livre?" sem consultar o banco. É atualizado pelo próprio
+    processo após cada check-in/checkout confirmado e recarrega os check-ins ativos a cada
+    `validade` segundos, para refletir alterações feitas por outros processos (workers).
+    A lista de apartamentos vem da tabela apartamentos só na primeira carga; depois ela
+    recebe os apartamentos que aparecem entre os ativos. O índice único parcial no banco
+    continua sendo a garantia contra check-ins duplos.
+    """
+
+    def __init__(self, validade=5):
+        self.validade = validade
+        self._ativos = {}
+        self._apartamentos = None
+        self._carregado_em = None
+        self._lock = Lock()
+
+    def carregar(self):
+        """Recarrega o mapa a partir dos check-ins ativos no banco (índice parcial de ativos)"""
+        ativos = db.session.query(Checkin.numero_apartamento, Checkin.id).filter(Checkin.status == 'Ativo').all()
+        apartamentos = None
+        if self._apartamentos is None:
+            apartamentos = {numero for numero, in db.session.query(Apartamento.numero)}
+        with self._lock:
+            self._ativos = dict(ativos)
+            if apartamentos is not None:
+                self._apartamentos = apartamentos
+            self._apartamentos.update(self._ativos)
+            self._carregado_em = time.monotonic()
+
+    def _atualizar_se_expirado(self):
+        if self._carregado_em is None or time.monotonic() - self._carregado_em > self.validade:
+            self.carregar()
+
+    def invalidar(self):
+        """Força a releitura do banco na próxima consulta"""
+        self._carregado_em = None
+
+    def checkin_ativo(self, numero_apartamento):
+        """Id do check-in ativo no apartamento, ou None se estiver livre"""
+        self._atualizar_se_expirado()
+        return self._ativos.get(numero_apartamento)
+
+    def ocupar(self, numero_apartamento, checkin_id):
+        with self._lock:
+            self._ativos[numero_apartamento] = checkin_id
+            if self._apartamentos is not None:
+                self._apartamentos.add(numero_apartamento)
+
+    def liberar(self, numero_apartamento, checkin_id):
+        with self._lock:
+            if self._ativos.get(numero_apartamento) == checkin_id:
+                del self._ativos[numero_apartamento]
+
+    def situacao(self, apartamentos_configurados=None):
+        """Lista ordenada de (apartamento, id do check-in ativo ou None)"""
+        self._atualizar_se_expirado()
+        with self._lock:
+            ativos = dict(self._ativos)
+            apartamentos = set(self._apartamentos)
+        apartamentos.update(apartamentos_configurados or ())
+        return [(numero, ativos.get(numero)) for numero in sorted(apartamentos, key=chave_apartamento)]
+
+
+# Cada propriedade (banco) tem o seu mapa
+mapa_ocupacao = LocalProxy(lambda: estado_da_propriedade('mapa_ocupacao', MapaOcupacao))
+
+
+def verificar_disponibilidade(numero_apartamento):
+    """Levanta ApartamentoOcupado se o apartamento já tiver um check-in ativo.
+    
+    O mapa em memória responde na hora para apartamentos livres; quando indica ocupação,
+    a informação é confirmada no banco antes de recusar (o mapa pode estar defasado).
+    """
+    if mapa_ocupacao.checkin_ativo(numero_apartamento) is None:
+        return
+    ativo = db.session.query(Checkin.id).filter(
+        Checkin.numero_apartamento == numero_apartamento, Checkin.status == 'Ativo'
+    ).first()
+    if ativo is None:
+        mapa_ocupacao.invalidar()
+        return
+    raise ApartamentoOcupado(numero_apartamento)
+
+
+def violou_ocupacao(erro):
+    """Indica se um IntegrityError veio do índice de apartamentos ativos"""
+    return isinstance(erro, IntegrityError) and 'checkins.numero_apartamento' in str(erro.orig)
+
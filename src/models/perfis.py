@@ -0,0 +1,143 @@
+from datetime import datetime
+from sqlalchemy import event, select, insert, update, bindparam
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from .criptografia import indice_cego
+from .models import db, Hospede, PerfilHospede, documento_normalizado
+from .propriedades import SessaoPorPropriedade, estado_da_propriedade
+from src.utils.cache import LRUCache
+
+# Perfis consultados recentemente, já no formato de pré-preenchimento (chave -> dict)
+TAMANHO_CACHE_PERFIS = 2048
+# Segundos em que um perfil fica no cache: alterações feitas por outros processos (workers)
+# aparecem no pré-preenchimento depois desse tempo, no máximo
+VALIDADE_CACHE_PERFIS = 60
+
+
+def _cache_perfis():
+    """Cache de perfis da propriedade atual (cada banco tem os seus perfis)"""
+    return estado_da_propriedade('cache_perfis', lambda: LRUCache(tamanho_maximo=TAMANHO_CACHE_PERFIS,
+                                                                   validade=VALIDADE_CACHE_PERFIS))
+
+
+def buscar_perfil(cpf=None, documento=None):
+    """Retorna os dados de pré-preenchimento do hóspede recorrente, ou None"""
+    chave = PerfilHospede.chave_de(cpf, documento)
+    if not chave:
+        return None
+
+    dados = _cache_perfis().get(chave)
+    if dados is not None:
+        return dados
+
+    perfil = PerfilHospede.query.filter_by(chave=chave).first()
+    if perfil:
+        dados = perfil.to_dict()
+        _cache_perfis().set(chave, dados)
+    elif documento:
+        # Hóspede com CPF cadastrado, mas identificado agora só pelo documento
+        # (não vai para o cache, pois a invalidação é feita pela chave do perfil)
+        perfil = PerfilHospede.query.filter_by(
+            documento_indice=indice_cego('documento', documento_normalizado(documento))
+        ).order_by(PerfilHospede.atualizado_em.desc()).first()
+        dados = perfil.to_dict() if perfil else None
+    return dados
+
+
+def completar_com_perfil(dados, perfil_id):
+    """Preenche os campos não informados com os dados de um perfil existente"""
+    try:
+        perfil = db.session.get(PerfilHospede, int(perfil_id))
+    except (TypeError, ValueError):
+        perfil = None
+    if not perfil:
+        return dados
+
+    completos = perfil.to_dict()
+    completos.pop('id')
+    completos.pop('total_estadias')
+    informados = dados.to_dict() if hasattr(dados, 'to_dict') else dict(dados)
+    completos.update({campo: valor for campo, valor in informados.items() if valor})
+    return completos
+
+
+def vincular_perfil(hospede):
+    """Associa o hóspede ao seu perfil (criando-o se preciso) e atualiza os dados do perfil"""
+    chave = PerfilHospede.chave_de(hospede.cpf, hospede.documento)
+    if not chave:
+        return None
+
+    perfil = PerfilHospede.query.filter_by(chave=chave).first()
+    if not perfil:
+        # ON CONFLICT DO NOTHING: no primeiro check-in simultâneo da mesma pessoa, o segundo usa o
+        # perfil criado pelo outro em vez de falhar na chave única
+        db.session.execute(sqlite_insert(PerfilHospede.__table__).values(
+            chave=chave, nome_completo=hospede.nome_completo, data_nascimento=hospede.data_nascimento,
+            documento=hospede.documento, total_estadias=0, atualizado_em=datetime.utcnow()
+        ).on_conflict_do_nothing(index_elements=['chave']))
+        perfil = PerfilHospede.query.filter_by(chave=chave).one()
+
+    perfil.atualizar_de(hospede)
+    perfil.total_estadias += 1
+    hospede.perfil = perfil
+    invalidar_perfis([chave])
+    return perfil
+
+
+def invalidar_perfis(chaves):
+    """Remove os perfis do cache após o commit da transação que os alterou.
+
+    Antes do commit, uma consulta concorrente ainda leria (e guardaria no cache) a versão anterior.
+    """
+    db.session.info.setdefault('perfis_alterados', set()).update(chaves)
+
+
+@event.listens_for(SessaoPorPropriedade, 'after_commit')
+def _invalidar_apos_commit(sessao):
+    chaves = sessao.info.pop('perfis_alterados', None)
+    if chaves:
+        cache = _cache_perfis()
+        for chave in chaves:
+            cache.invalidar(chave)
+
+
+@event.listens_for(SessaoPorPropriedade, 'after_rollback')
+def _descartar_invalidacao(sessao):
+    sessao.info.pop('perfis_alterados', None)
+
+
+def criar_perfis_existentes(conn):
+    """Cria os perfis a partir dos hóspedes já cadastrados e vincula cada hóspede ao seu"""
+    hospedes = Hospede.__table__
+    perfis = PerfilHospede.__table__
+
+    ids_por_chave = dict(conn.execute(select(perfis.c.chave, perfis.c.id)).all())
+    novos = {}
+    vinculos = []
+
+    # Em ordem de id, de forma que a estadia mais recente prevaleça nos dados do perfil
+    colunas_hospede = [hospedes.c.id] + [hospedes.c[campo] for campo in PerfilHospede.CAMPOS]
+    linhas = conn.execute(select(*colunas_hospede).where(hospedes.c.perfil_id.is_(None)).order_by(hospedes.c.id))
+    for linha in linhas:
+        chave = PerfilHospede.chave_de(linha.cpf, linha.documento)
+        if not chave:
+            continue
+        vinculos.append((linha.id, chave))
+        if chave in ids_por_chave:
+            continue
+        perfil = novos.setdefault(chave, {'chave': chave, 'total_estadias': 0})
+        perfil.update({campo: getattr(linha, campo) for campo in PerfilHospede.CAMPOS
+                       if getattr(linha, campo) not in (None, '')})
+        perfil['documento_indice'] = indice_cego('documento', documento_normalizado(perfil.get('documento')))
+        perfil['total_estadias'] += 1
+        perfil['atualizado_em'] = datetime.utcnow()
+
+    if novos:
+        colunas = ('chave', 'documento_indice', 'total_estadias', 'atualizado_em') + PerfilHospede.CAMPOS
+        conn.execute(insert(perfis), [{c: p.get(c) for c in colunas} for p in novos.values()])
+        ids_por_chave = dict(conn.execute(select(perfis.c.chave, perfis.c.id)).all())
+
+    if vinculos:
+        conn.execute(
+            update(hospedes).where(hospedes.c.id == bindparam('hospede_id')).values(perfil_id=bindparam('id_perfil')),
+            [{'hospede_id': hospede_id, 'id_perfil': ids_por_chave[chave]} for hospede_id, chave in vinculos]
+        )
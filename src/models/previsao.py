@@ -0,0 +1,126 @@
+import time
+from bisect import bisect_left, bisect_right
+from datetime import date, timedelta
+from threading import Lock
+from werkzeug.local import LocalProxy
+from .models import db, Checkin
+from .propriedades import estado_da_propriedade
+from .ocupacao import chave_apartamento, mapa_ocupacao
+
+# Dias da curva de ocupação quando não informado, e o máximo aceito
+DIAS_PADRAO = 28
+DIAS_MAXIMO = 366
+
+
+def ler_data(texto, padrao=None):
+    """Converte AAAA-MM-DD em date (texto vazio retorna `padrao`); levanta ValueError se inválida"""
+    if not texto:
+        return padrao
+    try:
+        return date.fromisoformat(texto)
+    except (TypeError, ValueError):
+        raise ValueError('Data inválida; use o formato AAAA-MM-DD')
+
+
+def ler_dias(texto, padrao=DIAS_PADRAO):
+    """Quantidade de dias da curva, entre 1 e DIAS_MAXIMO; levanta ValueError se inválida"""
+    if not texto:
+        return padrao
+    try:
+        dias = int(texto)
+    except (TypeError, ValueError):
+        raise ValueError('Quantidade de dias inválida')
+    if not 1 <= dias <= DIAS_MAXIMO:
+        raise ValueError(f'A previsão vai de 1 a {DIAS_MAXIMO} dias')
+    return dias
+
+
+class PrevisaoOcupacao:
+    """Índice das estadias ativas pela data de saída prevista.
+
+    Toda estadia ativa já começou, então o intervalo ocupado de cada apartamento vai de
+    hoje até a saída prevista (saídas atrasadas contam como hoje): os intervalos têm o
+    mesmo início e o índice é o vetor ordenado das saídas. "Quantos apartamentos estão
+    ocupados no dia D" é uma busca binária e "quais estão livres em D" é um prefixo do
+    vetor, então a curva de N dias custa N buscas em vez de check-ins × dias.
+
+    É recarregado após os check-ins/checkouts deste processo (invalidar), a cada
+    `validade` segundos (alterações de outros workers) e na virada do dia.
+    """
+
+    def __init__(self, validade=30):
+        self.validade = validade
+        self._saidas = []
+        self._estadias = []
+        self._livres = []
+        self._configurados = ()
+        self._hoje = None
+        self._carregado_em = None
+        self._lock = Lock()
+
+    def carregar(self, apartamentos_configurados=None):
+        """Relê do banco as estadias ativas e monta o índice"""
+        hoje = date.today()
+        ativos = db.session.query(
+            Checkin.data_checkout_prevista, Checkin.numero_apartamento, Checkin.id
+        ).filter(Checkin.status == 'Ativo').all()
+        # (saída, apartamento, check-in) em ordem de saída; o vetor das saídas é o índice
+        estadias = sorted((max(saida, hoje), numero, checkin_id) for saida, numero, checkin_id in ativos)
+        ocupados = {numero for _, numero, _ in estadias}
+        livres = [numero for numero, _ in mapa_ocupacao.situacao(apartamentos_configurados)
+                  if numero not in ocupados]
+        with self._lock:
+            self._estadias = estadias
+            self._saidas = [saida for saida, _, _ in estadias]
+            self._livres = livres
+            self._configurados = tuple(apartamentos_configurados or ())
+            self._hoje = hoje
+            self._carregado_em = time.monotonic()
+
+    def invalidar(self):
+        """Força a releitura do banco na próxima consulta"""
+        self._carregado_em = None
+
+    def _indice(self, apartamentos_configurados):
+        """Retorna (hoje, saídas, estadias, livres) atuais, recarregando se preciso"""
+        if (self._carregado_em is None or time.monotonic() - self._carregado_em > self.validade
+                or self._hoje != date.today() or self._configurados != tuple(apartamentos_configurados or ())):
+            self.carregar(apartamentos_configurados)
+        with self._lock:
+            return self._hoje, self._saidas, self._estadias, self._livres
+
+    def livres_em(self, dia, apartamentos_configurados=None):
+        """Apartamentos livres no dia: lista ordenada de (apartamento, check-in que sai até o dia ou None)"""
+        hoje, saidas, estadias, livres = self._indice(apartamentos_configurados)
+        if dia < hoje:
+            raise ValueError('A previsão começa no dia de hoje')
+        # A saída libera o apartamento no próprio dia (um novo hóspede pode entrar)
+        liberados = estadias[:bisect_right(saidas, dia)]
+        resultado = [(numero, None) for numero in livres]
+        resultado += [(numero, checkin_id) for _, numero, checkin_id in liberados]
+        return sorted(resultado, key=lambda item: chave_apartamento(item[0]))
+
+    def curva(self, inicio=None, dias=DIAS_PADRAO, apartamentos_configurados=None):
+        """Ocupação prevista dia a dia: lista de dicts com dia, ocupados, livres e saídas previstas"""
+        hoje, saidas, estadias, livres = self._indice(apartamentos_configurados)
+        inicio = inicio or hoje
+        if inicio < hoje:
+            raise ValueError('A previsão começa no dia de hoje')
+        total = len(livres) + len(estadias)
+        resultado = []
+        for deslocamento in range(dias):
+            dia = inicio + timedelta(days=deslocamento)
+            ate_o_dia = bisect_right(saidas, dia)
+            ocupados = len(saidas) - ate_o_dia
+            resultado.append({
+                'data': dia,
+                'ocupados': ocupados,
+                'livres': total - ocupados,
+                'saidas': ate_o_dia - bisect_left(saidas, dia),
+                'taxa_ocupacao': round(ocupados * 100 / total, 1) if total else 0.0,
+            })
+        return resultado
+
+
+# Cada propriedade (banco) tem o seu índice
+previsao_ocupacao = LocalProxy(lambda: estado_da_propriedade('previsao_ocupacao', PrevisaoOcupacao))
@@ -0,0 +1,166 @@
+import re
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from flask import abort, current_app, g, has_app_context
+from flask_sqlalchemy.session import Session
+from .conexao import caminho_arquivo, caminho_propriedade
+
+# Propriedade (hotel) da configuração padrão; a primeira de PROPRIEDADES é a padrão da aplicação
+PROPRIEDADE_PRINCIPAL = 'principal'
+# Identificador usado na URL (/p/<propriedade>/...) e no nome do banco
+FORMATO_ID = re.compile(r'^[a-z0-9_-]{1,30}$')
+
+_trava_estado = threading.Lock()
+
+
+def configurar_propriedades(config):
+    """Completa PROPRIEDADES (nome, banco e arquivo de cada uma) e registra os bancos em SQLALCHEMY_BINDS.
+
+    A propriedade padrão usa o banco principal; as demais, sem `banco` informado, ficam em um
+    arquivo SQLite próprio ao lado dele (app.db -> app_<id>.db). Cada banco é um bind do
+    Flask-SQLAlchemy, com o seu próprio pool de conexões.
+    """
+    propriedades = {}
+    for indice, (propriedade_id, dados) in enumerate(config['PROPRIEDADES'].items()):
+        if not FORMATO_ID.match(propriedade_id):
+            raise ValueError(f'Identificador de propriedade inválido: {propriedade_id!r} '
+                             '(use letras minúsculas, números, "-" ou "_")')
+        dados = dict(dados or {})
+        dados.setdefault('nome', propriedade_id)
+        if indice == 0:
+            dados['banco'] = config['SQLALCHEMY_DATABASE_URI']
+            dados['arquivo'] = config['ARQUIVO_BANCO']
+            dados['bind'] = None
+        else:
+            dados['banco'] = dados.get('banco') or caminho_propriedade(config['SQLALCHEMY_DATABASE_URI'],
+                                                                       propriedade_id)
+            dados['arquivo'] = caminho_arquivo(dados['banco']) if config['ARQUIVO_BANCO'] else None
+            dados['bind'] = f'propriedade_{propriedade_id}'
+        propriedades[propriedade_id] = dados
+
+    config['PROPRIEDADES'] = propriedades
+    config['PROPRIEDADE_PADRAO'] = next(iter(propriedades))
+    # Cada bind recebe as mesmas opções (tamanho do pool) do banco principal
+    opcoes = config.get('SQLALCHEMY_ENGINE_OPTIONS', {})
+    config['SQLALCHEMY_BINDS'] = {**config.get('SQLALCHEMY_BINDS', {}),
+                                  **{dados['bind']: {**opcoes, 'url': dados['banco']}
+                                     for dados in propriedades.values() if dados['bind']}}
+
+
+def propriedade_atual():
+    """Identificador da propriedade da requisição (ou do bloco usando_propriedade)"""
+    if not has_app_context():
+        return PROPRIEDADE_PRINCIPAL
+    return g.get('propriedade') or current_app.config.get('PROPRIEDADE_PADRAO', PROPRIEDADE_PRINCIPAL)
+
+
+def dados_da_propriedade(propriedade_id=None):
+    """Configuração (nome, banco, arquivo) da propriedade"""
+    return current_app.config['PROPRIEDADES'][propriedade_id or propriedade_atual()]
+
+
+def banco_da_propriedade(propriedade_id=None):
+    """Engine (com o pool de conexões) do banco da propriedade"""
+    return current_app.extensions['sqlalchemy'].engines[dados_da_propriedade(propriedade_id)['bind']]
+
+
+@contextmanager
+def usando_propriedade(propriedade_id):
+    """Dentro do bloco, a sessão e os caches em memória são os da propriedade informada.
+
+    A sessão é encerrada antes e depois, pois as conexões dela pertencem a outro banco.
+    """
+    if propriedade_id not in current_app.config['PROPRIEDADES']:
+        raise ValueError(f'Propriedade desconhecida: {propriedade_id}')
+    sessao = current_app.extensions['sqlalchemy'].session
+    anterior = g.get('propriedade')
+    sessao.close()
+    g.propriedade = propriedade_id
+    try:
+        yield
+    finally:
+        sessao.close()
+        g.propriedade = anterior
+
+
+def estado_da_propriedade(nome, criar):
+    """Objeto em memória `nome` da propriedade atual (ex.: mapa de ocupação), criado na primeira vez"""
+    estados = current_app.extensions.setdefault('estado_propriedades', {})
+    chave = (propriedade_atual(), nome)
+    estado = estados.get(chave)
+    if estado is None:
+        with _trava_estado:
+            estado = estados.setdefault(chave, criar())
+    return estado
+
+
+class SessaoPorPropriedade(Session):
+    """Sessão que direciona as consultas ao banco da propriedade atual (roteador de shards)"""
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        # Sem g.propriedade (ou na propriedade padrão) vale o banco principal, como no Session original
+        propriedade_id = g.get('propriedade') if bind is None and has_app_context() else None
+        if propriedade_id is not None:
+            chave = current_app.config['PROPRIEDADES'][propriedade_id]['bind']
+            if chave is not None:
+                return self._db.engines[chave]
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+
+def em_todas_as_propriedades(funcao, *args, **kwargs):
+    """Executa `funcao` em cada propriedade, em paralelo, e retorna {propriedade: resultado}.
+
+    Cada propriedade roda em uma thread do pool (PROPRIEDADES_THREADS) com o seu próprio
+    contexto de aplicação, sessão e conexão, de modo que os bancos são lidos ao mesmo tempo.
+    """
+    app = current_app._get_current_object()
+    propriedades = list(app.config['PROPRIEDADES'])
+
+    def executar(propriedade_id):
+        with app.app_context():
+            g.propriedade = propriedade_id
+            try:
+                return funcao(*args, **kwargs)
+            finally:
+                app.extensions['sqlalchemy'].session.remove()
+
+    if len(propriedades) == 1:
+        return {propriedades[0]: executar(propriedades[0])}
+    with ThreadPoolExecutor(max_workers=min(len(propriedades), app.config['PROPRIEDADES_THREADS']),
+                            thread_name_prefix='propriedades') as pool:
+        return dict(zip(propriedades, pool.map(executar, propriedades)))
+
+
+def rotear_por_propriedade(app, *blueprints):
+    """Registra os blueprints no endereço atual (propriedade padrão) e em /p/<propriedade>/...
+
+    As regras sem prefixo recebem propriedade=<padrão> como valor fixo; assim o url_for
+    gera o endereço sem prefixo para a propriedade padrão (URLs de uma instalação com um
+    só hotel não mudam) e /p/<id>/... para as demais. As rotas registradas na aplicação
+    com o mesmo valor fixo (ex.: a página inicial) também ganham a versão com prefixo.
+    """
+    padrao = {'propriedade': app.config['PROPRIEDADE_PADRAO']}
+    for blueprint in blueprints:
+        app.register_blueprint(blueprint, url_defaults=padrao)
+    for regra in list(app.url_map.iter_rules()):
+        if (regra.defaults or {}).get('propriedade') == padrao['propriedade']:
+            app.add_url_rule(f'/p/<propriedade>{regra.rule}', regra.endpoint,
+                             methods=regra.methods - {'HEAD', 'OPTIONS'})
+
+    @app.url_value_preprocessor
+    def _propriedade_da_url(endpoint, valores):
+        if valores and 'propriedade' in valores:
+            propriedade_id = valores.pop('propriedade')
+            if propriedade_id not in app.config['PROPRIEDADES']:
+                abort(404)
+            g.propriedade = propriedade_id
+
+    @app.url_defaults
+    def _propriedade_nas_urls(endpoint, valores):
+        if 'propriedade' not in valores and app.url_map.is_endpoint_expecting(endpoint, 'propriedade'):
+            valores['propriedade'] = propriedade_atual()
+
+    @app.context_processor
+    def _propriedades_nos_templates():
+        return {'propriedade_atual': propriedade_atual(), 'propriedades': app.config['PROPRIEDADES']}
@@ -0,0 +1,133 @@
+from datetime import datetime
+from sqlalchemy import func, distinct, cast, or_, and_, Integer
+from sqlalchemy.orm import selectinload
+from .models import db, Checkin, Hospede, FAIXAS_ETARIAS
+from .busca import expressao_busca, ids_hospedes_por_termo
+
+
+def com_hospedes(query):
+    """Carrega os hóspedes dos check-ins em uma única consulta adicional (evita N+1)"""
+    return query.options(selectinload(Checkin.hospedes))
+
+
+def listar_checkins_ativos():
+    """Retorna os check-ins ativos com os hóspedes já carregados"""
+    return com_hospedes(Checkin.query.filter_by(status='Ativo')).all()
+
+
+def filtrar_checkins(status=None, numero_apartamento=None, nome_filtro='', data_inicio='', data_fim=''):
+    """Monta a query de check-ins aplicando os filtros informados"""
+    query = Checkin.query
+    if status:
+        query = query.filter(Checkin.status == status)
+    if numero_apartamento:
+        query = query.filter(Checkin.numero_apartamento == numero_apartamento)
+
+    if nome_filtro and expressao_busca(nome_filtro):
+        # Buscar o hóspede principal pelo índice textual (nome) ou pelos índices cegos (CPF, documento, telefone).
+        # IN sobre os ids dos check-ins (e não JOIN): com o filtro de data o SQLite percorria a
+        # lista do FTS para cada check-in.
+        principais = db.session.query(Hospede.checkin_id).filter(
+            Hospede.is_principal == True,
+            Hospede.id.in_(ids_hospedes_por_termo(nome_filtro))
+        )
+        query = query.filter(Checkin.id.in_(principais))
+
+    if data_inicio:
+        try:
+            data_inicio_obj = datetime.strptime(data_inicio, '%Y-%m-%d').date()
+            query = query.filter(Checkin.data_checkin >= data_inicio_obj)
+        except ValueError:
+            pass
+
+    if data_fim:
+        try:
+            data_fim_obj = datetime.strptime(data_fim, '%Y-%m-%d').date()
+            query = query.filter(Checkin.data_checkin <= data_fim_obj)
+        except ValueError:
+            pass
+
+    return query
+
+
+def filtrar_historico(nome_filtro='', data_inicio='', data_fim=''):
+    """Monta a query de check-ins finalizados aplicando os filtros do histórico"""
+    return filtrar_checkins('Finalizado', nome_filtro=nome_filtro, data_inicio=data_inicio, data_fim=data_fim)
+
+
+def hospedes_por_checkin(checkin_ids):
+    """Carrega os hóspedes de vários check-ins em uma consulta, agrupados por checkin_id"""
+    agrupados = {checkin_id: [] for checkin_id in checkin_ids}
+    if checkin_ids:
+        for hospede in Hospede.query.filter(Hospede.checkin_id.in_(checkin_ids)).order_by(Hospede.id):
+            agrupados[hospede.checkin_id].append(hospede)
+    return agrupados
+
+
+def codificar_cursor(checkin):
+    """Gera o cursor de paginação (data_checkin + id) do último check-in de uma página"""
+    return f"{checkin.data_checkin.isoformat()}_{checkin.id}"
+
+
+def decodificar_cursor(cursor):
+    """Converte um cursor em (data_checkin, id); retorna None se for inválido"""
+    try:
+        data_str, id_str = cursor.rsplit('_', 1)
+        return datetime.fromisoformat(data_str), int(id_str)
+    except (AttributeError, ValueError):
+        return None
+
+
+def paginar_historico(query, cursor=None, limite=30):
+    """Retorna uma página do histórico via keyset em (data_checkin, id) e o cursor da próxima"""
+    posicao = decodificar_cursor(cursor) if cursor else None
+    if posicao:
+        data_checkin, checkin_id = posicao
+        query = query.filter(or_(
+            Checkin.data_checkin < data_checkin,
+            and_(Checkin.data_checkin == data_checkin, Checkin.id < checkin_id)
+        ))
+
+    # Busca um registro a mais para saber se existe próxima página
+    checkins = com_hospedes(query).order_by(
+        Checkin.data_checkin.desc(), Checkin.id.desc()
+    ).limit(limite + 1).all()
+
+    proximo_cursor = None
+    if len(checkins) > limite:
+        checkins = checkins[:limite]
+        proximo_cursor = codificar_cursor(checkins[-1])
+
+    return checkins, proximo_cursor
+
+
+def resumo_historico(query):
+    """Calcula as estatísticas do histórico filtrado com consultas agregadas"""
+    filtrados = query.with_entities(
+        Checkin.id, Checkin.numero_apartamento, Checkin.data_checkin, Checkin.data_checkout
+    ).subquery()
+
+    dias = cast(func.julianday(filtrados.c.data_checkout) - func.julianday(filtrados.c.data_checkin), Integer)
+    total_checkins, total_apartamentos, media_dias = db.session.query(
+        func.count(filtrados.c.id),
+        func.count(distinct(filtrados.c.numero_apartamento)),
+        func.avg(dias)
+    ).one()
+
+    # Hóspedes por faixa etária (idade atual calculada no banco); o total sai da mesma consulta
+    por_faixa = dict(db.session.query(Hospede.faixa_etaria, func.count(Hospede.id)).filter(
+        Hospede.checkin_id.in_(db.session.query(filtrados.c.id))
+    ).group_by(Hospede.faixa_etaria).all())
+
+    return {
+        'total_checkins': total_checkins,
+        'total_hospedes': sum(por_faixa.values()),
+        'faixas_etarias': [(rotulo, por_faixa.get(rotulo, 0)) for _, rotulo in FAIXAS_ETARIAS],
+        'total_apartamentos': total_apartamentos,
+        'media_dias': int(round(media_dias or 0))
+    }
+
+
+def versao_checkins():
+    """Retorna (última alteração, quantidade) dos check-ins: muda sempre que alguma listagem muda"""
+    return db.session.query(func.max(Checkin.atualizado_em), func.count(Checkin.id)).one()
@@ -0,0 +1,340 @@
+import logging
+import os
+import threading
+from datetime import datetime, date, time, timedelta
+from flask import current_app
+from sqlalchemy import and_, func, or_, select, update
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from src.utils.cache_paginas import invalidar_cards
+from .models import db, Checkin, Tarefa
+from .criptografia import chaveiro
+from .dados_pessoais import apagando_com_seguranca, contar_linhas, recifrar_lote, tabelas_cifradas
+from .eventos import remover_eventos_antigos
+from .idempotencia import remover_chaves_expiradas
+from .ocupacao import mapa_ocupacao
+from .previsao import previsao_ocupacao
+from .propriedades import propriedade_atual, usando_propriedade
+
+logger = logging.getLogger(__name__)
+
+# Check-ins finalizados por transação no checkout em lote
+TAMANHO_LOTE = 50
+# Segundos entre as verificações da fila quando não há tarefas novas
+INTERVALO = 5
+# Tarefa "Executando" sem progresso por esse tempo é considerada abandonada (processo encerrado)
+TEMPO_ABANDONO = timedelta(minutes=10)
+
+# Funções que executam cada tipo de tarefa: tipo -> função(tarefa, **parametros)
+TIPOS = {}
+
+# Acorda o trabalhador deste processo quando uma tarefa é enfileirada
+_nova_tarefa = threading.Event()
+_trava_inicio = threading.Lock()
+# Último dia em que cada tarefa diária (checkout automático, limpezas) já foi enfileirada por
+# este processo, por propriedade (evita um INSERT a cada ciclo)
+_agendadas_hoje = {}
+
+
+def tipo_tarefa(tipo):
+    """Registra a função que executa as tarefas do tipo informado"""
+    def registrar(funcao):
+        TIPOS[tipo] = funcao
+        return funcao
+    return registrar
+
+
+def enfileirar(tipo, parametros=None, chave=None, executar_em=None):
+    """Grava uma tarefa pendente e confirma a transação; retorna o id da tarefa.
+
+    Com `chave`, a tarefa só é criada se ainda não existir outra com a mesma chave
+    (nesse caso retorna None), o que permite agendar de vários processos sem duplicar.
+    """
+    if tipo not in TIPOS:
+        raise ValueError(f'Tipo de tarefa desconhecido: {tipo}')
+    agora = datetime.utcnow()
+    comando = sqlite_insert(Tarefa.__table__).values(
+        tipo=tipo, parametros=parametros or {}, chave=chave, status='Pendente', total=0,
+        processados=0, falhas=0, criada_em=agora, executar_em=executar_em or agora
+    )
+    tarefa_id = db.session.execute(
+        comando.on_conflict_do_nothing(index_elements=['chave']).returning(Tarefa.id)
+    ).scalar()
+    db.session.commit()
+    if tarefa_id:
+        _nova_tarefa.set()
+    return tarefa_id
+
+
+def reservar_proxima():
+    """Marca como "Executando" a próxima tarefa vencida (ou abandonada) e a retorna.
+
+    A reserva é um único UPDATE: com vários processos lendo a mesma fila, o lock de
+    escrita do SQLite garante que cada tarefa seja entregue a um só trabalhador.
+    """
+    tarefas = Tarefa.__table__
+    agora = datetime.utcnow()
+    disponivel = or_(
+        and_(tarefas.c.status == 'Pendente', tarefas.c.executar_em <= agora),
+        and_(tarefas.c.status == 'Executando',
+             func.coalesce(tarefas.c.atualizada_em, tarefas.c.iniciada_em) < agora - TEMPO_ABANDONO)
+    )
+    proxima = select(tarefas.c.id).where(disponivel) \
+        .order_by(tarefas.c.executar_em, tarefas.c.id).limit(1).scalar_subquery()
+    tarefa_id = db.session.execute(
+        update(tarefas).where(tarefas.c.id == proxima, disponivel)
+        .values(status='Executando', iniciada_em=agora, atualizada_em=agora)
+        .returning(tarefas.c.id)
+    ).scalar()
+    db.session.commit()
+    return db.session.get(Tarefa, tarefa_id) if tarefa_id else None
+
+
+def executar(tarefa):
+    """Executa uma tarefa reservada e grava o resultado (Concluída ou Erro)"""
+    try:
+        tarefa.mensagem = TIPOS[tarefa.tipo](tarefa, **tarefa.parametros)
+        tarefa.status = 'Concluída'
+    except Exception as e:
+        db.session.rollback()
+        logger.exception('Falha na tarefa %s (%s)', tarefa.id, tarefa.tipo)
+        tarefa.status = 'Erro'
+        tarefa.mensagem = str(e) or e.__class__.__name__
+    tarefa.concluida_em = datetime.utcnow()
+    db.session.commit()
+
+
+def executar_pendentes(app):
+    """Agenda as tarefas automáticas e executa as tarefas vencidas até esvaziar a fila de cada propriedade"""
+    executadas = 0
+    with app.app_context():
+        try:
+            for propriedade_id in app.config['PROPRIEDADES']:
+                # A fila fica no banco de cada propriedade
+                with usando_propriedade(propriedade_id):
+                    agendar_checkout_automatico(app.config.get('CHECKOUT_AUTOMATICO_HORARIO'))
+                    agendar_limpeza_eventos(app.config.get('EVENTOS_RETENCAO_DIAS'))
+                    agendar_limpeza_idempotencia()
+                    while (tarefa := reservar_proxima()) is not None:
+                        executar(tarefa)
+                        executadas += 1
+        finally:
+            db.session.remove()
+    return executadas
+
+
+class TrabalhadorTarefas(threading.Thread):
+    """Thread que consome a fila de tarefas do banco (uma por processo)"""
+
+    def __init__(self, app, intervalo=INTERVALO):
+        super().__init__(name='trabalhador-tarefas', daemon=True)
+        self.app = app
+        self.intervalo = intervalo
+        self.pid = os.getpid()
+        self._parar = threading.Event()
+
+    def parar(self):
+        self._parar.set()
+        _nova_tarefa.set()
+
+    def run(self):
+        while not self._parar.is_set():
+            _nova_tarefa.clear()
+            try:
+                executar_pendentes(self.app)
+            except Exception:
+                logger.exception('Falha ao processar a fila de tarefas')
+            _nova_tarefa.wait(self.intervalo)
+
+
+def iniciar_trabalhador(app):
+    """Inicia o trabalhador de tarefas deste processo, se ainda não estiver rodando.
+
+    Chamada na primeira requisição (e não na criação da aplicação) para que cada
+    worker do gunicorn, criado por fork, tenha a sua própria thread.
+    """
+    trabalhador = app.extensions.get('trabalhador_tarefas')
+    if trabalhador is not None and trabalhador.pid == os.getpid() and trabalhador.is_alive():
+        return trabalhador
+    with _trava_inicio:
+        trabalhador = app.extensions.get('trabalhador_tarefas')
+        if trabalhador is None or trabalhador.pid != os.getpid() or not trabalhador.is_alive():
+            trabalhador = TrabalhadorTarefas(app, app.config.get('TAREFAS_INTERVALO', INTERVALO))
+            trabalhador.start()
+            app.extensions['trabalhador_tarefas'] = trabalhador
+    return trabalhador
+
+
+def enfileirar_checkout_em_lote(ate=None, ids=None, chave=None):
+    """Valida os filtros e enfileira o checkout em lote; retorna o id da tarefa.
+
+    `ate` (AAAA-MM-DD, padrão hoje) finaliza os check-ins ativos com saída prevista até
+    a data (inclusive os atrasados); `ids` restringe a check-ins específicos.
+    """
+    ate = ate or date.today().isoformat()
+    try:
+        date.fromisoformat(ate)
+    except (TypeError, ValueError):
+        raise ValueError('Data inválida; use o formato AAAA-MM-DD')
+    parametros = {'ate': ate}
+    if ids is not None:
+        try:
+            parametros['ids'] = [int(checkin_id) for checkin_id in ids]
+        except (TypeError, ValueError):
+            raise ValueError('Lista de check-ins inválida')
+    return enfileirar('checkout_em_lote', parametros, chave=chave)
+
+
+def agendar_checkout_automatico(horario, agora=None):
+    """Enfileira o checkout automático do dia depois do horário configurado ("HH:MM").
+
+    Finaliza os check-ins com saída prevista até hoje que continuarem ativos; a chave
+    por data garante uma única tarefa por dia, mesmo com vários processos.
+    """
+    if not horario:
+        return None
+    agora = agora or datetime.now()
+    hora, minuto = (int(parte) for parte in horario.split(':'))
+    hoje = agora.date().isoformat()
+    agendamento = (propriedade_atual(), 'checkout_automatico')
+    if agora.time() < time(hora, minuto) or _agendadas_hoje.get(agendamento) == hoje:
+        return None
+    tarefa_id = enfileirar_checkout_em_lote(hoje, chave=f'checkout-automatico:{hoje}')
+    _agendadas_hoje[agendamento] = hoje
+    return tarefa_id
+
+
+def _agendar_uma_vez_por_dia(tipo, parametros, hoje=None):
+    """Enfileira a tarefa do dia com a chave "<tipo>:<data>", consultando o banco só uma vez por dia"""
+    hoje = (hoje or date.today()).isoformat()
+    agendamento = (propriedade_atual(), tipo)
+    if _agendadas_hoje.get(agendamento) == hoje:
+        return None
+    tarefa_id = enfileirar(tipo, parametros, chave=f'{tipo.replace("_", "-")}:{hoje}')
+    _agendadas_hoje[agendamento] = hoje
+    return tarefa_id
+
+
+def agendar_limpeza_eventos(dias, hoje=None):
+    """Enfileira uma vez por dia a remoção dos eventos com mais de `dias` dias (vazio desliga)"""
+    if not dias:
+        return None
+    return _agendar_uma_vez_por_dia('limpar_eventos', {'dias': dias}, hoje)
+
+
+def agendar_limpeza_idempotencia(hoje=None):
+    """Enfileira uma vez por dia a remoção das chaves de idempotência expiradas"""
+    return _agendar_uma_vez_por_dia('limpar_chaves_idempotencia', {}, hoje)
+
+
+@tipo_tarefa('limpar_eventos')
+def limpar_eventos(tarefa, dias):
+    """Remove os eventos antigos já entregues a todos os webhooks"""
+    removidos = remover_eventos_antigos(dias, current_app.config.get('WEBHOOKS', ()))
+    tarefa.total = tarefa.processados = removidos
+    return f'{removidos} eventos removidos'
+
+
+@tipo_tarefa('limpar_chaves_idempotencia')
+def limpar_chaves_idempotencia(tarefa):
+    """Remove as chaves de idempotência expiradas"""
+    removidas = remover_chaves_expiradas()
+    tarefa.total = tarefa.processados = removidas
+    return f'{removidas} chaves removidas'
+
+
+def enfileirar_recifragem():
+    """Enfileira a recifragem dos dados pessoais com a chave atual (após a troca de chave); retorna o id da tarefa"""
+    return enfileirar('recifrar', {'chave': chaveiro().atual})
+
+
+@tipo_tarefa('recifrar')
+def recifrar(tarefa, chave):
+    """Cifra com a chave `chave` os dados pessoais gravados com chaves anteriores, em transações por lote.
+
+    O processo precisa estar com a mesma chave atual de quem enfileirou (reinicie os
+    processos após trocar a chave). Retomada, a tarefa relê as tabelas: as linhas já
+    recifradas não são regravadas.
+    """
+    if chave != chaveiro().atual:
+        raise ValueError(f'A tarefa é da chave {chave!r}, mas a chave atual deste processo é {chaveiro().atual!r}: '
+                         'reinicie o processo (chave nova) ou enfileire a recifragem de novo (tarefa antiga)')
+    conexao = db.session.connection()
+    partes = tabelas_cifradas(conexao)
+    tarefa.total = contar_linhas(conexao, partes)
+    tarefa.processados = 0
+    db.session.commit()
+
+    regravadas = 0
+    for esquema, nome in partes:
+        apos = 0
+        while True:
+            conexao = db.session.connection()
+            with apagando_com_seguranca(conexao):
+                apos, lidas, alteradas = recifrar_lote(conexao, esquema, nome, apos)
+            if not lidas:
+                break
+            regravadas += alteradas
+            tarefa.processados = min(tarefa.processados + lidas, tarefa.total)
+            db.session.commit()
+    return f'{regravadas} registros cifrados com a chave {chave}'
+
+
+@tipo_tarefa('checkout_em_lote')
+def checkout_em_lote(tarefa, ate, ids=None):
+    """Finaliza os check-ins ativos com saída prevista até `ate`, em transações de TAMANHO_LOTE.
+
+    Cada lote grava os checkouts, as estatísticas e o progresso da tarefa na mesma
+    transação; se o lote falhar, os check-ins dele são finalizados um a um e os que
+    falharem contam em `falhas`.
+    """
+    consulta = select(Checkin.id).where(Checkin.status == 'Ativo',
+                                        Checkin.data_checkout_prevista <= date.fromisoformat(ate))
+    if ids is not None:
+        consulta = consulta.where(Checkin.id.in_(ids))
+    pendentes = db.session.execute(consulta.order_by(Checkin.id)).scalars().all()
+    # Tarefa retomada: o que já foi processado continua contando no progresso
+    tarefa.total = tarefa.processados + len(pendentes)
+    db.session.commit()
+
+    finalizados = 0
+    for inicio in range(0, len(pendentes), TAMANHO_LOTE):
+        lote = pendentes[inicio:inicio + TAMANHO_LOTE]
+        try:
+            checkins = _finalizar(lote)
+            tarefa.processados += len(lote)
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            logger.exception('Falha no lote de checkout da tarefa %s; finalizando um a um', tarefa.id)
+            checkins = []
+            # Contadas à parte: o rollback da falha seguinte descartaria o incremento em `tarefa`
+            falhas = 0
+            for checkin_id in lote:
+                try:
+                    checkins += _finalizar([checkin_id])
+                    db.session.commit()
+                except Exception:
+                    db.session.rollback()
+                    logger.exception('Falha ao finalizar o check-in %s', checkin_id)
+                    falhas += 1
+            tarefa.falhas += falhas
+            tarefa.processados += len(lote)
+            db.session.commit()
+
+        finalizados += len(checkins)
+        for numero_apartamento, checkin_id in checkins:
+            mapa_ocupacao.liberar(numero_apartamento, checkin_id)
+            invalidar_cards(checkin_id)
+        previsao_ocupacao.invalidar()
+
+    return f'{finalizados} check-outs realizados' + (f', {tarefa.falhas} com erro' if tarefa.falhas else '')
+
+
+def _finalizar(checkin_ids):
+    """Finaliza (sem confirmar) os check-ins que ainda estiverem ativos.
+
+    Os finalizados por outro processo (balcão) entre a leitura e o UPDATE são pulados.
+    Retorna (apartamento, id) dos finalizados, lidos antes do commit expirar os objetos.
+    """
+    checkins = Checkin.query.filter(Checkin.id.in_(checkin_ids), Checkin.status == 'Ativo').all()
+    return [(checkin.numero_apartamento, checkin.id) for checkin in checkins if checkin.finalizar_checkin()]
@@ -0,0 +1,149 @@
+from datetime import datetime
+from src.utils.contato import telefone_e164
+from .models import Checkin, Hospede
+from .perfis import completar_com_perfil
+
+# Esquema de um hóspede: campo -> (rótulo, tipo, obrigatório no principal, obrigatório no acompanhante).
+# Acompanhantes não têm endereço (None: campo ignorado).
+ESQUEMA_HOSPEDE = {
+    'nome_completo': ('nome completo', 'texto', True, True),
+    'data_nascimento': ('data de nascimento', 'data', True, True),
+    'documento': ('documento', 'texto', True, True),
+    'orgao_expedidor': ('órgão expedidor', 'texto', False, False),
+    'uf_documento': ('UF do documento', 'texto', False, False),
+    'cpf': ('CPF', 'texto', False, False),
+    'ddd': ('DDD', 'texto', True, False),
+    'telefone': ('telefone', 'texto', True, False),
+    'email': ('e-mail', 'texto', False, False),
+    'observacoes': ('observações', 'texto', False, False),
+    'endereco': ('endereço', 'texto', False, None),
+    'cep': ('CEP', 'texto', False, None),
+    'cidade': ('cidade', 'texto', False, None),
+    'estado': ('estado', 'texto', False, None),
+    'pais': ('país', 'texto', False, None),
+}
+
+
+class DadosInvalidos(ValueError):
+    """Erros de validação de um envio, todos de uma vez: {campo: mensagem}"""
+
+    def __init__(self, erros):
+        super().__init__('; '.join(erros.values()))
+        self.erros = erros
+
+
+def _texto(tamanho):
+    def converter(valor):
+        if isinstance(valor, (int, float)) and not isinstance(valor, bool):
+            valor = str(valor)
+        if not isinstance(valor, str):
+            raise ValueError('deve ser texto')
+        valor = valor.strip()
+        if tamanho and len(valor) > tamanho:
+            raise ValueError(f'deve ter até {tamanho} caracteres')
+        return valor
+    return converter
+
+
+def _data(valor):
+    try:
+        return datetime.strptime(valor.strip(), '%Y-%m-%d').date()
+    except (AttributeError, TypeError, ValueError):
+        raise ValueError('inválida; use o formato AAAA-MM-DD')
+
+
+def _compilar(esquema, tabela, is_principal):
+    """Lista (campo, rótulo, obrigatório, conversor) do esquema, com o tamanho máximo de cada coluna"""
+    campos = []
+    for campo, (rotulo, tipo, principal, acompanhante) in esquema.items():
+        obrigatorio = principal if is_principal else acompanhante
+        if obrigatorio is None:
+            continue
+        conversor = _data if tipo == 'data' else _texto(tabela.c[campo].type.length)
+        campos.append((campo, rotulo, obrigatorio, conversor))
+    return tuple(campos)
+
+
+# Compilados uma vez, na importação do módulo
+_CAMPOS_PRINCIPAL = _compilar(ESQUEMA_HOSPEDE, Hospede.__table__, True)
+_CAMPOS_ACOMPANHANTE = _compilar(ESQUEMA_HOSPEDE, Hospede.__table__, False)
+CAMPOS_ENDERECO = tuple(campo for campo, (_, _, _, acompanhante) in ESQUEMA_HOSPEDE.items() if acompanhante is None)
+_CAMPOS_CHECKIN = (
+    ('numero_apartamento', 'número do apartamento', True, _texto(Checkin.__table__.c.numero_apartamento.type.length)),
+    ('data_checkout_prevista', 'data de check-out prevista', True, _data),
+)
+
+
+def _mensagem(descricao, texto):
+    texto = descricao + texto
+    return texto[0].upper() + texto[1:]
+
+
+def _validar(dados, campos, prefixo, descricao, erros):
+    """Converte os campos de `dados`, acumulando em `erros` o problema de cada um"""
+    valores = {}
+    for campo, rotulo, obrigatorio, conversor in campos:
+        valor = dados.get(campo)
+        if valor not in (None, ''):
+            try:
+                valor = conversor(valor)
+            except ValueError as e:
+                erros[prefixo + campo] = _mensagem(descricao, f'{rotulo} {e}')
+                continue
+        if obrigatorio and valor in (None, ''):
+            erros[prefixo + campo] = _mensagem(descricao, f'informe o campo {rotulo}')
+        valores[campo] = valor
+    return valores
+
+
+def preparar_hospede(valores, is_principal):
+    """Valores das colunas de um hóspede a partir dos campos já validados"""
+    if not is_principal:
+        valores.update(dict.fromkeys(CAMPOS_ENDERECO))
+    # DDD e telefone são opcionais para acompanhantes, mas as colunas não aceitam nulo
+    valores['ddd'] = valores['ddd'] or ''
+    valores['telefone'] = valores['telefone'] or ''
+    # Telefone normalizado uma vez na gravação; as páginas só leem a coluna
+    valores['telefone_e164'] = telefone_e164(valores['pais'], valores['ddd'], valores['telefone'])
+    valores.update(Hospede.indices_cegos(valores['cpf'], valores['documento'], valores['telefone_e164']))
+    valores['idade_registrada'] = Hospede.calcular_idade(valores['data_nascimento'])
+    valores['is_principal'] = is_principal
+    return valores
+
+
+def validar_checkin(dados):
+    """Valida um check-in (JSON da API, formulário convertido ou registro da importação).
+
+    Todos os campos são verificados em uma passagem e os problemas são levantados juntos
+    em DadosInvalidos. Retorna {numero_apartamento, data_checkout_prevista, hospedes}, com
+    os valores das colunas de cada hóspede (o principal primeiro).
+    """
+    if not isinstance(dados, dict):
+        raise DadosInvalidos({'': 'O check-in deve ser um objeto JSON'})
+    erros = {}
+    validos = _validar(dados, _CAMPOS_CHECKIN, '', '', erros)
+
+    principal = dados.get('hospede_principal') or {}
+    acompanhantes = dados.get('acompanhantes') or []
+    if not isinstance(acompanhantes, list):
+        erros['acompanhantes'] = 'Os acompanhantes devem ser uma lista'
+        acompanhantes = []
+    pessoas = [('hospede_principal.', 'Hóspede principal: ', principal, True)]
+    pessoas += [(f'acompanhantes[{i}].', f'Acompanhante {i + 1}: ', acompanhante, False)
+                for i, acompanhante in enumerate(acompanhantes)]
+
+    hospedes = []
+    for prefixo, descricao, pessoa, is_principal in pessoas:
+        if not isinstance(pessoa, dict):
+            erros[prefixo[:-1]] = _mensagem(descricao, 'os dados devem ser um objeto')
+            continue
+        # Hóspede recorrente: campos não preenchidos vêm do perfil selecionado
+        if pessoa.get('perfil_id'):
+            pessoa = completar_com_perfil(pessoa, pessoa.get('perfil_id'))
+        campos = _CAMPOS_PRINCIPAL if is_principal else _CAMPOS_ACOMPANHANTE
+        hospedes.append((_validar(pessoa, campos, prefixo, descricao, erros), is_principal))
+
+    if erros:
+        raise DadosInvalidos(erros)
+    validos['hospedes'] = [preparar_hospede(valores, is_principal) for valores, is_principal in hospedes]
+    return validos
@@ -0,0 +1,281 @@
+import json
+import time
+from itertools import islice
+from flask import Blueprint, Response, current_app, request, jsonify, stream_with_context, url_for
+from src.models import db, Checkin, CheckinFinalizado, Tarefa
+from src.models.arquivo import arquivo_disponivel, lendo_arquivo
+from src.models.eventos import ESPERA_MAXIMA, LIMITE_MAXIMO, LIMITE_PADRAO, esperar_eventos, ler_posicao, ler_tipos
+from src.models.idempotencia import ChaveReutilizada, ler_chave
+from src.models.ocupacao import mapa_ocupacao, ApartamentoOcupado
+from src.models.previsao import previsao_ocupacao, ler_data, ler_dias
+from src.models.importacao import importar_checkins, ler_csv
+from src.models.queries import filtrar_checkins, hospedes_por_checkin
+from src.models.tarefas import enfileirar_checkout_em_lote
+from src.models.validacao import DadosInvalidos
+from src.routes.checkin import registrar_checkin_uma_vez, registrar_checkout
+from src.utils import sse
+from src.utils.instrumentacao import medir_etapa
+
+api_bp = Blueprint('api', __name__, url_prefix='/api/v1')
+
+# Quantidade de check-ins lidos do cursor e serializados por vez nas listagens
+TAMANHO_LOTE = 500
+
+
+def erro(mensagem, status, **detalhes):
+    """Resposta de erro padrão da API (com `detalhes`, ex.: os erros de cada campo)"""
+    return jsonify({'erro': mensagem, **detalhes}), status
+
+
+def serializar_em_lotes(query):
+    """Percorre a query em lotes e gera os check-ins já serializados.
+    
+    Os check-ins são lidos do cursor com yield_per e os hóspedes de cada lote vêm de
+    uma única consulta, de forma que a memória usada não depende do tamanho do resultado.
+    """
+    checkins = iter(query.order_by(Checkin.id).yield_per(TAMANHO_LOTE))
+    while True:
+        lote = list(islice(checkins, TAMANHO_LOTE))
+        if not lote:
+            break
+        hospedes = hospedes_por_checkin([checkin.id for checkin in lote])
+        for checkin in lote:
+            with medir_etapa('serializacao'):
+                item = checkin.to_dict(hospedes[checkin.id])
+            yield item
+
+
+def _gerar_ndjson(itens):
+    for item in itens:
+        with medir_etapa('serializacao'):
+            linha = json.dumps(item, ensure_ascii=False) + '\n'
+        yield linha
+
+
+def _gerar_json(itens):
+    yield '['
+    for indice, item in enumerate(itens):
+        with medir_etapa('serializacao'):
+            trecho = (',' if indice else '') + json.dumps(item, ensure_ascii=False)
+        yield trecho
+    yield ']'
+
+
+@api_bp.route('/checkins', methods=['GET'])
+def listar_checkins():
+    """Lista check-ins com filtros, em JSON ou NDJSON (?formato=ndjson), com resposta em streaming"""
+    query = filtrar_checkins(
+        status=request.args.get('status'),
+        numero_apartamento=request.args.get('apartamento'),
+        nome_filtro=request.args.get('nome', ''),
+        data_inicio=request.args.get('data_inicio', ''),
+        data_fim=request.args.get('data_fim', '')
+    )
+    itens = serializar_em_lotes(query)
+
+    if request.args.get('formato') == 'ndjson' or request.accept_mimetypes.best == 'application/x-ndjson':
+        return Response(stream_with_context(_gerar_ndjson(itens)), mimetype='application/x-ndjson')
+    return Response(stream_with_context(_gerar_json(itens)), mimetype='application/json')
+
+
+@api_bp.route('/checkins/<int:checkin_id>', methods=['GET'])
+def detalhar_checkin(checkin_id):
+    """Retorna um check-in com os hóspedes"""
+    checkin = db.session.get(Checkin, checkin_id)
+    if not checkin and arquivo_disponivel():
+        with lendo_arquivo():
+            checkin = db.session.get(Checkin, checkin_id)
+            if checkin:
+                return jsonify({**checkin.to_dict(), 'arquivado': True})
+    if not checkin:
+        return erro('Check-in não encontrado', 404)
+    return jsonify(checkin.to_dict())
+
+
+@api_bp.route('/checkins', methods=['POST'])
+def criar_checkin():
+    """Cria um check-in a partir de um JSON com hospede_principal e acompanhantes.
+
+    Com o cabeçalho Idempotency-Key, um envio repetido com a mesma chave e os mesmos dados
+    recebe a resposta do primeiro (com Idempotent-Replayed: true), sem gravar de novo.
+    """
+    dados = request.get_json(silent=True)
+    if not isinstance(dados, dict):
+        return erro('Corpo da requisição deve ser um objeto JSON', 400)
+
+    try:
+        resposta, repetido = registrar_checkin_uma_vez(dados, ler_chave(request.headers.get('Idempotency-Key')))
+    except DadosInvalidos as e:
+        db.session.rollback()
+        return erro(str(e), 400, erros=e.erros)
+    except ApartamentoOcupado as e:
+        return erro(str(e), 409)
+    except ChaveReutilizada as e:
+        return erro(str(e), 422)
+    except ValueError as e:
+        db.session.rollback()
+        return erro(str(e), 400)
+    except Exception as e:
+        db.session.rollback()
+        return erro(f'Erro ao realizar check-in: {str(e)}', 500)
+
+    return jsonify(resposta), 201, {'Idempotent-Replayed': 'true'} if repetido else {}
+
+
+@api_bp.route('/checkins/<int:checkin_id>/checkout', methods=['POST'])
+def checkout(checkin_id):
+    """Finaliza um check-in ativo"""
+    checkin = db.session.get(Checkin, checkin_id)
+    if not checkin:
+        return erro('Check-in não encontrado', 404)
+    if checkin.status != 'Ativo':
+        return erro('Este check-in já foi finalizado', 409)
+
+    try:
+        registrar_checkout(checkin)
+    except CheckinFinalizado as e:
+        return erro(str(e), 409)
+    except Exception as e:
+        db.session.rollback()
+        return erro(f'Erro ao finalizar check-in: {str(e)}', 500)
+
+    return jsonify(checkin.to_dict())
+
+
+@api_bp.route('/checkouts/lote', methods=['POST'])
+def checkout_em_lote():
+    """Enfileira o checkout dos check-ins com saída prevista até `data` (padrão: hoje), opcionalmente só dos `ids`"""
+    # Sem corpo, todos os check-ins com saída prevista até hoje
+    dados = request.get_json(silent=True) if request.get_data() else {}
+    if not isinstance(dados, dict):
+        return erro('Corpo da requisição deve ser um objeto JSON', 400)
+    try:
+        tarefa_id = enfileirar_checkout_em_lote(dados.get('data'), dados.get('ids'))
+    except ValueError as e:
+        return erro(str(e), 400)
+    except Exception as e:
+        db.session.rollback()
+        return erro(f'Erro ao agendar o checkout em lote: {str(e)}', 500)
+
+    tarefa = db.session.get(Tarefa, tarefa_id)
+    return jsonify(tarefa.to_dict()), 202, {'Location': url_for('api.detalhar_tarefa', tarefa_id=tarefa_id)}
+
+
+@api_bp.route('/tarefas/<int:tarefa_id>', methods=['GET'])
+def detalhar_tarefa(tarefa_id):
+    """Situação e progresso de uma tarefa em segundo plano"""
+    tarefa = db.session.get(Tarefa, tarefa_id)
+    if not tarefa:
+        return erro('Tarefa não encontrada', 404)
+    return jsonify(tarefa.to_dict())
+
+
+@api_bp.route('/checkins/importar', methods=['POST'])
+def importar():
+    """Importa vários check-ins de uma vez (CSV ou lista JSON), em uma única transação"""
+    if request.mimetype == 'text/csv':
+        registros = ler_csv(request.get_data(as_text=True))
+    else:
+        registros = request.get_json(silent=True)
+        if isinstance(registros, dict):
+            registros = registros.get('checkins')
+        if not isinstance(registros, list):
+            return erro('Envie uma lista JSON de check-ins ou um CSV (Content-Type: text/csv)', 400)
+
+    try:
+        checkin_ids, erros = importar_checkins(registros)
+    except ApartamentoOcupado as e:
+        return erro(str(e), 409)
+    except Exception as e:
+        db.session.rollback()
+        return erro(f'Erro ao importar check-ins: {str(e)}', 500)
+
+    status = 201 if checkin_ids else 400
+    return jsonify({'importados': len(checkin_ids), 'checkin_ids': checkin_ids, 'erros': erros}), status
+
+
+@api_bp.route('/apartamentos', methods=['GET'])
+def situacao_apartamentos():
+    """Situação (livre/ocupado) de todos os apartamentos conhecidos"""
+    return jsonify([
+        {'numero_apartamento': numero, 'status': 'ocupado' if checkin_id else 'livre', 'checkin_id': checkin_id}
+        for numero, checkin_id in mapa_ocupacao.situacao(current_app.config.get('APARTAMENTOS'))
+    ])
+
+
+@api_bp.route('/apartamentos/<numero_apartamento>', methods=['GET'])
+def situacao_apartamento(numero_apartamento):
+    """Situação de um apartamento, respondida pelo mapa de ocupação em memória"""
+    checkin_id = mapa_ocupacao.checkin_ativo(numero_apartamento)
+    return jsonify({'numero_apartamento': numero_apartamento,
+                    'status': 'ocupado' if checkin_id else 'livre',
+                    'checkin_id': checkin_id})
+
+
+@api_bp.route('/previsao', methods=['GET'])
+def previsao_ocupacao_api():
+    """Curva de ocupação prevista (?inicio=AAAA-MM-DD, padrão hoje; ?dias=N, padrão 28)"""
+    try:
+        curva = previsao_ocupacao.curva(ler_data(request.args.get('inicio')), ler_dias(request.args.get('dias')),
+                                        current_app.config.get('APARTAMENTOS'))
+    except ValueError as e:
+        return erro(str(e), 400)
+    return jsonify([{**item, 'data': item['data'].isoformat()} for item in curva])
+
+
+@api_bp.route('/previsao/<data>', methods=['GET'])
+def livres_na_data(data):
+    """Apartamentos livres na data, pelas saídas previstas (com o check-in que sai até lá, se houver)"""
+    try:
+        dia = ler_data(data)
+        livres = previsao_ocupacao.livres_em(dia, current_app.config.get('APARTAMENTOS'))
+    except ValueError as e:
+        return erro(str(e), 400)
+    return jsonify({'data': dia.isoformat(), 'total': len(livres),
+                    'apartamentos': [{'numero_apartamento': numero, 'checkin_saindo': checkin_id}
+                                     for numero, checkin_id in livres]})
+
+
+def _gerar_sse(posicao, tipos, limite, duracao):
+    """Eventos em mensagens server-sent events, por até `duracao` segundos.
+
+    O id de cada mensagem é a posição no fluxo: ao reconectar, o navegador (EventSource)
+    envia o último recebido em Last-Event-ID e a leitura continua dali.
+    """
+    fim = time.monotonic() + duracao
+    while (restante := fim - time.monotonic()) > 0:
+        eventos = esperar_eventos(posicao, min(restante, sse.PULSO), limite, tipos)
+        if not eventos:
+            yield sse.PULSO_MENSAGEM
+            continue
+        with medir_etapa('serializacao'):
+            trecho = ''.join(sse.mensagem(evento.to_dict(), evento.tipo, evento.id) for evento in eventos)
+        posicao = eventos[-1].id
+        # Um cliente lento não segura a conexão com o banco enquanto recebe
+        db.session.close()
+        yield trecho
+
+
+@api_bp.route('/eventos', methods=['GET'])
+def listar_eventos():
+    """Eventos dos check-ins após a posição `apos` (ou Last-Event-ID).
+
+    Com Accept: text/event-stream (ou ?formato=sse) a resposta é um fluxo SSE; senão, JSON
+    com os eventos e a posição `ultimo` para a próxima chamada. Em JSON, ?espera=N aguarda
+    até N segundos por eventos novos (long-poll) em vez de responder vazio.
+    """
+    try:
+        # Na reconexão do EventSource, Last-Event-ID é mais recente que o ?apos= da URL original
+        posicao = ler_posicao(request.headers.get('Last-Event-ID') or request.args.get('apos'))
+        tipos = ler_tipos(request.args.get('tipos'))
+    except ValueError as e:
+        return erro(str(e), 400)
+    limite = max(1, min(request.args.get('limite', LIMITE_PADRAO, type=int), LIMITE_MAXIMO))
+    espera = max(0.0, min(request.args.get('espera', 0, type=float), ESPERA_MAXIMA))
+
+    if request.args.get('formato') == 'sse' or request.accept_mimetypes.best == 'text/event-stream':
+        return sse.resposta_sse(_gerar_sse(posicao, tipos, limite, current_app.config['EVENTOS_SSE_DURACAO']))
+
+    eventos = esperar_eventos(posicao, espera, limite, tipos)
+    return jsonify({'eventos': [evento.to_dict() for evento in eventos],
+                    'ultimo': eventos[-1].id if eventos else posicao})
@@ -1,19 +1,85 @@
-from flask import Blueprint, render_template, request, redirect, url_for, flash, jsonify
+import re
+import uuid
+from contextlib import nullcontext
+from flask import (Blueprint, Response, abort, render_template, request, redirect, url_for, flash, jsonify,
+                   current_app, stream_with_context)
 from datetime import datetime, date
-from src.models import db, Hospede, Checkin
+from sqlalchemy.exc import IntegrityError
+from src.models import db, Hospede, Checkin, CheckinFinalizado, Evento
+from src.models.arquivo import arquivo_disponivel, lendo_arquivo
+from src.models.busca import buscar_hospedes
+from src.models.idempotencia import (ChaveReutilizada, calcular_impressao, guardar_resultado, lembrar_resultado,
+                                     ler_chave, resultado_salvo)
+from src.models.validacao import ESQUEMA_HOSPEDE, validar_checkin
+from src.models.ocupacao import (mapa_ocupacao, verificar_disponibilidade, violou_ocupacao,
+                                 ApartamentoOcupado)
+from src.models.previsao import previsao_ocupacao, ler_data, ler_dias
+from src.models.perfis import buscar_perfil, vincular_perfil
+from src.models.estatisticas import registrar_chegada
+from src.models.exportacao import exportar_registros
+from src.models.queries import (listar_checkins_ativos, filtrar_historico,
+                                paginar_historico, resumo_historico, versao_checkins)
+from src.models.eventos import ler_posicao, ultima_posicao
+from src.utils.cache_paginas import invalidar_cards, pagina_condicional
+from src.utils.quadro_ao_vivo import transmitir
+from src.utils.sse import resposta_sse
+from src.utils.planilha import MIMETYPES, gerar_planilha
 
 checkin_bp = Blueprint('checkin', __name__)
 
+# Campos de cada hóspede no formulário; os dos acompanhantes têm o prefixo acompanhante_<i>_
+CAMPOS_FORMULARIO = (*ESQUEMA_HOSPEDE, 'perfil_id')
+CAMPO_ACOMPANHANTE = re.compile(r'acompanhante_(\d+)_(\w+)$')
+
 @checkin_bp.route('/novo-checkin')
 def novo_checkin():
     """Página para criar um novo check-in"""
-    return render_template('novo_checkin.html')
+    # Cada formulário aberto é um envio: reenvios dele (clique duplo) não criam outro check-in
+    return render_template('novo_checkin.html', chave_idempotencia=uuid.uuid4().hex)
 
 @checkin_bp.route('/checkins-ativos')
 def checkins_ativos():
-    """Página com lista de check-ins ativos"""
-    checkins = Checkin.query.filter_by(status='Ativo').all()
-    return render_template('checkins_ativos.html', checkins=checkins)
+    """Página com lista de check-ins ativos, atualizada ao vivo a partir da posição dos eventos"""
+    # Lida antes da lista: um evento gravado entre as duas consultas é reenviado, e não perdido
+    posicao = ultima_posicao()
+    return pagina_condicional(versao_checkins(), lambda: render_template(
+        'checkins_ativos.html', checkins=listar_checkins_ativos(), hoje=date.today(), posicao=posicao), posicao)
+
+@checkin_bp.route('/checkins-ativos/ao-vivo')
+def checkins_ativos_ao_vivo():
+    """Alterações do quadro de check-ins ativos (server-sent events) após a posição da página"""
+    try:
+        posicao = ler_posicao(request.headers.get('Last-Event-ID') or request.args.get('apos'))
+    except ValueError:
+        abort(400)
+    return resposta_sse(transmitir(posicao, current_app.config['EVENTOS_SSE_DURACAO']))
+
+@checkin_bp.route('/ocupacao')
+def ocupacao():
+    """Mapa de ocupação dos apartamentos"""
+    apartamentos = mapa_ocupacao.situacao(current_app.config.get('APARTAMENTOS'))
+    return render_template('ocupacao.html', apartamentos=apartamentos)
+
+@checkin_bp.route('/previsao')
+def previsao():
+    """Calendário da ocupação prevista (pelas saídas previstas) e apartamentos livres no dia escolhido"""
+    configurados = current_app.config.get('APARTAMENTOS')
+    try:
+        hoje = date.today()
+        inicio = ler_data(request.args.get('inicio'), hoje)
+        dia = ler_data(request.args.get('dia'), inicio)
+        curva = previsao_ocupacao.curva(inicio, ler_dias(request.args.get('dias')), configurados)
+        livres = previsao_ocupacao.livres_em(dia, configurados)
+    except ValueError as e:
+        flash(str(e), 'error')
+        return redirect(url_for('checkin.previsao'))
+
+    # Semanas de segunda a domingo; dias fora do período ficam vazios
+    dias = [None] * inicio.weekday() + curva
+    semanas = [dias[i:i + 7] for i in range(0, len(dias), 7)]
+    semanas[-1] += [None] * (7 - len(semanas[-1]))
+    return render_template('previsao.html', semanas=semanas, curva=curva, dia=dia, livres=livres,
+                           inicio=inicio, hoje=hoje, dias=len(curva))
 
 @checkin_bp.route('/historico')
 def historico():
@@ -22,93 +88,131 @@ def historico():
     nome_filtro = request.args.get('nome', '')
     data_inicio = request.args.get('data_inicio', '')
     data_fim = request.args.get('data_fim', '')
+    cursor = request.args.get('cursor', '')
+    arquivo = pesquisar_arquivo()
     
-    # Query base para check-ins finalizados
-    query = Checkin.query.filter_by(status='Finalizado')
-    
-    # Aplicar filtros se fornecidos
-    if nome_filtro:
-        # Buscar por nome do hóspede principal
-        query = query.join(Hospede).filter(
-            Hospede.is_principal == True,
-            Hospede.nome_completo.ilike(f'%{nome_filtro}%')
-        )
+    def gerar():
+        with banco_de_leitura(arquivo):
+            query = filtrar_historico(nome_filtro, data_inicio, data_fim)
+            checkins, proximo_cursor = paginar_historico(query, cursor, limite_pagina())
+            resumo = resumo_historico(query)
+            
+            return render_template('historico.html', 
+                                 checkins=checkins,
+                                 resumo=resumo,
+                                 cursor=cursor,
+                                 proximo_cursor=proximo_cursor,
+                                 nome_filtro=nome_filtro,
+                                 data_inicio=data_inicio,
+                                 data_fim=data_fim,
+                                 arquivo=arquivo)
     
-    if data_inicio:
-        try:
-            data_inicio_obj = datetime.strptime(data_inicio, '%Y-%m-%d').date()
-            query = query.filter(Checkin.data_checkin >= data_inicio_obj)
-        except ValueError:
-            pass
-    
-    if data_fim:
-        try:
-            data_fim_obj = datetime.strptime(data_fim, '%Y-%m-%d').date()
-            query = query.filter(Checkin.data_checkin <= data_fim_obj)
-        except ValueError:
-            pass
-    
-    checkins = query.order_by(Checkin.data_checkin.desc()).all()
-    
-    return render_template('historico.html', 
-                         checkins=checkins,
-                         nome_filtro=nome_filtro,
-                         data_inicio=data_inicio,
-                         data_fim=data_fim)
+    return pagina_condicional(versao_checkins(), gerar)
+
+@checkin_bp.route('/historico/pagina')
+def historico_pagina():
+    """Retorna uma página do histórico em JSON, com o cursor da próxima página"""
+    with banco_de_leitura(pesquisar_arquivo()):
+        query = filtrar_historico(request.args.get('nome', ''),
+                                  request.args.get('data_inicio', ''),
+                                  request.args.get('data_fim', ''))
+        checkins, proximo_cursor = paginar_historico(query, request.args.get('cursor', ''), limite_pagina())
+        return jsonify({
+            'checkins': [checkin.to_dict() for checkin in checkins],
+            'proximo_cursor': proximo_cursor
+        })
+
+@checkin_bp.route('/historico/exportar/<any(hospedes, checkins):conteudo>.<any(csv, xlsx):formato>')
+def exportar_historico(conteudo, formato):
+    """Exporta o histórico filtrado em CSV ou XLSX (ficha dos hóspedes ou uma linha por estadia), em streaming"""
+    # status: Finalizado (padrão, como o histórico), Ativo ou todos
+    status = request.args.get('status', 'Finalizado')
+    data_inicio = request.args.get('data_inicio', '')
+    data_fim = request.args.get('data_fim', '')
+    cabecalho, linhas = exportar_registros(conteudo, None if status == 'todos' else status,
+                                           request.args.get('nome', ''), data_inicio, data_fim)
+    arquivo = pesquisar_arquivo()
+
+    def linhas_do_banco():
+        with banco_de_leitura(arquivo):
+            yield from linhas
+
+    periodo = '_'.join(parte for parte in (data_inicio, data_fim) if parte)
+    nome_arquivo = f"{conteudo}{'_' + periodo if periodo else ''}.{formato}"
+    return Response(stream_with_context(gerar_planilha(formato, cabecalho, linhas_do_banco(), conteudo)),
+                    mimetype=MIMETYPES[formato],
+                    headers={'Content-Disposition': f'attachment; filename="{nome_arquivo}"'})
+
+@checkin_bp.route('/hospedes/autocompletar')
+def autocompletar_hospedes():
+    """Sugestões de hóspedes já cadastrados para a busca de hóspede recorrente.
+
+    Só nome, nascimento e perfil: documentos e contatos são pré-preenchidos por /hospedes/perfil
+    (CPF ou documento exatos) ou completados no servidor pelo perfil_id do envio.
+    """
+    termo = request.args.get('q', '')
+    limite = max(1, min(request.args.get('limite', 10, type=int), 50))
+    hospedes = buscar_hospedes(termo, limite)
+    return jsonify([{
+        'nome_completo': hospede.nome_completo,
+        'data_nascimento': hospede.data_nascimento.strftime('%Y-%m-%d') if hospede.data_nascimento else None,
+        'perfil_id': hospede.perfil_id
+    } for hospede in hospedes])
+
+@checkin_bp.route('/hospedes/perfil')
+def perfil_hospede():
+    """Dados de pré-preenchimento de um hóspede recorrente, buscados por CPF ou documento"""
+    perfil = buscar_perfil(cpf=request.args.get('cpf'), documento=request.args.get('documento'))
+    if not perfil:
+        return jsonify({'erro': 'Perfil não encontrado'}), 404
+    return jsonify(perfil)
+
+def pesquisar_arquivo():
+    """Indica se a consulta pediu os check-ins arquivados (?arquivo=1)"""
+    return request.args.get('arquivo') == '1' and arquivo_disponivel()
+
+def banco_de_leitura(arquivo):
+    """Contexto das consultas: banco de arquivo ou o principal"""
+    return lendo_arquivo() if arquivo else nullcontext()
+
+def limite_pagina():
+    """Tamanho da página do histórico, limitado pelo máximo configurado"""
+    padrao = current_app.config.get('HISTORICO_POR_PAGINA', 30)
+    maximo = current_app.config.get('HISTORICO_LIMITE_MAXIMO', 100)
+    limite = request.args.get('limite', padrao, type=int)
+    return max(1, min(limite, maximo))
 
 @checkin_bp.route('/checkin/<int:checkin_id>')
 def detalhes_checkin(checkin_id):
     """Página com detalhes de um check-in específico"""
-    checkin = Checkin.query.get_or_404(checkin_id)
+    checkin = db.session.get(Checkin, checkin_id)
+    if checkin is None and arquivo_disponivel():
+        # Estadias antigas são procuradas no arquivo
+        with lendo_arquivo():
+            checkin = Checkin.query.get_or_404(checkin_id)
+            return render_template('detalhes_checkin.html', checkin=checkin, arquivado=True)
+    if checkin is None:
+        abort(404)
     return render_template('detalhes_checkin.html', checkin=checkin)
 
 @checkin_bp.route('/criar-checkin', methods=['POST'])
 def criar_checkin():
     """Processa a criação de um novo check-in"""
     try:
-        # Dados do check-in
-        numero_apartamento = request.form.get('numero_apartamento')
-        data_checkout_prevista_str = request.form.get('data_checkout_prevista')
-        
-        if not numero_apartamento or not data_checkout_prevista_str:
-            flash('Número do apartamento e data de check-out prevista são obrigatórios', 'error')
-            return redirect(url_for('checkin.novo_checkin'))
-        
-        # Converter data de checkout prevista
-        try:
-            data_checkout_prevista = datetime.strptime(data_checkout_prevista_str, '%Y-%m-%d').date()
-        except ValueError:
-            flash('Data de check-out prevista inválida', 'error')
-            return redirect(url_for('checkin.novo_checkin'))
-        
-        # Criar o check-in
-        checkin = Checkin(
-            numero_apartamento=numero_apartamento,
-            data_checkout_prevista=data_checkout_prevista
-        )
-        db.session.add(checkin)
-        db.session.flush()  # Para obter o ID do check-in
-        
-        # Processar hóspede principal
-        hospede_principal = criar_hospede_from_form(request.form, checkin.id, is_principal=True)
-        if not hospede_principal:
-            db.session.rollback()
-            flash('Erro ao processar dados do hóspede principal', 'error')
-            return redirect(url_for('checkin.novo_checkin'))
-        
-        db.session.add(hospede_principal)
-        
-        # Processar acompanhantes (se houver)
-        acompanhantes_data = extrair_acompanhantes_from_form(request.form)
-        for acomp_data in acompanhantes_data:
-            acompanhante = criar_hospede_from_dict(acomp_data, checkin.id, is_principal=False)
-            if acompanhante:
-                db.session.add(acompanhante)
-        
-        db.session.commit()
+        # Um reenvio do mesmo formulário (ex.: clique duplo) não grava de novo e tem a mesma resposta
+        registrar_checkin_uma_vez(checkin_do_formulario(request.form),
+                                  ler_chave(request.form.get('chave_idempotencia')))
         flash('Check-in realizado com sucesso!', 'success')
         return redirect(url_for('checkin.checkins_ativos'))
         
+    except ChaveReutilizada:
+        # Formulário reaberto pelo "voltar" do navegador, alterado e enviado de novo
+        flash('Este formulário já foi enviado com outros dados; confira os check-ins ativos ou preencha um novo', 'error')
+        return redirect(url_for('checkin.novo_checkin'))
+    except ValueError as e:
+        db.session.rollback()
+        flash(str(e), 'error')
+        return redirect(url_for('checkin.novo_checkin'))
     except Exception as e:
         db.session.rollback()
         flash(f'Erro ao realizar check-in: {str(e)}', 'error')
@@ -124,142 +228,122 @@ def finalizar_checkin(checkin_id):
             flash('Este check-in já foi finalizado', 'warning')
             return redirect(url_for('checkin.checkins_ativos'))
         
-        checkin.finalizar_checkin()
-        db.session.commit()
+        registrar_checkout(checkin)
         
         flash('Check-out realizado com sucesso!', 'success')
         return redirect(url_for('checkin.checkins_ativos'))
         
+    except CheckinFinalizado as e:
+        # Finalizado por outro balcão ou pelo checkout em lote entre a leitura e o checkout
+        flash(str(e), 'warning')
+        return redirect(url_for('checkin.checkins_ativos'))
     except Exception as e:
         db.session.rollback()
         flash(f'Erro ao finalizar check-in: {str(e)}', 'error')
         return redirect(url_for('checkin.checkins_ativos'))
 
-def criar_hospede_from_form(form_data, checkin_id, is_principal=True):
-    """Cria um objeto Hospede a partir dos dados do formulário"""
-    try:
-        # Campos obrigatórios
-        nome_completo = form_data.get('nome_completo')
-        data_nascimento_str = form_data.get('data_nascimento')
-        documento = form_data.get('documento')
-        orgao_expedidor = form_data.get('orgao_expedidor')  # Opcional
-        uf_documento = form_data.get('uf_documento')  # Opcional
-        cpf = form_data.get('cpf')  # Opcional
-        ddd = form_data.get('ddd')  # Obrigatório
-        telefone = form_data.get('telefone')
-        email = form_data.get('email')  # Opcional
-        
-        if not all([nome_completo, data_nascimento_str, documento, ddd, telefone]):
-            return None
-        
-        # Converter data de nascimento
-        data_nascimento = datetime.strptime(data_nascimento_str, '%Y-%m-%d').date()
-        idade = Hospede.calcular_idade(data_nascimento)
-        
-        # Campos opcionais (não obrigatórios para nenhum tipo de hóspede)
-        endereco = form_data.get('endereco')
-        cep = form_data.get('cep')
-        cidade = form_data.get('cidade')
-        estado = form_data.get('estado')
-        pais = form_data.get('pais')
-        observacoes = form_data.get('observacoes')
-        
-        hospede = Hospede(
-            nome_completo=nome_completo,
-            data_nascimento=data_nascimento,
-            idade=idade,
-            documento=documento,
-            orgao_expedidor=orgao_expedidor,
-            uf_documento=uf_documento,
-            cpf=cpf,
-            endereco=endereco,
-            cep=cep,
-            cidade=cidade,
-            estado=estado,
-            pais=pais,
-            ddd=ddd,
-            telefone=telefone,
-            email=email,
-            observacoes=observacoes,
-            is_principal=is_principal,
-            checkin_id=checkin_id
-        )
-        
-        return hospede
-        
-    except Exception as e:
-        print(f"Erro ao criar hóspede: {e}")
-        return None
-
-def criar_hospede_from_dict(data, checkin_id, is_principal=False):
-    """Cria um objeto Hospede a partir de um dicionário de dados"""
+def registrar_checkin(dados, idempotencia=None):
+    """Valida os dados, cria o check-in com o hóspede principal e os acompanhantes e confirma a transação.
+    
+    Usada pelo formulário e pela API com os dados no formato do JSON da API. Os erros de
+    todos os campos são levantados juntos (DadosInvalidos). Com `idempotencia` (chave,
+    impressão), a resposta é gravada com a chave na mesma transação. Retorna o check-in
+    serializado (to_dict).
+    """
+    validos = validar_checkin(dados)
+    numero_apartamento = validos['numero_apartamento']
+    verificar_disponibilidade(numero_apartamento)
+    
+    # Criar o check-in
+    checkin = Checkin(
+        numero_apartamento=numero_apartamento,
+        data_checkout_prevista=validos['data_checkout_prevista']
+    )
+    db.session.add(checkin)
     try:
-        # Converter data de nascimento
-        data_nascimento = datetime.strptime(data['data_nascimento'], '%Y-%m-%d').date()
-        idade = Hospede.calcular_idade(data_nascimento)
-        
-        hospede = Hospede(
-            nome_completo=data['nome_completo'],
-            data_nascimento=data_nascimento,
-            idade=idade,
-            documento=data['documento'],
-            orgao_expedidor=data.get('orgao_expedidor'),
-            uf_documento=data.get('uf_documento'),
-            cpf=data.get('cpf'),
-            ddd=data['ddd'],
-            telefone=data['telefone'],
-            email=data.get('email'),
-            observacoes=data.get('observacoes'),
-            is_principal=is_principal,
-            checkin_id=checkin_id
-        )
-        
-        return hospede
-        
-    except Exception as e:
-        print(f"Erro ao criar acompanhante: {e}")
-        return None
-
-def extrair_acompanhantes_from_form(form_data):
-    """Extrai dados dos acompanhantes do formulário"""
-    acompanhantes = []
-    i = 0
+        db.session.flush()  # Para obter o ID do check-in
+    except IntegrityError as e:
+        # Outro balcão ocupou o apartamento entre a verificação e a gravação
+        db.session.rollback()
+        if violou_ocupacao(e):
+            raise ApartamentoOcupado(numero_apartamento)
+        raise
     
-    while True:
-        nome_key = f'acompanhante_{i}_nome_completo'
-        if nome_key not in form_data or not form_data.get(nome_key):
-            break
-        
-        acompanhante_data = {
-            'nome_completo': form_data.get(f'acompanhante_{i}_nome_completo'),
-            'data_nascimento': form_data.get(f'acompanhante_{i}_data_nascimento'),
-            'documento': form_data.get(f'acompanhante_{i}_documento'),
-            'orgao_expedidor': form_data.get(f'acompanhante_{i}_orgao_expedidor'),
-            'uf_documento': form_data.get(f'acompanhante_{i}_uf_documento'),
-            'cpf': form_data.get(f'acompanhante_{i}_cpf'),
-            'ddd': form_data.get(f'acompanhante_{i}_ddd'),
-            'telefone': form_data.get(f'acompanhante_{i}_telefone'),
-            'email': form_data.get(f'acompanhante_{i}_email'),
-            'observacoes': form_data.get(f'acompanhante_{i}_observacoes')
-        }
-        
-        # Verificar se todos os campos obrigatórios estão preenchidos
-        if all([acompanhante_data['nome_completo'], 
-                acompanhante_data['data_nascimento'],
-                acompanhante_data['documento']]):
-            acompanhantes.append(acompanhante_data)
-        
-        i += 1
+    # Hóspede principal e acompanhantes
+    hospedes = [Hospede(checkin_id=checkin.id, **valores) for valores in validos['hospedes']]
+    db.session.add_all(hospedes)
+    for hospede in hospedes:
+        vincular_perfil(hospede)
     
-    return acompanhantes
+    # Estatísticas do painel e evento para as integrações na mesma transação do check-in
+    registrar_chegada(checkin.data_checkin.date(), [(hospedes[0].pais, len(hospedes))])
+    Evento.registrar('checkin.criado', [checkin.resumo()])
+    db.session.flush()  # Perfil do último hóspede, para a resposta
+    resposta = checkin.to_dict(hospedes)
+    if idempotencia:
+        expira_em = guardar_resultado(*idempotencia, resposta)
+    db.session.commit()
+    if idempotencia:
+        lembrar_resultado(*idempotencia, resposta, expira_em)
+    # Lidos da resposta: após o commit, o objeto expirado seria recarregado do banco
+    mapa_ocupacao.ocupar(resposta['numero_apartamento'], resposta['id'])
+    previsao_ocupacao.invalidar()
+    return resposta
 
+def registrar_checkin_uma_vez(dados, chave=None):
+    """registrar_checkin com chave de idempotência; retorna (check-in serializado, repetido).
+    
+    Um envio repetido com a mesma chave e os mesmos dados (clique duplo, nova tentativa
+    após falha de rede) recebe a resposta do primeiro sem gravar nada. Levanta
+    ChaveReutilizada se a chave já foi usada com outros dados.
+    """
+    if not chave:
+        return registrar_checkin(dados), False
+    impressao = calcular_impressao(dados)
+    resposta = resultado_salvo(chave, impressao)
+    if resposta is not None:
+        return resposta, True
+    try:
+        return registrar_checkin(dados, (chave, impressao)), False
+    except (ApartamentoOcupado, ChaveReutilizada):
+        # Envio simultâneo com a mesma chave: o outro gravou primeiro
+        resposta = resultado_salvo(chave, impressao)
+        if resposta is None:
+            raise
+        return resposta, True
 
+def registrar_checkout(checkin):
+    """Finaliza um check-in ativo e confirma a transação.
+    
+    Levanta CheckinFinalizado se outro processo o finalizou depois da leitura.
+    """
+    if not checkin.finalizar_checkin():
+        db.session.rollback()
+        raise CheckinFinalizado(checkin.id)
+    db.session.commit()
+    mapa_ocupacao.liberar(checkin.numero_apartamento, checkin.id)
+    previsao_ocupacao.invalidar()
+    invalidar_cards(checkin.id)
+    return checkin
 
-from src.utils.country_codes import COUNTRY_CODES
+def checkin_do_formulario(form_data):
+    """Converte o formulário de check-in no formato do JSON da API"""
+    return {
+        'numero_apartamento': form_data.get('numero_apartamento'),
+        'data_checkout_prevista': form_data.get('data_checkout_prevista'),
+        'hospede_principal': {campo: form_data.get(campo) for campo in CAMPOS_FORMULARIO},
+        'acompanhantes': extrair_acompanhantes_from_form(form_data)
+    }
 
-def get_country_code_from_country(pais):
-    """Retorna o código do país com base no nome do país."""
-    if not pais:
-        return ""
-    return COUNTRY_CODES.get(pais.lower(), "")  # Retorna string vazia se não encontrar
+def extrair_acompanhantes_from_form(form_data):
+    """Extrai dados dos acompanhantes do formulário (campos acompanhante_<i>_<campo>) em uma passagem"""
+    por_indice = {}
+    for chave, valor in form_data.items():
+        campo = CAMPO_ACOMPANHANTE.match(chave)
+        if campo and campo[2] in CAMPOS_FORMULARIO:
+            por_indice.setdefault(int(campo[1]), {})[campo[2]] = valor
+    
+    # Acompanhantes removidos deixam buracos na numeração; cartões deixados em branco são ignorados,
+    # e os preenchidos pela metade vão para a validação (em vez de serem descartados)
+    return [dados for _, dados in sorted(por_indice.items()) if any(valor.strip() for valor in dados.values())]
 
@@ -0,0 +1,34 @@
+from flask import Blueprint, render_template, request, jsonify
+from src.models.grupo import resumo_do_grupo
+
+grupo_bp = Blueprint('grupo', __name__)
+
+# Períodos aceitos no resumo do grupo (dias)
+PERIODOS = (7, 30, 90, 365)
+
+
+def periodo():
+    """Período do resumo (?dias=N), limitado aos PERIODOS"""
+    dias = request.args.get('dias', 30, type=int)
+    return dias if dias in PERIODOS else 30
+
+
+def _serializar(resumo):
+    return {**resumo, 'hoje': {**resumo['hoje'], 'dia': resumo['hoje']['dia'].isoformat()},
+            'serie': [{**item, 'dia': item['dia'].isoformat()} for item in resumo['serie']]}
+
+
+@grupo_bp.route('/grupo')
+def painel_grupo():
+    """Indicadores de todas as propriedades lado a lado, com os totais do grupo"""
+    dias = periodo()
+    return render_template('grupo.html', resumo=resumo_do_grupo(dias), dias=dias, periodos=PERIODOS)
+
+
+@grupo_bp.route('/api/v1/grupo/resumo')
+def resumo_grupo_api():
+    """Indicadores do grupo e de cada propriedade em JSON (?dias=7|30|90|365)"""
+    resumo = resumo_do_grupo(periodo())
+    return jsonify({'grupo': _serializar(resumo['grupo']),
+                    'propriedades': {propriedade_id: _serializar(item)
+                                     for propriedade_id, item in resumo['propriedades'].items()}})
@@ -0,0 +1,34 @@
+from flask import Blueprint, render_template, request, redirect, url_for, flash, jsonify
+from src.models import db, Tarefa
+from src.models.tarefas import enfileirar_checkout_em_lote
+
+tarefas_bp = Blueprint('tarefas', __name__)
+
+@tarefas_bp.route('/checkout-em-lote', methods=['POST'])
+def checkout_em_lote():
+    """Enfileira o checkout de todos os check-ins com saída prevista até a data (padrão: hoje)"""
+    try:
+        tarefa_id = enfileirar_checkout_em_lote(request.form.get('data'))
+    except ValueError as e:
+        flash(str(e), 'error')
+        return redirect(url_for('checkin.checkins_ativos'))
+    except Exception as e:
+        db.session.rollback()
+        flash(f'Erro ao agendar o checkout em lote: {str(e)}', 'error')
+        return redirect(url_for('checkin.checkins_ativos'))
+
+    return redirect(url_for('tarefas.acompanhar_tarefa', tarefa_id=tarefa_id))
+
+@tarefas_bp.route('/tarefas/<int:tarefa_id>')
+def acompanhar_tarefa(tarefa_id):
+    """Página de acompanhamento do progresso de uma tarefa"""
+    tarefa = Tarefa.query.get_or_404(tarefa_id)
+    return render_template('tarefa.html', tarefa=tarefa)
+
+@tarefas_bp.route('/tarefas/<int:tarefa_id>/progresso')
+def progresso_tarefa(tarefa_id):
+    """Progresso da tarefa em JSON (consultado periodicamente pela página de acompanhamento)"""
+    tarefa = db.session.get(Tarefa, tarefa_id)
+    if not tarefa:
+        return jsonify({'erro': 'Tarefa não encontrada'}), 404
+    return jsonify(tarefa.to_dict())
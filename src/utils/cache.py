@@ -0,0 +1,54 @@
+import time
+from collections import OrderedDict
+from threading import Lock
+
+_AUSENTE = object()
+
+
+class LRUCache:
+    """Cache em memória com descarte do item menos usado recentemente (thread-safe).
+
+    Com `validade` (segundos), cada item expira esse tempo depois de gravado: limita por
+    quanto tempo um valor alterado por outro processo continua sendo servido.
+    """
+
+    def __init__(self, tamanho_maximo=1024, validade=None):
+        self.tamanho_maximo = tamanho_maximo
+        self.validade = validade
+        self._itens = OrderedDict()
+        self._lock = Lock()
+
+    def get(self, chave, padrao=None):
+        """Retorna o valor em cache (marcando-o como recente) ou `padrao`"""
+        with self._lock:
+            item = self._itens.get(chave, _AUSENTE)
+            if item is _AUSENTE:
+                return padrao
+            valor, expira_em = item
+            if expira_em is not None and time.monotonic() >= expira_em:
+                del self._itens[chave]
+                return padrao
+            self._itens.move_to_end(chave)
+            return valor
+
+    def set(self, chave, valor):
+        """Guarda um valor, descartando o menos recente se o cache estiver cheio"""
+        expira_em = time.monotonic() + self.validade if self.validade is not None else None
+        with self._lock:
+            self._itens[chave] = (valor, expira_em)
+            self._itens.move_to_end(chave)
+            while len(self._itens) > self.tamanho_maximo:
+                self._itens.popitem(last=False)
+
+    def invalidar(self, chave):
+        """Remove uma chave do cache"""
+        with self._lock:
+            self._itens.pop(chave, None)
+
+    def limpar(self):
+        """Remove todos os itens"""
+        with self._lock:
+            self._itens.clear()
+
+    def __len__(self):
+        return len(self._itens)
@@ -0,0 +1,77 @@
+import hashlib
+import os
+from datetime import date, timezone
+from flask import Response, current_app, make_response, render_template, request, session
+from markupsafe import Markup
+from src.models.propriedades import propriedade_atual
+from src.utils.cache import LRUCache
+
+# Cards de check-in renderizados mantidos por processo
+TAMANHO_CACHE_CARDS = 4096
+MODELOS_CARDS = ('card_checkin_ativo', 'card_checkin_historico')
+
+
+def _cache_cards():
+    """Cache de cards da aplicação atual (cada app/banco tem o seu)"""
+    return current_app.extensions.setdefault('cache_cards', LRUCache(TAMANHO_CACHE_CARDS))
+
+
+def card_checkin(checkin, modelo):
+    """HTML do card do check-in, renderizado uma vez por versão (atualizado_em) do registro"""
+    # O prefixo da aplicação entra na versão porque os links do card dependem dele
+    versao = (checkin.atualizado_em, request.script_root)
+    chave = (propriedade_atual(), checkin.id, modelo)
+    em_cache = _cache_cards().get(chave)
+    if em_cache and em_cache[0] == versao:
+        return em_cache[1]
+
+    html = Markup(render_template(f'fragmentos/{modelo}.html', checkin=checkin))
+    _cache_cards().set(chave, (versao, html))
+    return html
+
+
+def invalidar_cards(checkin_id):
+    """Descarta os cards em cache de um check-in"""
+    for modelo in MODELOS_CARDS:
+        _cache_cards().invalidar((propriedade_atual(), checkin_id, modelo))
+
+
+def _versao_templates():
+    """Assinatura dos templates (data de modificação), para que um deploy mude o ETag das páginas"""
+    if 'versao_templates' not in current_app.extensions:
+        assinatura = hashlib.sha1()
+        for raiz, _, arquivos in sorted(os.walk(current_app.template_folder)):
+            for arquivo in sorted(arquivos):
+                caminho = os.path.join(raiz, arquivo)
+                assinatura.update(f'{caminho}:{os.path.getmtime(caminho)}'.encode())
+        current_app.extensions['versao_templates'] = assinatura.hexdigest()
+    return current_app.extensions['versao_templates']
+
+
+def pagina_condicional(versao, gerar, *chaves):
+    """Responde 304 se o navegador já tem a página nesta versão; senão gera a página com os validadores.
+    
+    `versao` é (última alteração, quantidade) dos registros exibidos e `gerar` renderiza a página;
+    `chaves` são outros valores exibidos que também mudam o ETag. Páginas com mensagens flash
+    pendentes são sempre geradas (a mensagem só aparece uma vez).
+    """
+    if session.get('_flashes'):
+        return gerar()
+
+    ultima_alteracao, quantidade = versao
+    # A data entra no ETag porque as páginas mostram valores relativos a hoje (idade atual)
+    etag = hashlib.sha1(repr((ultima_alteracao, quantidade, request.full_path, date.today(),
+                              _versao_templates(), chaves)).encode()).hexdigest()
+
+    def validadores(resposta):
+        resposta.set_etag(etag)
+        if ultima_alteracao:
+            resposta.last_modified = ultima_alteracao.replace(tzinfo=timezone.utc)
+        resposta.cache_control.no_cache = True  # o navegador sempre revalida
+        return resposta
+
+    condicional = validadores(Response())
+    condicional.make_conditional(request)
+    if condicional.status_code == 304:
+        return condicional
+    return validadores(make_response(gerar()))
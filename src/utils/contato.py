@@ -0,0 +1,34 @@
+import re
+from src.utils.country_codes import get_country_code_from_country
+
+# DDI usado quando o país não é informado (acompanhantes, cadastros antigos)
+DDI_PADRAO = '55'
+
+_NAO_DIGITOS = re.compile(r'\D')
+
+
+def telefone_e164(pais, ddd, telefone, ddi_padrao=DDI_PADRAO):
+    """Retorna o telefone no formato E.164 (+5511999999999) ou None se não for possível montá-lo.
+    
+    Números informados com "+" ou "00" já são internacionais; os demais recebem o DDI do
+    país (ou o padrão, se o país estiver vazio) e o DDD. País desconhecido resulta em None.
+    """
+    bruto = (telefone or '').strip()
+    digitos = _NAO_DIGITOS.sub('', bruto)
+    if not digitos:
+        return None
+
+    if bruto.startswith('+'):
+        numero = digitos
+    elif digitos.startswith('00'):
+        numero = digitos[2:]
+    else:
+        ddi = get_country_code_from_country(pais) if (pais or '').strip() else ddi_padrao
+        if not ddi:
+            return None
+        # DDD com o zero do prefixo de operadora (011) vira 11
+        numero = ddi + _NAO_DIGITOS.sub('', ddd or '').lstrip('0') + digitos
+
+    if not 8 <= len(numero) <= 15:
+        return None
+    return f'+{numero}'
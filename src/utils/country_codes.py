@@ -1,3 +1,7 @@
+import unicodedata
+
+# Códigos de discagem internacional (DDI) por país. Os nomes são comparados sem acentos,
+# sem diferença de maiúsculas e com espaços normalizados (ver normalizar_nome_pais).
 COUNTRY_CODES = {
     "brasil": "55",
     "estados unidos": "1",
@@ -17,12 +21,218 @@ COUNTRY_CODES = {
     "india": "91",
     "australia": "61",
     "nova zelandia": "64",
-    # Adicione mais países e seus códigos de país conforme necessário
+
+    # América do Sul
+    "uruguai": "598",
+    "paraguai": "595",
+    "bolivia": "591",
+    "peru": "51",
+    "equador": "593",
+    "venezuela": "58",
+    "guiana": "592",
+    "suriname": "597",
+    "guiana francesa": "594",
+
+    # América Central e Caribe
+    "guatemala": "502",
+    "belize": "501",
+    "el salvador": "503",
+    "honduras": "504",
+    "nicaragua": "505",
+    "costa rica": "506",
+    "panama": "507",
+    "cuba": "53",
+    "haiti": "509",
+    "republica dominicana": "1",
+    "porto rico": "1",
+    "jamaica": "1",
+    "bahamas": "1",
+    "barbados": "1",
+    "trinidad e tobago": "1",
+
+    # Europa
+    "reino unido": "44",
+    "escocia": "44",
+    "pais de gales": "44",
+    "irlanda do norte": "44",
+    "irlanda": "353",
+    "holanda": "31",
+    "paises baixos": "31",
+    "belgica": "32",
+    "luxemburgo": "352",
+    "suica": "41",
+    "austria": "43",
+    "liechtenstein": "423",
+    "monaco": "377",
+    "andorra": "376",
+    "san marino": "378",
+    "vaticano": "39",
+    "malta": "356",
+    "grecia": "30",
+    "chipre": "357",
+    "dinamarca": "45",
+    "noruega": "47",
+    "suecia": "46",
+    "finlandia": "358",
+    "islandia": "354",
+    "estonia": "372",
+    "letonia": "371",
+    "lituania": "370",
+    "polonia": "48",
+    "republica tcheca": "420",
+    "tchequia": "420",
+    "eslovaquia": "421",
+    "hungria": "36",
+    "romenia": "40",
+    "bulgaria": "359",
+    "servia": "381",
+    "croacia": "385",
+    "eslovenia": "386",
+    "bosnia e herzegovina": "387",
+    "montenegro": "382",
+    "macedonia do norte": "389",
+    "albania": "355",
+    "kosovo": "383",
+    "moldavia": "373",
+    "ucrania": "380",
+    "bielorrussia": "375",
+    "russia": "7",
+    "turquia": "90",
+    "georgia": "995",
+    "armenia": "374",
+    "azerbaijao": "994",
+
+    # Oriente Médio e Ásia
+    "israel": "972",
+    "palestina": "970",
+    "libano": "961",
+    "siria": "963",
+    "jordania": "962",
+    "iraque": "964",
+    "ira": "98",
+    "arabia saudita": "966",
+    "emirados arabes unidos": "971",
+    "catar": "974",
+    "kuwait": "965",
+    "bahrein": "973",
+    "oma": "968",
+    "iemen": "967",
+    "afeganistao": "93",
+    "paquistao": "92",
+    "bangladesh": "880",
+    "sri lanka": "94",
+    "nepal": "977",
+    "butao": "975",
+    "maldivas": "960",
+    "cazaquistao": "7",
+    "uzbequistao": "998",
+    "turcomenistao": "993",
+    "quirguistao": "996",
+    "tajiquistao": "992",
+    "mongolia": "976",
+    "coreia do sul": "82",
+    "coreia do norte": "850",
+    "taiwan": "886",
+    "hong kong": "852",
+    "macau": "853",
+    "vietna": "84",
+    "vietnam": "84",
+    "tailandia": "66",
+    "camboja": "855",
+    "laos": "856",
+    "mianmar": "95",
+    "malasia": "60",
+    "singapura": "65",
+    "indonesia": "62",
+    "filipinas": "63",
+    "brunei": "673",
+    "timor-leste": "670",
+
+    # África
+    "africa do sul": "27",
+    "angola": "244",
+    "mocambique": "258",
+    "cabo verde": "238",
+    "guine-bissau": "245",
+    "sao tome e principe": "239",
+    "guine equatorial": "240",
+    "egito": "20",
+    "marrocos": "212",
+    "argelia": "213",
+    "tunisia": "216",
+    "libia": "218",
+    "nigeria": "234",
+    "gana": "233",
+    "senegal": "221",
+    "costa do marfim": "225",
+    "camaroes": "237",
+    "quenia": "254",
+    "etiopia": "251",
+    "tanzania": "255",
+    "uganda": "256",
+    "ruanda": "250",
+    "congo": "242",
+    "republica democratica do congo": "243",
+    "gabao": "241",
+    "namibia": "264",
+    "botsuana": "267",
+    "zimbabue": "263",
+    "zambia": "260",
+    "malawi": "265",
+    "madagascar": "261",
+    "mauricio": "230",
+    "sudao": "249",
+    "somalia": "252",
+    "mali": "223",
+    "niger": "227",
+    "burkina faso": "226",
+    "benin": "229",
+    "togo": "228",
+    "guine": "224",
+    "serra leoa": "232",
+    "liberia": "231",
+    "mauritania": "222",
+    "chade": "235",
+
+    # Oceania
+    "fiji": "679",
+    "papua-nova guine": "675",
+    "samoa": "685",
+    "tonga": "676",
+
+    # Nomes alternativos e em inglês
+    "brazil": "55",
+    "eua": "1",
+    "usa": "1",
+    "united states": "1",
+    "estados unidos da america": "1",
+    "france": "33",
+    "germany": "49",
+    "spain": "34",
+    "italy": "39",
+    "england": "44",
+    "united kingdom": "44",
+    "uk": "44",
+    "gra-bretanha": "44",
+    "japan": "81",
+    "netherlands": "31",
+    "switzerland": "41",
+    "uruguay": "598",
+    "paraguay": "595",
 }
 
 
+def normalizar_nome_pais(nome):
+    """Retorna o nome do país sem acentos, em minúsculas e com espaços normalizados"""
+    sem_acentos = unicodedata.normalize('NFKD', nome or '')
+    sem_acentos = ''.join(c for c in sem_acentos if not unicodedata.combining(c))
+    return ' '.join(sem_acentos.lower().split())
 
 
-def get_country_code_from_country(country_name):
-    return COUNTRY_CODES.get(country_name.lower(), "")
+# Tabela de consulta montada uma vez, já com as chaves normalizadas
+_CODIGOS_NORMALIZADOS = {normalizar_nome_pais(nome): codigo for nome, codigo in COUNTRY_CODES.items()}
 
+
+def get_country_code_from_country(country_name):
+    """Retorna o DDI do país ("França", "japão", "Brasil"...) ou string vazia se não encontrar"""
+    return _CODIGOS_NORMALIZADOS.get(normalizar_nome_pais(country_name), "")
@@ -0,0 +1,267 @@
+import cProfile
+import logging
+import os
+import re
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from flask import Response, before_render_template, g, has_app_context, request, template_rendered
+from flask.json.provider import DefaultJSONProvider
+from sqlalchemy import event
+
+logger = logging.getLogger('src.sql_lento')
+
+# Limites (em segundos) dos buckets dos histogramas de latência
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+ETAPAS = ('db', 'render', 'serializacao')
+
+
+class Histograma:
+    """Histograma cumulativo no formato do Prometheus (buckets fixos, soma e contagem)"""
+
+    def __init__(self):
+        self.contagens = [0] * (len(BUCKETS) + 1)
+        self.soma = 0.0
+        self.total = 0
+
+    def observar(self, valor):
+        self.contagens[bisect_left(BUCKETS, valor)] += 1
+        self.soma += valor
+        self.total += 1
+
+
+class Metricas:
+    """Métricas de requisições e de SQL agregadas em memória (por processo), thread-safe"""
+
+    def __init__(self):
+        self._trava = threading.Lock()
+        self.limpar()
+
+    def limpar(self):
+        with self._trava:
+            self.requisicoes = {}   # (rota, método, status) -> quantidade
+            self.duracao = {}       # rota -> Histograma
+            self.etapas = {}        # (rota, etapa) -> segundos
+            self.consultas = {}     # rota -> quantidade de comandos SQL
+            self.sql = Histograma()
+            self.consultas_lentas = 0
+
+    def registrar_requisicao(self, rota, metodo, status, duracao, estado):
+        with self._trava:
+            chave = (rota, metodo, status)
+            self.requisicoes[chave] = self.requisicoes.get(chave, 0) + 1
+            self.duracao.setdefault(rota, Histograma()).observar(duracao)
+            for etapa in ETAPAS:
+                self.etapas[(rota, etapa)] = self.etapas.get((rota, etapa), 0.0) + estado[etapa]
+            self.consultas[rota] = self.consultas.get(rota, 0) + estado['consultas']
+
+    def registrar_sql(self, duracao, lenta):
+        with self._trava:
+            self.sql.observar(duracao)
+            if lenta:
+                self.consultas_lentas += 1
+
+    def exportar(self):
+        """Métricas no formato texto do Prometheus (exposition format 0.0.4)"""
+        linhas = []
+
+        def histograma(nome, valores, rotulos=''):
+            acumulado = 0
+            separador = ',' if rotulos else ''
+            for limite, quantidade in zip(BUCKETS + ('+Inf',), valores.contagens):
+                acumulado += quantidade
+                linhas.append(f'{nome}_bucket{{{rotulos}{separador}le="{limite}"}} {acumulado}')
+            sufixo = f'{{{rotulos}}}' if rotulos else ''
+            linhas.append(f'{nome}_sum{sufixo} {valores.soma:.6f}')
+            linhas.append(f'{nome}_count{sufixo} {valores.total}')
+
+        with self._trava:
+            linhas += ['# HELP http_requisicoes_total Requisições atendidas',
+                       '# TYPE http_requisicoes_total counter']
+            for (rota, metodo, status), quantidade in sorted(self.requisicoes.items()):
+                linhas.append(f'http_requisicoes_total{{rota="{rota}",metodo="{metodo}",status="{status}"}} {quantidade}')
+
+            linhas += ['# HELP http_requisicao_segundos Duração das requisições',
+                       '# TYPE http_requisicao_segundos histogram']
+            for rota, valores in sorted(self.duracao.items()):
+                histograma('http_requisicao_segundos', valores, f'rota="{rota}"')
+
+            linhas += ['# HELP http_etapa_segundos_total Tempo das requisições por etapa (db, render, serializacao)',
+                       '# TYPE http_etapa_segundos_total counter']
+            for (rota, etapa), segundos in sorted(self.etapas.items()):
+                linhas.append(f'http_etapa_segundos_total{{rota="{rota}",etapa="{etapa}"}} {segundos:.6f}')
+
+            linhas += ['# HELP http_consultas_sql_total Comandos SQL executados pelas requisições',
+                       '# TYPE http_consultas_sql_total counter']
+            for rota, quantidade in sorted(self.consultas.items()):
+                linhas.append(f'http_consultas_sql_total{{rota="{rota}"}} {quantidade}')
+
+            linhas += ['# HELP sql_consulta_segundos Duração dos comandos SQL',
+                       '# TYPE sql_consulta_segundos histogram']
+            histograma('sql_consulta_segundos', self.sql)
+
+            linhas += ['# HELP sql_consultas_lentas_total Comandos SQL acima do limite de consulta lenta',
+                       '# TYPE sql_consultas_lentas_total counter',
+                       f'sql_consultas_lentas_total {self.consultas_lentas}']
+        return '\n'.join(linhas) + '\n'
+
+
+metricas = Metricas()
+
+
+def _estado():
+    """Acumuladores da requisição atual (None fora de uma requisição instrumentada)"""
+    return g.get('_instrumentacao') if has_app_context() else None
+
+
+@contextmanager
+def medir_etapa(etapa):
+    """Soma o tempo do bloco à etapa da requisição atual (ex.: 'serializacao')"""
+    estado = _estado()
+    if estado is None:
+        yield
+        return
+    inicio = time.perf_counter()
+    try:
+        yield
+    finally:
+        estado[etapa] += time.perf_counter() - inicio
+
+
+class JSONProviderInstrumentado(DefaultJSONProvider):
+    """Provedor JSON do Flask que contabiliza o tempo de serialização do jsonify"""
+
+    def response(self, *args, **kwargs):
+        with medir_etapa('serializacao'):
+            return super().response(*args, **kwargs)
+
+
+def _instrumentar_sql(app, engine):
+    limite = app.config.get('INSTRUMENTACAO_CONSULTA_LENTA_MS', 200) / 1000
+
+    @event.listens_for(engine, 'before_cursor_execute')
+    def _antes(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault('_inicio_consulta', []).append(time.perf_counter())
+
+    @event.listens_for(engine, 'handle_error')
+    def _erro(contexto):
+        if contexto.connection is not None and contexto.connection.info.get('_inicio_consulta'):
+            contexto.connection.info['_inicio_consulta'].pop()
+
+    @event.listens_for(engine, 'after_cursor_execute')
+    def _depois(conn, cursor, statement, parameters, context, executemany):
+        duracao = time.perf_counter() - conn.info['_inicio_consulta'].pop()
+        lenta = duracao >= limite
+        metricas.registrar_sql(duracao, lenta)
+        estado = _estado()
+        if estado is not None:
+            estado['db'] += duracao
+            estado['consultas'] += 1
+        if lenta:
+            rota = request.endpoint if estado is not None else '-'
+            logger.warning('Consulta lenta (%.0f ms, rota %s): %s', duracao * 1000, rota,
+                           re.sub(r'\s+', ' ', statement))
+
+
+def _instrumentar_templates(app):
+    def _inicio_render(sender, template, context, **extra):
+        estado = _estado()
+        if estado is not None:
+            # Consultas disparadas pelo template (lazy loading) já contam como tempo de banco
+            estado['_render'].append((time.perf_counter(), estado['db']))
+
+    def _fim_render(sender, template, context, **extra):
+        estado = _estado()
+        if estado is not None and estado['_render']:
+            inicio, db_inicial = estado['_render'].pop()
+            estado['render'] += (time.perf_counter() - inicio) - (estado['db'] - db_inicial)
+
+    before_render_template.connect(_inicio_render, app, weak=False)
+    template_rendered.connect(_fim_render, app, weak=False)
+
+
+def _instrumentar_requisicoes(app):
+    @app.before_request
+    def _iniciar():
+        g._instrumentacao = {'inicio': time.perf_counter(), 'db': 0.0, 'render': 0.0,
+                             'serializacao': 0.0, 'consultas': 0, '_render': []}
+
+    @app.after_request
+    def _finalizar(response):
+        estado = g.get('_instrumentacao')
+        if estado is None:
+            return response
+        rota = request.endpoint or 'desconhecida'
+        metodo = request.method
+
+        def _registrar():
+            metricas.registrar_requisicao(rota, metodo, response.status_code,
+                                          time.perf_counter() - estado['inicio'], estado)
+
+        if response.is_streamed:
+            # Respostas em streaming só terminam quando o servidor fecha o iterador
+            response.call_on_close(_registrar)
+            return response
+
+        total = time.perf_counter() - estado['inicio']
+        response.headers['Server-Timing'] = ', '.join(
+            [f'{etapa};dur={estado[etapa] * 1000:.1f}' for etapa in ETAPAS] + [f'total;dur={total * 1000:.1f}'])
+        _registrar()
+        return response
+
+
+class PerfilPorRequisicao:
+    """Middleware WSGI que grava um dump do cProfile das requisições que pedirem
+    (parâmetro ?perfil=1 ou cabeçalho X-Perfil: 1), em `diretorio`/<rota>.<timestamp>.prof.
+
+    Respostas em streaming (sem Content-Length: SSE, exportações) seguem sem perfil, pois
+    duram o tempo da conexão.
+    """
+
+    def __init__(self, wsgi_app, diretorio):
+        self.wsgi_app = wsgi_app
+        self.diretorio = diretorio
+        os.makedirs(diretorio, exist_ok=True)
+
+    def __call__(self, environ, start_response):
+        pedido = environ.get('HTTP_X_PERFIL') == '1' or 'perfil=1' in environ.get('QUERY_STRING', '').split('&')
+        if not pedido:
+            return self.wsgi_app(environ, start_response)
+
+        resposta = {}
+
+        def iniciar_resposta(status, cabecalhos, exc_info=None):
+            resposta['status'] = int(status.split(' ', 1)[0])
+            resposta['streaming'] = not any(nome.lower() == 'content-length' for nome, _ in cabecalhos)
+            return start_response(status, cabecalhos, exc_info)
+
+        perfil = cProfile.Profile()
+        iteravel = perfil.runcall(self.wsgi_app, environ, iniciar_resposta)
+        if resposta.get('streaming') and resposta.get('status') not in (204, 304):
+            return iteravel
+        try:
+            corpo = perfil.runcall(list, iteravel)
+        finally:
+            # Executa os call_on_close (métricas) e a finalização do contexto da requisição
+            if hasattr(iteravel, 'close'):
+                iteravel.close()
+        nome = re.sub(r'[^\w.-]+', '_', environ.get('PATH_INFO', '/').strip('/')) or 'index'
+        perfil.dump_stats(os.path.join(self.diretorio, f'{nome}.{time.time():.0f}.prof'))
+        return corpo
+
+
+def instrumentar(app, *engines):
+    """Liga a instrumentação da aplicação: tempos por requisição e etapa, SQL (de cada banco), /metrics e perfil opcional"""
+    app.json = JSONProviderInstrumentado(app)
+    for engine in engines:
+        _instrumentar_sql(app, engine)
+    _instrumentar_templates(app)
+    _instrumentar_requisicoes(app)
+
+    @app.route('/metrics')
+    def exportar_metricas():
+        return Response(metricas.exportar(), mimetype='text/plain; version=0.0.4')
+
+    if app.config.get('INSTRUMENTACAO_PERFIL_DIR'):
+        app.wsgi_app = PerfilPorRequisicao(app.wsgi_app, app.config['INSTRUMENTACAO_PERFIL_DIR'])
@@ -0,0 +1,158 @@
+import csv
+import io
+import zipfile
+from itertools import islice
+from datetime import date, datetime
+
+# Tipo de conteúdo das respostas de cada formato
+MIMETYPES = {
+    'csv': 'text/csv; charset=utf-8',
+    'xlsx': 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+}
+
+# Linhas acumuladas antes de entregar um pedaço da resposta
+LINHAS_POR_PEDACO = 500
+
+# Escape de texto para XML em uma passada: entidades e remoção dos caracteres de controle não aceitos em XML 1.0
+_ESCAPE_XML = str.maketrans({'&': '&amp;', '<': '&lt;', '>': '&gt;', '"': '&quot;',
+                             **{chr(c): None for c in range(32) if chr(c) not in '\t\n\r'}})
+
+
+def _texto(valor):
+    """Valor da célula como texto (datas em ISO, None como vazio)"""
+    if valor is None:
+        return ''
+    if isinstance(valor, datetime):
+        return valor.strftime('%Y-%m-%d %H:%M:%S')
+    if isinstance(valor, date):
+        return valor.strftime('%Y-%m-%d')
+    return str(valor)
+
+
+def gerar_csv(cabecalho, linhas):
+    """Gera o CSV (UTF-8 com BOM, para o Excel reconhecer acentos) em pedaços de texto.
+
+    As linhas devem ter só textos, números ou None (datas já formatadas pela consulta).
+    """
+    buffer = io.StringIO()
+    escritor = csv.writer(buffer)
+    buffer.write('\ufeff')
+    escritor.writerow(cabecalho)
+    linhas = iter(linhas)
+    while True:
+        escritor.writerows(islice(linhas, LINHAS_POR_PEDACO))
+        pedaco = buffer.getvalue()
+        if not pedaco:
+            break
+        yield pedaco
+        buffer.seek(0)
+        buffer.truncate()
+
+
+class _SaidaEmPedacos:
+    """Arquivo só de escrita que acumula os bytes gravados até serem recolhidos"""
+
+    def __init__(self):
+        self.pedacos = []
+
+    def write(self, dados):
+        self.pedacos.append(bytes(dados))
+        return len(dados)
+
+    def flush(self):
+        pass
+
+    def recolher(self):
+        dados = b''.join(self.pedacos)
+        self.pedacos.clear()
+        return dados
+
+
+_ARQUIVOS_FIXOS_XLSX = {
+    '[Content_Types].xml': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+        '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+        '<Default Extension="xml" ContentType="application/xml"/>'
+        '<Override PartName="/xl/workbook.xml" '
+        'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+        '<Override PartName="/xl/worksheets/sheet1.xml" '
+        'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+        '</Types>'
+    ),
+    '_rels/.rels': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        '<Relationship Id="rId1" Target="xl/workbook.xml" '
+        'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument"/>'
+        '</Relationships>'
+    ),
+    'xl/_rels/workbook.xml.rels': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        '<Relationship Id="rId1" Target="worksheets/sheet1.xml" '
+        'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet"/>'
+        '</Relationships>'
+    ),
+}
+
+
+def _workbook_xml(nome_planilha):
+    return ('<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+            '<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" '
+            'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">'
+            f'<sheets><sheet name="{nome_planilha[:31].translate(_ESCAPE_XML)}" sheetId="1" r:id="rId1"/></sheets>'
+            '</workbook>')
+
+
+def _celula_xml(valor):
+    if valor is None or valor == '':
+        return '<c/>'
+    if isinstance(valor, (int, float)) and not isinstance(valor, bool):
+        return f'<c><v>{valor}</v></c>'
+    texto = _texto(valor).translate(_ESCAPE_XML)
+    return f'<c t="inlineStr"><is><t xml:space="preserve">{texto}</t></is></c>'
+
+
+def _linha_xml(valores):
+    return f'<row>{"".join(map(_celula_xml, valores))}</row>'
+
+
+def gerar_xlsx(cabecalho, linhas, nome_planilha='Planilha'):
+    """Gera uma planilha XLSX (uma aba, textos inline) em pedaços de bytes.
+
+    O ZIP é escrito à medida que as linhas chegam (sem seek, com descritores de dados),
+    então a memória usada não depende da quantidade de linhas.
+    """
+    saida = _SaidaEmPedacos()
+    with zipfile.ZipFile(saida, 'w', compression=zipfile.ZIP_DEFLATED) as arquivo:
+        for nome, conteudo in _ARQUIVOS_FIXOS_XLSX.items():
+            arquivo.writestr(nome, conteudo)
+        arquivo.writestr('xl/workbook.xml', _workbook_xml(nome_planilha))
+
+        with arquivo.open('xl/worksheets/sheet1.xml', 'w', force_zip64=True) as planilha:
+            planilha.write(b'<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+                           b'<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main">'
+                           b'<sheetData>')
+            planilha.write(_linha_xml(cabecalho).encode())
+            partes = []
+            for quantidade, linha in enumerate(linhas, start=1):
+                partes.append(_linha_xml(linha))
+                if quantidade % LINHAS_POR_PEDACO == 0:
+                    planilha.write(''.join(partes).encode())
+                    partes.clear()
+                    dados = saida.recolher()
+                    if dados:
+                        yield dados
+            planilha.write(''.join(partes).encode())
+            planilha.write(b'</sheetData></worksheet>')
+    yield saida.recolher()
+
+
+def gerar_planilha(formato, cabecalho, linhas, nome_planilha='Planilha'):
+    """Gera o arquivo no formato pedido ("csv" ou "xlsx") em pedaços, para respostas em streaming"""
+    if formato == 'csv':
+        return gerar_csv(cabecalho, linhas)
+    if formato == 'xlsx':
+        return gerar_xlsx(cabecalho, linhas, nome_planilha)
+    raise ValueError(f'Formato desconhecido: {formato}')
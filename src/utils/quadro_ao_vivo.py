@@ -0,0 +1,92 @@
+import threading
+import time
+from collections import deque
+from werkzeug.local import LocalProxy
+from src.models import db, Checkin
+from src.models.eventos import INTERVALO_VERIFICACAO, LIMITE_MAXIMO, aguardar_aviso, eventos_apos, geracao_atual
+from src.models.propriedades import estado_da_propriedade
+from src.models.queries import com_hospedes
+from src.utils import sse
+from src.utils.cache_paginas import card_checkin
+
+# Alterações mantidas em memória; um quadro mais atrasado que isso recarrega a página
+TAMANHO_HISTORICO = 200
+
+
+class QuadroAoVivo:
+    """Alterações do quadro de check-ins ativos, calculadas uma vez por processo para todas as telas abertas.
+
+    Cada evento novo (src/models/eventos.py) vira um delta com o card já renderizado, ou
+    com a remoção do card se o check-in não está mais ativo. As telas conectadas leem os
+    deltas da memória: o banco é consultado uma vez por alteração, e não uma vez por tela.
+    """
+
+    def __init__(self):
+        self._deltas = deque(maxlen=TAMANHO_HISTORICO)
+        self._base = None  # Os deltas em memória estão completos a partir desta posição
+        self._posicao = None  # Último evento já convertido em delta
+        self._geracao = None
+        self._verificado_em = 0.0
+        self._lock = threading.Lock()
+
+    def deltas_apos(self, posicao):
+        """Lista de (posição, delta) após `posicao`, ou None se ela já saiu da memória (a tela deve recarregar)"""
+        with self._lock:
+            if self._base is None:
+                self._base = self._posicao = posicao
+            self._atualizar()
+            if posicao < self._base:
+                return None
+            return [(evento_id, delta) for evento_id, delta in self._deltas if evento_id > posicao]
+
+    def _atualizar(self):
+        geracao = geracao_atual()
+        agora = time.monotonic()
+        # Sem commit novo neste processo, o banco é relido no máximo a cada INTERVALO_VERIFICACAO
+        # (alterações feitas por outros workers)
+        if geracao == self._geracao and agora - self._verificado_em < INTERVALO_VERIFICACAO:
+            return
+        self._geracao, self._verificado_em = geracao, agora
+
+        while eventos := eventos_apos(self._posicao, LIMITE_MAXIMO):
+            ids = {evento.checkin_id for evento in eventos}
+            ativos = {checkin.id: checkin for checkin in com_hospedes(
+                Checkin.query.filter(Checkin.id.in_(ids), Checkin.status == 'Ativo'))}
+            for evento in eventos:
+                checkin = ativos.get(evento.checkin_id)
+                if checkin is not None:
+                    delta = {'checkin_id': checkin.id, 'acao': 'mostrar',
+                             'html': str(card_checkin(checkin, 'card_checkin_ativo'))}
+                else:
+                    delta = {'checkin_id': evento.checkin_id, 'acao': 'remover'}
+                if len(self._deltas) == self._deltas.maxlen:
+                    self._base = self._deltas[0][0]
+                self._deltas.append((evento.id, delta))
+            self._posicao = eventos[-1].id
+
+
+# Cada propriedade (banco) tem o seu quadro
+quadro_ao_vivo = LocalProxy(lambda: estado_da_propriedade('quadro_ao_vivo', QuadroAoVivo))
+
+
+def transmitir(posicao, duracao):
+    """Mensagens SSE com os deltas do quadro após `posicao`, por até `duracao` segundos"""
+    fim = time.monotonic() + duracao
+    ultimo_envio = time.monotonic()
+    while (restante := fim - time.monotonic()) > 0:
+        geracao = geracao_atual()
+        deltas = quadro_ao_vivo.deltas_apos(posicao)
+        # A conexão volta ao pool enquanto a tela espera
+        db.session.close()
+        if deltas is None:
+            yield sse.mensagem({}, 'recarregar')
+            return
+        if deltas:
+            yield ''.join(sse.mensagem(delta, 'checkin', evento_id) for evento_id, delta in deltas)
+            posicao = deltas[-1][0]
+            ultimo_envio = time.monotonic()
+            continue
+        if time.monotonic() - ultimo_envio >= sse.PULSO:
+            yield sse.PULSO_MENSAGEM
+            ultimo_envio = time.monotonic()
+        aguardar_aviso(geracao, min(restante, INTERVALO_VERIFICACAO))
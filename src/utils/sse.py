@@ -0,0 +1,30 @@
+import json
+from flask import Response, stream_with_context
+
+# Comentário enviado quando não há mensagens (mantém a conexão aberta nos proxies), em segundos
+PULSO = 15
+PULSO_MENSAGEM = ': pulso\n\n'
+# Espera do navegador (EventSource) antes de reconectar, em ms
+RECONEXAO_MS = 1000
+
+
+def mensagem(dados, evento=None, id=None):
+    """Uma mensagem server-sent events com `dados` em JSON.
+
+    O `id` é devolvido pelo navegador em Last-Event-ID ao reconectar.
+    """
+    linhas = [] if id is None else [f'id: {id}']
+    if evento:
+        linhas.append(f'event: {evento}')
+    linhas.append(f'data: {json.dumps(dados, ensure_ascii=False)}')
+    return '\n'.join(linhas) + '\n\n'
+
+
+def resposta_sse(fluxo):
+    """Resposta text/event-stream com as mensagens do gerador `fluxo`, sem buffer nos proxies"""
+    def gerar():
+        yield f'retry: {RECONEXAO_MS}\n\n'
+        yield from fluxo
+
+    return Response(stream_with_context(gerar()), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
@@ -0,0 +1,11 @@
+import os
+import sys
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+
+from src.main import create_app
+
+app = create_app()
+
+# Ponto de entrada de produção:
+#   gunicorn -c gunicorn.conf.py src.wsgi:app
+#   waitress-serve --threads=4 --port=5000 src.wsgi:app
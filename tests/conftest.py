@@ -0,0 +1,57 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pytest
+from sqlalchemy import event
+from benchmarks.gerador import gerar_dados
+from src.main import create_app
+from src.models import db
+
+
+@pytest.fixture(scope='module')
+def criar_app(tmp_path_factory):
+    """App com um banco sintético de `apartamentos` apartamentos e `anos` de estadias (uma por tamanho no módulo)"""
+    diretorio = tmp_path_factory.mktemp('hotel')
+    apps = {}
+
+    def criar(apartamentos=10, anos=1):
+        if (apartamentos, anos) not in apps:
+            app = create_app({
+                'SQLALCHEMY_DATABASE_URI': f'sqlite:///{diretorio / f"hotel_{apartamentos}_{anos}.db"}',
+                'TAREFAS_NO_PROCESSO': False,
+                'JINJA_CACHE_DIR': None,
+                'CRIPTOGRAFIA_ARQUIVO': str(diretorio / 'chaves.json'),
+            })
+            with app.app_context():
+                with db.engine.begin() as conn:
+                    gerar_dados(conn, anos, apartamentos)
+            apps[(apartamentos, anos)] = app
+        return apps[(apartamentos, anos)]
+    return criar
+
+
+def _executar_sql(app, url):
+    comandos = []
+
+    def registrar(conn, cursor, sql, parametros, contexto, executemany):
+        comandos.append((sql, parametros))
+
+    with app.app_context():
+        engine = db.engine
+    event.listen(engine, 'before_cursor_execute', registrar)
+    try:
+        resposta = app.test_client().get(url)
+        resposta.get_data()
+        resposta.close()
+    finally:
+        event.remove(engine, 'before_cursor_execute', registrar)
+    assert resposta.status_code == 200, f'{url}: status HTTP {resposta.status_code}'
+    return comandos
+
+
+@pytest.fixture
+def executar_sql():
+    """Executa GET `url` na app (lendo a resposta inteira) e retorna os comandos SQL emitidos, com os parâmetros"""
+    return _executar_sql
@@ -0,0 +1,43 @@
+import pytest
+from src.models import db
+from src.models.arquivo import arquivar, restaurar
+
+NOVO_CHECKIN = ("INSERT INTO checkins (id, numero_apartamento, data_checkin, data_checkout_prevista, status, "
+                "propriedade_id, atualizado_em) VALUES (?, '999', '2030-01-01', '2030-01-02', 'Finalizado', "
+                "'principal', '2030-01-02')")
+
+
+def _arquivar_o_maior(conn):
+    """Finaliza há muito tempo o check-in de maior id e arquiva; retorna o id"""
+    maior = conn.exec_driver_sql('SELECT max(id) FROM checkins').scalar()
+    conn.exec_driver_sql("UPDATE checkins SET status = 'Finalizado', data_checkout = '2000-01-01' WHERE id = ?",
+                         (maior,))
+    conn.commit()
+    arquivar(conn, 30)
+    return maior
+
+
+def test_ids_arquivados_nao_sao_reutilizados(criar_app):
+    app = criar_app(5)
+    with app.app_context(), db.engine.connect() as conn:
+        arquivado = _arquivar_o_maior(conn)
+        novo = conn.exec_driver_sql(NOVO_CHECKIN, (None,)).lastrowid
+        conn.commit()
+        assert novo > arquivado
+
+        assert restaurar(conn, [arquivado]) == 1
+        assert conn.exec_driver_sql('SELECT count(*) FROM checkins WHERE id = ?', (arquivado,)).scalar() == 1
+
+
+def test_restauracao_nao_sobrescreve_checkin_com_o_mesmo_id(criar_app):
+    app = criar_app(6)
+    with app.app_context(), db.engine.connect() as conn:
+        arquivado = _arquivar_o_maior(conn)
+        conn.exec_driver_sql(NOVO_CHECKIN, (arquivado,))
+        conn.commit()
+
+        with pytest.raises(ValueError):
+            restaurar(conn, [arquivado])
+        assert conn.exec_driver_sql('SELECT numero_apartamento FROM checkins WHERE id = ?',
+                                    (arquivado,)).scalar() == '999'
+        assert conn.exec_driver_sql('SELECT count(*) FROM arquivo.checkins WHERE id = ?', (arquivado,)).scalar() == 1
@@ -0,0 +1,14 @@
+import pytest
+
+# Páginas que listam check-ins com os hóspedes: o número de comandos SQL não depende da quantidade de registros
+PAGINAS = ['/checkins-ativos', '/historico', '/historico?nome=silva', '/api/v1/checkins?status=Ativo']
+
+
+@pytest.mark.parametrize('url', PAGINAS)
+def test_consultas_nao_crescem_com_os_dados(criar_app, executar_sql, url):
+    contagens = []
+    for apartamentos in (5, 40):
+        app = criar_app(apartamentos)
+        executar_sql(app, url)  # aquecimento (mapa de ocupação, caches da app)
+        contagens.append(len(executar_sql(app, url)))
+    assert contagens[0] == contagens[1], f'{url}: {contagens[0]} comandos SQL com 5 apartamentos, {contagens[1]} com 40'
@@ -0,0 +1,53 @@
+import re
+import pytest
+from src.models import db
+
+# Consultas das rotas: nenhuma pode percorrer checkins ou hospedes inteiras (SCAN sem índice)
+ROTAS = [
+    '/',
+    '/checkins-ativos',
+    '/historico',
+    '/historico?nome=silva',
+    '/historico?nome=123.456.789-09&data_inicio=2000-01-01&data_fim=2099-12-31',
+    '/historico?cursor=2099-01-01T00:00:00_1000000',
+    '/historico/pagina?nome=ana',
+    '/historico/exportar/hospedes.csv?nome=silva',
+    '/historico/exportar/checkins.csv?status=todos&data_inicio=2000-01-01',
+    '/hospedes/autocompletar?q=mar',
+    '/hospedes/autocompletar?q=(11) 99999-9999',
+    '/hospedes/perfil?documento=DOC00000042',
+    '/checkin/{checkin_id}',
+    '/ocupacao',
+    '/previsao',
+    '/api/v1/checkins?status=Ativo',
+    '/api/v1/checkins?apartamento=101&nome=santos',
+    '/api/v1/checkins/{checkin_id}',
+    '/api/v1/apartamentos',
+    '/api/v1/previsao',
+]
+TABELAS = ('checkins', 'hospedes')
+# Apelidos das tabelas no SQL gerado ("hospedes AS hospedes_1"): o plano mostra o apelido
+APELIDO = re.compile(r'\b(?:checkins|hospedes) AS (\w+)')
+
+
+def varreduras(plano, sql):
+    """Passos do plano que percorrem checkins ou hospedes sem índice"""
+    nomes = set(TABELAS) | set(APELIDO.findall(sql))
+    return [passo for passo in plano if passo.startswith('SCAN ') and passo.split()[1] in nomes and len(passo.split()) == 2]
+
+
+@pytest.mark.parametrize('rota', ROTAS)
+def test_consultas_usam_indices(criar_app, executar_sql, rota):
+    app = criar_app(20)
+    with app.app_context():
+        checkin_id = db.session.execute(db.text('SELECT max(id) FROM checkins')).scalar()
+    comandos = executar_sql(app, rota.format(checkin_id=checkin_id))
+
+    sem_indice = []
+    with app.app_context(), db.engine.connect() as conn:
+        for sql, parametros in comandos:
+            if not sql.lstrip().upper().startswith(('SELECT', 'WITH')):
+                continue
+            plano = [linha[3] for linha in conn.exec_driver_sql(f'EXPLAIN QUERY PLAN {sql}', parametros)]
+            sem_indice += [f'{passo}\n    em: {sql}' for passo in varreduras(plano, sql)]
+    assert not sem_indice, f'{rota}: consultas sem índice:\n' + '\n'.join(sem_indice)